@@ -0,0 +1,166 @@
+import json
+import logging
+from typing import Any, AsyncIterator, List, Optional
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+
+from app import crud, models, schemas
+from app.api import deps
+from app.services.chat import ChatService, ChatTurn, chunk_summary
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+def _sse(event: str, data: Any) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def _start_turn(
+    db: Session, chat: ChatService, chat_in: schemas.ChatRequest, user: models.User
+) -> ChatTurn:
+    """Resolve the conversation of a chat request and start answering it"""
+    conversation: Optional[models.Conversation] = None
+    if chat_in.conversation_id is not None:
+        conversation = await run_in_threadpool(
+            crud.conversation.get_by_user, db, id=chat_in.conversation_id, user_id=user.id
+        )
+        if not conversation:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Conversation not found",
+            )
+    return await chat.start(
+        db,
+        conversation=conversation,
+        user_id=user.id,
+        question=chat_in.message,
+        options=chat_in.search_options,
+    )
+
+@router.post("/", response_model=schemas.ChatResponse)
+async def chat(
+    *,
+    db: Session = Depends(deps.get_db),
+    chat_service: ChatService = Depends(deps.get_chat_service),
+    chat_in: schemas.ChatRequest,
+    background_tasks: BackgroundTasks,
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Answer a message, in a new conversation unless one is given
+    """
+    turn = await _start_turn(db, chat_service, chat_in, current_user)
+    answer = "".join([token async for token in chat_service.stream(turn)])
+    message = await chat_service.finish(db, turn, answer)
+    # Older turns are summarized after the response is sent
+    background_tasks.add_task(chat_service.summarize, db, turn.conversation)
+    return schemas.ChatResponse(
+        conversation_id=turn.conversation.id,
+        message=message,
+        chunks=[chunk_summary(chunk) for chunk in turn.chunks],
+    )
+
+@router.post("/stream")
+async def chat_stream(
+    *,
+    db: Session = Depends(deps.get_db),
+    chat_service: ChatService = Depends(deps.get_chat_service),
+    chat_in: schemas.ChatRequest,
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> StreamingResponse:
+    """
+    Answer a message as server-sent events.
+    
+    A `chunks` event with the conversation and the retrieved chunks comes
+    first, then one `token` event per piece of the answer as the model
+    generates it, and finally a `done` event with the stored message. If
+    generation fails an `error` event ends the stream and no answer is
+    stored.
+    """
+    turn = await _start_turn(db, chat_service, chat_in, current_user)
+    
+    async def events() -> AsyncIterator[str]:
+        yield _sse("chunks", {
+            "conversation_id": turn.conversation.id,
+            "chunks": [chunk_summary(chunk) for chunk in turn.chunks],
+        })
+        tokens: List[str] = []
+        try:
+            async for token in chat_service.stream(turn):
+                tokens.append(token)
+                yield _sse("token", {"text": token})
+            message = await chat_service.finish(db, turn, "".join(tokens))
+        except Exception:
+            logger.exception("Answering in conversation %s failed", turn.conversation.id)
+            yield _sse("error", {"detail": "The answer could not be generated"})
+            return
+        yield _sse("done", schemas.Message.model_validate(message).model_dump(mode="json"))
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Proxies must pass every event on as soon as it is written
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(chat_service.summarize, db, turn.conversation),
+    )
+
+@router.get("/conversations", response_model=List[schemas.Conversation])
+def read_conversations(
+    db: Session = Depends(deps.get_db),
+    skip: int = 0,
+    limit: int = 100,
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Retrieve conversations of the current user
+    """
+    return crud.conversation.get_multi_by_user(db, user_id=current_user.id, skip=skip, limit=limit)
+
+@router.get("/conversations/{id}", response_model=schemas.ConversationWithMessages)
+def read_conversation(
+    *,
+    db: Session = Depends(deps.get_db),
+    id: int,
+    limit: int = 50,
+    before: Optional[int] = None,
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Get a conversation with its latest messages, or those before the message ID `before`
+    """
+    conversation = crud.conversation.get_by_user(db, id=id, user_id=current_user.id)
+    if not conversation:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Conversation not found",
+        )
+    messages = crud.conversation.get_messages(db, conversation_id=id, limit=limit, before_id=before)
+    return schemas.ConversationWithMessages(
+        **schemas.Conversation.model_validate(conversation).model_dump(),
+        messages=[schemas.Message.model_validate(message) for message in messages],
+    )
+
+@router.delete("/conversations/{id}", response_model=schemas.Conversation)
+def delete_conversation(
+    *,
+    db: Session = Depends(deps.get_db),
+    id: int,
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Delete a conversation and its messages
+    """
+    conversation = crud.conversation.get_by_user(db, id=id, user_id=current_user.id)
+    if not conversation:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Conversation not found",
+        )
+    deleted = schemas.Conversation.model_validate(conversation)
+    crud.conversation.remove(db, id=id)
+    return deleted
\ No newline at end of file
@@ -0,0 +1,81 @@
+from typing import Any, List
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+
+from app import crud, models, schemas
+from app.api import deps
+from app.services.vector_store import VectorStoreRegistry
+
+router = APIRouter()
+
+@router.get("/", response_model=List[schemas.Collection])
+def read_collections(
+    db: Session = Depends(deps.get_db),
+    skip: int = 0,
+    limit: int = 100,
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Retrieve collections of the current user
+    """
+    return crud.collection.get_multi_by_owner(
+        db, owner_id=current_user.id, skip=skip, limit=limit
+    )
+
+@router.post("/", response_model=schemas.Collection, status_code=status.HTTP_201_CREATED)
+def create_collection(
+    *,
+    db: Session = Depends(deps.get_db),
+    collection_in: schemas.CollectionCreate,
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Create a collection
+    """
+    return crud.collection.create_with_owner(db, obj_in=collection_in, owner_id=current_user.id)
+
+@router.get("/{id}", response_model=schemas.Collection)
+def read_collection(
+    *,
+    db: Session = Depends(deps.get_db),
+    id: int,
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Get a collection by ID
+    """
+    collection = crud.collection.get_by_owner(db, id=id, owner_id=current_user.id)
+    if not collection:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Collection not found",
+        )
+    return collection
+
+@router.put("/{id}", response_model=schemas.Collection)
+def update_collection(
+    *,
+    db: Session = Depends(deps.get_db),
+    id: int,
+    collection_in: schemas.CollectionUpdate,
+    vector_stores: VectorStoreRegistry = Depends(deps.get_vector_stores),
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Update a collection.
+    
+    Changed `vector_index` settings re-encode the vectors already stored for
+    the collection before the response is sent.
+    """
+    collection = crud.collection.get_by_owner(db, id=id, owner_id=current_user.id)
+    if not collection:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Collection not found",
+        )
+    vector_index = collection.vector_index
+    collection = crud.collection.update(db, db_obj=collection, obj_in=collection_in)
+    if collection.vector_index != vector_index:
+        vector_stores.for_collection(collection).persist()
+    return collection
\ No newline at end of file
@@ -0,0 +1,284 @@
+import os
+import uuid
+from typing import Any, AsyncIterator, Callable, List, Optional
+
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Request, UploadFile, status
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app import crud, models, schemas
+from app.api import deps
+from app.services.ingestion import move_document
+from app.services.lexical import LexicalIndex
+from app.services.retrieval_cache import RetrievalCache
+from app.services.storage import ObjectStorage, StoredObject, iter_upload_file, stream_to_storage
+from app.services.vector_store import VectorStoreRegistry
+
+router = APIRouter()
+
+def _storage_key(owner_id: int, file_name: str) -> str:
+    """Build a unique object key for an uploaded file"""
+    return f"documents/{owner_id}/{uuid.uuid4().hex}/{os.path.basename(file_name)}"
+
+def _file_type(file_name: str) -> str:
+    """Derive the document type from the file extension"""
+    return os.path.splitext(file_name)[1].lstrip(".").lower()
+
+def _check_collection(db: Session, collection_id: Optional[int], owner_id: int) -> None:
+    """Reject a collection the user does not own as if it did not exist"""
+    if collection_id is not None and not crud.collection.get_by_owner(db, id=collection_id, owner_id=owner_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Collection not found",
+        )
+
+async def _store_document(
+    *,
+    db: Session,
+    storage: ObjectStorage,
+    document_in: schemas.DocumentCreate,
+    file_name: str,
+    chunks: AsyncIterator[bytes],
+    owner_id: int,
+    enqueue_ingestion: Callable[[int], Any],
+) -> models.Document:
+    """Stream a file into storage, record it as a pending document and queue its ingestion"""
+    await run_in_threadpool(_check_collection, db, document_in.collection_id, owner_id)
+    stored: StoredObject = await stream_to_storage(
+        storage, _storage_key(owner_id, file_name), chunks
+    )
+    try:
+        document = await run_in_threadpool(
+            crud.document.create_with_owner,
+            db,
+            obj_in=document_in,
+            owner_id=owner_id,
+            file_name=file_name,
+            file_type=_file_type(file_name),
+            file_size=stored.size,
+            s3_path=stored.key,
+            content_hash=stored.content_hash,
+        )
+    except Exception:
+        await run_in_threadpool(storage.delete, stored.key)
+        raise
+    await run_in_threadpool(enqueue_ingestion, document.id)
+    return document
+
+@router.get("/", response_model=List[schemas.Document])
+def read_documents(
+    db: Session = Depends(deps.get_db),
+    skip: int = 0,
+    limit: int = 100,
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Retrieve documents of the current user
+    """
+    return crud.document.get_multi_by_owner(
+        db, owner_id=current_user.id, skip=skip, limit=limit
+    )
+
+@router.post("/upload", response_model=schemas.Document, status_code=status.HTTP_201_CREATED)
+async def upload_document(
+    *,
+    db: Session = Depends(deps.get_db),
+    storage: ObjectStorage = Depends(deps.get_storage),
+    enqueue_ingestion: Callable[[int], Any] = Depends(deps.get_ingestion_queue),
+    title: str = Form(...),
+    description: Optional[str] = Form(None),
+    collection_id: Optional[int] = Form(None),
+    file: UploadFile = File(...),
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Upload a document as multipart form data.
+    
+    The file is copied to storage one part at a time. Large files should use
+    `/upload/stream`, which skips the temporary file the form parser spools to.
+    """
+    document_in = schemas.DocumentCreate(
+        title=title, description=description, collection_id=collection_id
+    )
+    return await _store_document(
+        db=db,
+        storage=storage,
+        document_in=document_in,
+        file_name=file.filename or "upload",
+        chunks=iter_upload_file(file, storage.part_size),
+        owner_id=current_user.id,
+        enqueue_ingestion=enqueue_ingestion,
+    )
+
+@router.post("/upload/stream", response_model=schemas.Document, status_code=status.HTTP_201_CREATED)
+async def upload_document_stream(
+    *,
+    request: Request,
+    db: Session = Depends(deps.get_db),
+    storage: ObjectStorage = Depends(deps.get_storage),
+    enqueue_ingestion: Callable[[int], Any] = Depends(deps.get_ingestion_queue),
+    title: str,
+    file_name: str,
+    description: Optional[str] = None,
+    collection_id: Optional[int] = None,
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Upload a document from the raw request body.
+    
+    The body is streamed straight into a multipart upload, so memory use per
+    upload is bounded by the configured part size.
+    """
+    document_in = schemas.DocumentCreate(
+        title=title, description=description, collection_id=collection_id
+    )
+    return await _store_document(
+        db=db,
+        storage=storage,
+        document_in=document_in,
+        file_name=file_name,
+        chunks=request.stream(),
+        owner_id=current_user.id,
+        enqueue_ingestion=enqueue_ingestion,
+    )
+
+@router.get("/{id}", response_model=schemas.Document)
+def read_document(
+    *,
+    db: Session = Depends(deps.get_db),
+    id: int,
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Get a document by ID
+    """
+    document = crud.document.get_by_owner(db, id=id, owner_id=current_user.id)
+    if not document:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Document not found",
+        )
+    return document
+
+@router.put("/{id}", response_model=schemas.Document)
+def update_document(
+    *,
+    db: Session = Depends(deps.get_db),
+    id: int,
+    document_in: schemas.DocumentUpdate,
+    vector_stores: VectorStoreRegistry = Depends(deps.get_vector_stores),
+    lexical_index: LexicalIndex = Depends(deps.get_lexical_index),
+    retrieval_cache: Optional[RetrievalCache] = Depends(deps.get_retrieval_cache),
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Update a document.
+    
+    Moving it to another collection moves its vectors and lexical entries
+    along, so it is only found in the new collection.
+    """
+    document = crud.document.get_by_owner(db, id=id, owner_id=current_user.id)
+    if not document:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Document not found",
+        )
+    if document_in.collection_id is not None:
+        _check_collection(db, document_in.collection_id, current_user.id)
+    collection_id, collection = document.collection_id, document.collection
+    document = crud.document.update(db, db_obj=document, obj_in=document_in)
+    if document.collection_id != collection_id:
+        move_document(db, document, collection, vector_stores=vector_stores, lexical_index=lexical_index)
+        if retrieval_cache is not None:
+            retrieval_cache.bump(current_user.id, [collection_id, document.collection_id])
+    return document
+
+@router.put("/{id}/file", response_model=schemas.Document)
+async def replace_document_file(
+    *,
+    db: Session = Depends(deps.get_db),
+    storage: ObjectStorage = Depends(deps.get_storage),
+    enqueue_ingestion: Callable[[int], Any] = Depends(deps.get_ingestion_queue),
+    id: int,
+    file: UploadFile = File(...),
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Replace the file of a document.
+    
+    Existing chunks are kept and the document is queued for ingestion, which
+    re-indexes it incrementally against them.
+    """
+    document = await run_in_threadpool(
+        crud.document.get_by_owner, db, id=id, owner_id=current_user.id
+    )
+    if not document:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Document not found",
+        )
+    file_name = file.filename or document.file_name
+    stored = await stream_to_storage(
+        storage,
+        _storage_key(current_user.id, file_name),
+        iter_upload_file(file, storage.part_size),
+    )
+    old_path = document.s3_path
+    try:
+        document = await run_in_threadpool(
+            crud.document.update,
+            db,
+            db_obj=document,
+            obj_in={
+                "file_name": file_name,
+                "file_type": _file_type(file_name),
+                "file_size": stored.size,
+                "s3_path": stored.key,
+                "content_hash": stored.content_hash,
+                "status": "pending",
+            },
+        )
+    except Exception:
+        await run_in_threadpool(storage.delete, stored.key)
+        raise
+    await run_in_threadpool(storage.delete, old_path)
+    await run_in_threadpool(enqueue_ingestion, document.id)
+    return document
+
+@router.delete("/{id}", response_model=schemas.Document)
+def delete_document(
+    *,
+    db: Session = Depends(deps.get_db),
+    storage: ObjectStorage = Depends(deps.get_storage),
+    vector_stores: VectorStoreRegistry = Depends(deps.get_vector_stores),
+    lexical_index: LexicalIndex = Depends(deps.get_lexical_index),
+    retrieval_cache: Optional[RetrievalCache] = Depends(deps.get_retrieval_cache),
+    id: int,
+    current_user: models.User = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Delete a document, its stored file, its search entries and the vectors
+    only it used
+    """
+    document = crud.document.get_by_owner(db, id=id, owner_id=current_user.id)
+    if not document:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Document not found",
+        )
+    vector_store = vector_stores.for_collection(document.collection)
+    vector_ids = crud.document_chunk.get_vector_ids_by_document(db, document_id=id)
+    chunk_ids = [e.id for e in crud.document_chunk.get_index_entries(db, document_id=id)]
+    document = crud.document.remove(db, id=id)
+    storage.delete(document.s3_path)
+    vector_store.delete(
+        crud.document_chunk.get_unreferenced_vector_ids(
+            db, vector_ids=vector_ids, collection_id=document.collection_id
+        )
+    )
+    vector_store.persist()
+    lexical_index.delete(chunk_ids)
+    lexical_index.persist()
+    if retrieval_cache is not None:
+        retrieval_cache.bump(current_user.id, [document.collection_id])
+    return document
\ No newline at end of file
@@ -1,4 +1,4 @@
-from typing import Generator, Optional
+from typing import Any, Callable, Generator, Optional
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
@@ -10,6 +10,12 @@ from app import crud, models, schemas
 from app.core import security
 from app.core.config import settings
 from app.db.session import SessionLocal
+from app.services.chat import ChatService, get_chat_service as get_chat_pipeline
+from app.services.lexical import LexicalIndex, get_lexical_index as get_lexical_index_backend
+from app.services.retrieval import HybridRetriever, get_retriever as get_hybrid_retriever
+from app.services.retrieval_cache import RetrievalCache, get_retrieval_cache as get_retrieval_cache_backend
+from app.services.storage import ObjectStorage, get_storage as get_object_storage
+from app.services.vector_store import VectorStoreRegistry, get_vector_stores as get_vector_store_registry
 
 oauth2_scheme = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_STR}/auth/login"
@@ -25,6 +31,51 @@ def get_db() -> Generator:
     finally:
         db.close()
 
+def get_storage() -> ObjectStorage:
+    """
+    Dependency for getting the document storage backend
+    """
+    return get_object_storage()
+
+def get_ingestion_queue() -> Callable[[int], Any]:
+    """
+    Dependency for getting the function that queues a document for ingestion
+    """
+    # The worker module pulls in Celery, which only processes queueing work need
+    from app.worker import ingest_document_task
+    
+    return ingest_document_task.delay
+
+def get_vector_stores() -> VectorStoreRegistry:
+    """
+    Dependency for getting the per-collection vector stores
+    """
+    return get_vector_store_registry()
+
+def get_lexical_index() -> LexicalIndex:
+    """
+    Dependency for getting the lexical chunk index
+    """
+    return get_lexical_index_backend()
+
+def get_retrieval_cache() -> Optional[RetrievalCache]:
+    """
+    Dependency for getting the retrieval result cache, None when disabled
+    """
+    return get_retrieval_cache_backend()
+
+def get_retriever() -> HybridRetriever:
+    """
+    Dependency for getting the hybrid chunk retriever
+    """
+    return get_hybrid_retriever()
+
+def get_chat_service() -> ChatService:
+    """
+    Dependency for getting the chat pipeline
+    """
+    return get_chat_pipeline()
+
 def get_current_user(
     db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)
 ) -> models.User:
@@ -74,7 +125,7 @@ def get_current_active_superuser(
     if not crud.user.is_superuser(current_user):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
-            detail="The user doesn't have enough privileges",
+            detail="Not enough permissions",
         )
     
     return current_user
\ No newline at end of file
@@ -42,6 +42,11 @@ class Settings(BaseSettings):
     # ELASTICSEARCH
     ELASTICSEARCH_HOST: str = os.getenv("ELASTICSEARCH_HOST", "localhost")
     ELASTICSEARCH_PORT: int = int(os.getenv("ELASTICSEARCH_PORT", "9200"))
+    ELASTICSEARCH_CHUNK_INDEX: str = os.getenv("ELASTICSEARCH_CHUNK_INDEX", "document_chunks")
+    ELASTICSEARCH_CONNECTIONS: int = int(os.getenv("ELASTICSEARCH_CONNECTIONS", "10"))  # Per node and process
+    ELASTICSEARCH_TIMEOUT: float = float(os.getenv("ELASTICSEARCH_TIMEOUT", "10"))
+    ELASTICSEARCH_BULK_CHUNK_SIZE: int = int(os.getenv("ELASTICSEARCH_BULK_CHUNK_SIZE", "500"))
+    ELASTICSEARCH_BULK_RETRIES: int = int(os.getenv("ELASTICSEARCH_BULK_RETRIES", "5"))  # On 429 responses
     
     # S3 STORAGE
     S3_BUCKET_NAME: str = os.getenv("S3_BUCKET_NAME", "rag-documents")
@@ -49,6 +54,79 @@ class Settings(BaseSettings):
     AWS_SECRET_ACCESS_KEY: Optional[str] = os.getenv("AWS_SECRET_ACCESS_KEY")
     AWS_REGION: str = os.getenv("AWS_REGION", "us-east-1")
     
+    # DOCUMENT STORAGE
+    STORAGE_BACKEND: str = os.getenv("STORAGE_BACKEND", "s3")  # s3, local
+    LOCAL_STORAGE_PATH: str = os.getenv("LOCAL_STORAGE_PATH", "./storage")
+    # S3 requires every part except the last to be at least 5 MiB
+    UPLOAD_PART_SIZE: int = int(os.getenv("UPLOAD_PART_SIZE", str(8 * 1024 * 1024)))
+    
+    # DOCUMENT PROCESSING
+    EXTRACTION_WORKERS: int = int(os.getenv("EXTRACTION_WORKERS", str(os.cpu_count() or 1)))
+    EXTRACTION_PAGES_PER_TASK: int = int(os.getenv("EXTRACTION_PAGES_PER_TASK", "16"))
+    EXTRACTION_MAX_PENDING: int = int(os.getenv("EXTRACTION_MAX_PENDING", "4"))
+    CHUNK_SIZE: int = int(os.getenv("CHUNK_SIZE", "1000"))  # characters
+    CHUNK_OVERLAP: int = int(os.getenv("CHUNK_OVERLAP", "200"))
+    CHUNK_INSERT_BATCH_SIZE: int = int(os.getenv("CHUNK_INSERT_BATCH_SIZE", "1000"))
+    
+    # EMBEDDINGS
+    EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+    EMBEDDING_DIMENSION: int = int(os.getenv("EMBEDDING_DIMENSION", "384"))  # Must match the model
+    EMBEDDING_THREADS: int = int(os.getenv("EMBEDDING_THREADS", str(os.cpu_count() or 1)))
+    EMBEDDING_BATCH_SIZE: int = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+    EMBEDDING_MAX_WAIT_MS: float = float(os.getenv("EMBEDDING_MAX_WAIT_MS", "5"))
+    EMBEDDING_CACHE_PATH: str = os.getenv("EMBEDDING_CACHE_PATH", "./cache/embeddings.sqlite3")
+    EMBEDDING_CACHE_MAX_BYTES: int = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+    EMBEDDING_CACHE_REDIS: bool = os.getenv("EMBEDDING_CACHE_REDIS", "false").lower() == "true"
+    EMBEDDING_CACHE_REDIS_TTL: int = int(os.getenv("EMBEDDING_CACHE_REDIS_TTL", str(60 * 60 * 24 * 30)))
+    
+    # VECTOR STORE
+    VECTOR_STORE_BACKEND: str = os.getenv("VECTOR_STORE_BACKEND", "local")
+    VECTOR_STORE_PATH: str = os.getenv("VECTOR_STORE_PATH", "./data/vectors")  # One directory per collection
+    VECTOR_STORE_N_PROBE: int = int(os.getenv("VECTOR_STORE_N_PROBE", "8"))
+    # Below this many vectors search is exact, above it the IVF lists are used
+    VECTOR_STORE_TRAIN_SIZE: int = int(os.getenv("VECTOR_STORE_TRAIN_SIZE", "1024"))
+    # Stores per collection searched in parallel, changing it requires re-indexing
+    VECTOR_STORE_SHARDS: int = int(os.getenv("VECTOR_STORE_SHARDS", "1"))
+    VECTOR_STORE_SEARCH_THREADS: int = int(os.getenv("VECTOR_STORE_SEARCH_THREADS", str(os.cpu_count() or 1)))
+    
+    # RETRIEVAL
+    RETRIEVAL_CANDIDATES: int = int(os.getenv("RETRIEVAL_CANDIDATES", "50"))  # Per search before fusion
+    RETRIEVAL_RRF_K: int = int(os.getenv("RETRIEVAL_RRF_K", "60"))
+    RETRIEVAL_CACHE: bool = os.getenv("RETRIEVAL_CACHE", "false").lower() == "true"  # Results in Redis
+    RETRIEVAL_CACHE_TTL: int = int(os.getenv("RETRIEVAL_CACHE_TTL", str(60 * 60)))
+    LEXICAL_BACKEND: str = os.getenv("LEXICAL_BACKEND", "elasticsearch")  # elasticsearch, local
+    LEXICAL_INDEX_PATH: str = os.getenv("LEXICAL_INDEX_PATH", "./data/lexical")  # Directory of index segments
+    
+    # RERANKING
+    RERANK_MODEL: str = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")  # Empty disables
+    RERANK_BATCH_SIZE: int = int(os.getenv("RERANK_BATCH_SIZE", "16"))
+    
+    # CHAT
+    CHAT_PROVIDER: str = os.getenv("CHAT_PROVIDER", "openai")  # openai, anthropic, mistral, fake
+    CHAT_MODEL: str = os.getenv("CHAT_MODEL", "gpt-3.5-turbo")
+    CHAT_MAX_TOKENS: int = int(os.getenv("CHAT_MAX_TOKENS", "512"))  # Per answer
+    CHAT_TEMPERATURE: float = float(os.getenv("CHAT_TEMPERATURE", "0.2"))
+    CHAT_CONTEXT_WINDOW: int = int(os.getenv("CHAT_CONTEXT_WINDOW", "16385"))  # Tokens, prompt and answer
+    CHAT_TOKENIZER: str = os.getenv("CHAT_TOKENIZER", "cl100k_base")  # tiktoken encoding, whitespace counts words
+    CHAT_HISTORY_SHARE: float = float(os.getenv("CHAT_HISTORY_SHARE", "0.25"))  # Of the prompt budget before chunks
+    CHAT_HISTORY_TURNS: int = int(os.getenv("CHAT_HISTORY_TURNS", "10"))  # Newest questions and answers kept verbatim
+    CHAT_SUMMARY_TURNS: int = int(os.getenv("CHAT_SUMMARY_TURNS", "10"))  # Older turns folded into the summary at once
+    CHAT_TIMEOUT: float = float(os.getenv("CHAT_TIMEOUT", "60"))  # Seconds for the whole answer
+    CHAT_RETRIES: int = int(os.getenv("CHAT_RETRIES", "2"))  # Before the first token only
+    # Asked as well when the primary's first token is slower than the percentile, empty disables
+    CHAT_BACKUP_PROVIDER: str = os.getenv("CHAT_BACKUP_PROVIDER", "")
+    CHAT_BACKUP_MODEL: str = os.getenv("CHAT_BACKUP_MODEL", "")
+    CHAT_HEDGE_PERCENTILE: float = float(os.getenv("CHAT_HEDGE_PERCENTILE", "95"))
+    LLM_CONNECTIONS: int = int(os.getenv("LLM_CONNECTIONS", "20"))  # Per provider and process
+    LLM_FAKE_LATENCY_MS: float = float(os.getenv("LLM_FAKE_LATENCY_MS", "0"))  # First token of the fake provider
+    
+    # ANSWER CACHE
+    ANSWER_CACHE: bool = os.getenv("ANSWER_CACHE", "false").lower() == "true"  # Answers to new questions in Redis
+    ANSWER_CACHE_TTL: int = int(os.getenv("ANSWER_CACHE_TTL", str(60 * 60 * 24)))
+    # Cosine similarity at which a cached question answers another one, 0 matches normalized questions only
+    ANSWER_CACHE_SIMILARITY: float = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0"))
+    ANSWER_CACHE_SIMILAR_QUESTIONS: int = int(os.getenv("ANSWER_CACHE_SIMILAR_QUESTIONS", "1000"))  # Compared per scope
+    
     # LLM API KEYS
     OPENAI_API_KEY: Optional[str] = os.getenv("OPENAI_API_KEY")
     ANTHROPIC_API_KEY: Optional[str] = os.getenv("ANTHROPIC_API_KEY")
@@ -1,4 +1,5 @@
 from app.crud.crud_user import user
 from app.crud.crud_document import document
+from app.crud.crud_document_chunk import document_chunk
 from app.crud.crud_collection import collection
 from app.crud.crud_conversation import conversation
\ No newline at end of file
@@ -3,7 +3,6 @@ from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
 from sqlalchemy import select
-from sqlalchemy.ext.declarative import DeclarativeBase
 from sqlalchemy.orm import Session
 
 from app.db.base_class import Base
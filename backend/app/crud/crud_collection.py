@@ -0,0 +1,54 @@
+from typing import List, Optional, Sequence
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import Session
+
+from app.crud.base import CRUDBase
+from app.models.collection import Collection
+from app.schemas.collection import CollectionCreate, CollectionUpdate
+
+class CRUDCollection(CRUDBase[Collection, CollectionCreate, CollectionUpdate]):
+    def get_by_owner(self, db: Session, *, id: int, owner_id: int) -> Optional[Collection]:
+        """Get a collection by ID if it belongs to the owner"""
+        return (
+            db.query(Collection)
+            .filter(Collection.id == id, Collection.owner_id == owner_id)
+            .first()
+        )
+    
+    def get_multi_by_ids(
+        self, db: Session, *, ids: Sequence[int], owner_id: int
+    ) -> List[Collection]:
+        """Get the owner's collections among the given IDs"""
+        if not ids:
+            return []
+        return (
+            db.query(Collection)
+            .filter(Collection.id.in_(ids), Collection.owner_id == owner_id)
+            .all()
+        )
+    
+    def get_multi_by_owner(
+        self, db: Session, *, owner_id: int, skip: int = 0, limit: int = 100
+    ) -> List[Collection]:
+        """Get multiple collections belonging to the owner"""
+        return (
+            db.query(Collection)
+            .filter(Collection.owner_id == owner_id)
+            .order_by(Collection.id)
+            .offset(skip)
+            .limit(limit)
+            .all()
+        )
+    
+    def create_with_owner(
+        self, db: Session, *, obj_in: CollectionCreate, owner_id: int
+    ) -> Collection:
+        """Create a collection for the owner"""
+        db_obj = Collection(**jsonable_encoder(obj_in), owner_id=owner_id)
+        db.add(db_obj)
+        db.commit()
+        db.refresh(db_obj)
+        return db_obj
+
+collection = CRUDCollection(Collection)
\ No newline at end of file
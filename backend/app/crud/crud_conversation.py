@@ -0,0 +1,121 @@
+from typing import List, Optional, Sequence, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import Session
+
+from app.crud.base import CRUDBase
+from app.models.conversation import Conversation
+from app.models.document_chunk import MessageChunkReference
+from app.models.message import Message
+from app.schemas.conversation import ConversationCreate, ConversationUpdate
+
+class CRUDConversation(CRUDBase[Conversation, ConversationCreate, ConversationUpdate]):
+    def get_by_user(self, db: Session, *, id: int, user_id: int) -> Optional[Conversation]:
+        """Get a conversation by ID if it belongs to the user"""
+        return (
+            db.query(Conversation)
+            .filter(Conversation.id == id, Conversation.user_id == user_id)
+            .first()
+        )
+    
+    def get_multi_by_user(
+        self, db: Session, *, user_id: int, skip: int = 0, limit: int = 100
+    ) -> List[Conversation]:
+        """Get the user's conversations, most recently active first"""
+        return (
+            db.query(Conversation)
+            .filter(Conversation.user_id == user_id)
+            .order_by(Conversation.updated_at.desc(), Conversation.id.desc())
+            .offset(skip)
+            .limit(limit)
+            .all()
+        )
+    
+    def create_with_user(
+        self, db: Session, *, obj_in: ConversationCreate, user_id: int
+    ) -> Conversation:
+        """Create a conversation for the user"""
+        db_obj = Conversation(**jsonable_encoder(obj_in), user_id=user_id)
+        db.add(db_obj)
+        db.commit()
+        db.refresh(db_obj)
+        return db_obj
+    
+    def get_messages(
+        self,
+        db: Session,
+        *,
+        conversation_id: int,
+        limit: int,
+        after_id: Optional[int] = None,
+        before_id: Optional[int] = None,
+    ) -> List[Message]:
+        """
+        Get the newest `limit` messages of a conversation between two message IDs, oldest first.
+        
+        The query reads at most `limit` rows of the (conversation_id, id)
+        index however long the conversation is.
+        """
+        query = db.query(Message).filter(Message.conversation_id == conversation_id)
+        if after_id is not None:
+            query = query.filter(Message.id > after_id)
+        if before_id is not None:
+            query = query.filter(Message.id < before_id)
+        return query.order_by(Message.id.desc()).limit(limit).all()[::-1]
+    
+    def get_unsummarized(
+        self, db: Session, *, conversation: Conversation, keep: int, limit: int
+    ) -> List[Message]:
+        """Get up to `limit` of the oldest messages not yet summarized, leaving the newest `keep` out"""
+        query = db.query(Message).filter(Message.conversation_id == conversation.id)
+        if conversation.summarized_until is not None:
+            query = query.filter(Message.id > conversation.summarized_until)
+        if keep > 0:
+            # The oldest of the newest `keep` messages
+            boundary = (
+                db.query(Message.id)
+                .filter(Message.conversation_id == conversation.id)
+                .order_by(Message.id.desc())
+                .offset(keep - 1)
+                .limit(1)
+                .scalar()
+            )
+            if boundary is None:
+                return []
+            query = query.filter(Message.id < boundary)
+        return query.order_by(Message.id).limit(limit).all()
+    
+    def update_summary(
+        self, db: Session, *, conversation: Conversation, summary: str, summarized_until: int
+    ) -> Conversation:
+        """Replace the rolling summary of a conversation"""
+        conversation.summary = summary
+        conversation.summarized_until = summarized_until
+        db.commit()
+        db.refresh(conversation)
+        return conversation
+    
+    def add_message(
+        self,
+        db: Session,
+        *,
+        conversation: Conversation,
+        role: str,
+        content: str,
+        metadata: Optional[dict] = None,
+        chunk_scores: Sequence[Tuple[int, float]] = (),
+    ) -> Message:
+        """Append a message, with the chunks it was based on, and mark the conversation active"""
+        message = Message(conversation_id=conversation.id, role=role, content=content, metadata_=metadata)
+        db.add(message)
+        db.flush()
+        db.add_all([
+            MessageChunkReference(message_id=message.id, chunk_id=chunk_id, relevance_score=score)
+            for chunk_id, score in chunk_scores
+        ])
+        conversation.updated_at = message.created_at
+        db.commit()
+        db.refresh(message)
+        return message
+
+conversation = CRUDConversation(Conversation)
\ No newline at end of file
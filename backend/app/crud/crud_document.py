@@ -0,0 +1,85 @@
+from typing import List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.crud.base import CRUDBase
+from app.models.document import Document
+from app.schemas.document import DocumentCreate, DocumentUpdate
+
+class CRUDDocument(CRUDBase[Document, DocumentCreate, DocumentUpdate]):
+    def get_by_owner(self, db: Session, *, id: int, owner_id: int) -> Optional[Document]:
+        """Get a document by ID if it belongs to the owner"""
+        return (
+            db.query(Document)
+            .filter(Document.id == id, Document.owner_id == owner_id)
+            .first()
+        )
+    
+    def get_collection_ids(self, db: Session, *, owner_id: int) -> List[Optional[int]]:
+        """Get the collections the owner has documents in, None for documents outside any"""
+        return [
+            collection_id
+            for (collection_id,) in db.query(Document.collection_id)
+            .filter(Document.owner_id == owner_id)
+            .distinct()
+        ]
+    
+    def get_indexed_by_hash(
+        self, db: Session, *, owner_id: int, content_hash: str, exclude_id: Optional[int] = None
+    ) -> Optional[Document]:
+        """Get an already indexed document of the owner with the same content"""
+        query = db.query(Document).filter(
+            Document.owner_id == owner_id,
+            Document.content_hash == content_hash,
+            Document.status == "indexed",
+        )
+        if exclude_id is not None:
+            query = query.filter(Document.id != exclude_id)
+        return query.order_by(Document.id).first()
+    
+    def get_multi_by_owner(
+        self, db: Session, *, owner_id: int, skip: int = 0, limit: int = 100
+    ) -> List[Document]:
+        """Get multiple documents belonging to the owner"""
+        return (
+            db.query(Document)
+            .filter(Document.owner_id == owner_id)
+            .order_by(Document.id)
+            .offset(skip)
+            .limit(limit)
+            .all()
+        )
+    
+    def create_with_owner(
+        self,
+        db: Session,
+        *,
+        obj_in: DocumentCreate,
+        owner_id: int,
+        file_name: str,
+        file_type: str,
+        file_size: int,
+        s3_path: str,
+        content_hash: Optional[str] = None,
+        metadata: Optional[dict] = None,
+    ) -> Document:
+        """Create a document record for an uploaded file"""
+        db_obj = Document(
+            title=obj_in.title,
+            description=obj_in.description,
+            collection_id=obj_in.collection_id,
+            owner_id=owner_id,
+            file_name=file_name,
+            file_type=file_type,
+            file_size=file_size,
+            s3_path=s3_path,
+            content_hash=content_hash,
+            status="pending",
+            metadata_=metadata,
+        )
+        db.add(db_obj)
+        db.commit()
+        db.refresh(db_obj)
+        return db_obj
+
+document = CRUDDocument(Document)
\ No newline at end of file
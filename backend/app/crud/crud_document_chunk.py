@@ -0,0 +1,323 @@
+import csv
+import io
+import json
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, bindparam, insert, literal, or_, select, text, update
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session
+
+from app.crud.base import CRUDBase
+from app.models.document import Document
+from app.models.document_chunk import DocumentChunk, MessageChunkReference
+from app.schemas.document_chunk import DocumentChunkCreate, DocumentChunkUpdate
+
+class CRUDDocumentChunk(CRUDBase[DocumentChunk, DocumentChunkCreate, DocumentChunkUpdate]):
+    def get_multi_by_document(self, db: Session, *, document_id: int) -> List[DocumentChunk]:
+        """Get all chunks of a document in order"""
+        return (
+            db.query(DocumentChunk)
+            .filter(DocumentChunk.document_id == document_id)
+            .order_by(DocumentChunk.chunk_index)
+            .all()
+        )
+    
+    def get_multi_by_ids(self, db: Session, *, ids: Sequence[int]) -> List[DocumentChunk]:
+        """Get chunks by ID, in no particular order"""
+        if not ids:
+            return []
+        return db.query(DocumentChunk).filter(DocumentChunk.id.in_(ids)).all()
+    
+    def get_contents(self, db: Session, *, ids: Sequence[int]) -> List[Row]:
+        """Get (id, content) of chunks by ID"""
+        if not ids:
+            return []
+        return (
+            db.query(DocumentChunk.id, DocumentChunk.content)
+            .filter(DocumentChunk.id.in_(ids))
+            .all()
+        )
+    
+    def get_ids_by_vector_ids(
+        self,
+        db: Session,
+        *,
+        vector_ids: Iterable[str],
+        owner_id: int,
+        collection_ids: Optional[Sequence[int]] = None,
+    ) -> List[Row]:
+        """Get (id, vector_id) of the owner's chunks using the given vectors"""
+        vector_ids = set(vector_ids)
+        if not vector_ids:
+            return []
+        query = (
+            db.query(DocumentChunk.id, DocumentChunk.vector_id)
+            .join(Document, Document.id == DocumentChunk.document_id)
+            .filter(DocumentChunk.vector_id.in_(vector_ids), Document.owner_id == owner_id)
+        )
+        if collection_ids:
+            query = query.filter(Document.collection_id.in_(collection_ids))
+        return query.all()
+    
+    def get_ranges(self, db: Session, *, ranges: Sequence[Tuple[int, int, int]]) -> List[Row]:
+        """
+        Get (document_id, chunk_index, content) of chunks in (document_id, first, last) ranges.
+        
+        All ranges are read in one query, each one a range scan of the
+        (document_id, chunk_index) index. Rows are ordered by document and
+        chunk index.
+        """
+        if not ranges:
+            return []
+        return (
+            db.query(DocumentChunk.document_id, DocumentChunk.chunk_index, DocumentChunk.content)
+            .filter(or_(*(
+                and_(DocumentChunk.document_id == document_id, DocumentChunk.chunk_index.between(first, last))
+                for document_id, first, last in ranges
+            )))
+            .order_by(DocumentChunk.document_id, DocumentChunk.chunk_index)
+            .all()
+        )
+    
+    def get_index_entries(self, db: Session, *, document_id: int) -> List[Row]:
+        """Get (id, content_hash, chunk_index, vector_id) of a document's chunks in order"""
+        return (
+            db.query(
+                DocumentChunk.id,
+                DocumentChunk.content_hash,
+                DocumentChunk.chunk_index,
+                DocumentChunk.vector_id,
+            )
+            .filter(DocumentChunk.document_id == document_id)
+            .order_by(DocumentChunk.chunk_index)
+            .all()
+        )
+    
+    def count_embedded(self, db: Session, *, document_id: int) -> int:
+        """Count the chunks of a document that already have a vector"""
+        return (
+            db.query(DocumentChunk)
+            .filter(DocumentChunk.document_id == document_id, DocumentChunk.vector_id.isnot(None))
+            .count()
+        )
+    
+    def get_vector_entries(self, db: Session, *, document_id: int) -> List[Row]:
+        """Get (id, content, content_hash, vector_id) of a document's chunks in order"""
+        return (
+            db.query(
+                DocumentChunk.id,
+                DocumentChunk.content,
+                DocumentChunk.content_hash,
+                DocumentChunk.vector_id,
+            )
+            .filter(DocumentChunk.document_id == document_id)
+            .order_by(DocumentChunk.chunk_index)
+            .all()
+        )
+    
+    def get_vector_ids_by_document(self, db: Session, *, document_id: int) -> List[str]:
+        """Get the distinct vector IDs used by a document's chunks"""
+        return [
+            vector_id
+            for (vector_id,) in db.query(DocumentChunk.vector_id)
+            .filter(DocumentChunk.document_id == document_id, DocumentChunk.vector_id.isnot(None))
+            .distinct()
+        ]
+    
+    def get_vector_ids_by_hash(
+        self, db: Session, *, owner_id: int, content_hashes: Iterable[str]
+    ) -> Dict[str, str]:
+        """Map content hashes to vector IDs already indexed for the owner"""
+        hashes = set(content_hashes)
+        if not hashes:
+            return {}
+        rows = (
+            db.query(DocumentChunk.content_hash, DocumentChunk.vector_id)
+            .join(Document, Document.id == DocumentChunk.document_id)
+            .filter(
+                Document.owner_id == owner_id,
+                DocumentChunk.content_hash.in_(hashes),
+                DocumentChunk.vector_id.isnot(None),
+            )
+            .all()
+        )
+        return {content_hash: vector_id for content_hash, vector_id in rows}
+    
+    def copy_from_document(self, db: Session, *, source_id: int, target_id: int) -> int:
+        """Copy all chunks of one document to another in a single statement"""
+        table = DocumentChunk.__table__
+        columns = [c for c in table.columns if c.name not in ("id", "document_id")]
+        source = select(literal(target_id), *columns).where(table.c.document_id == source_id)
+        result = db.execute(
+            insert(table).from_select(["document_id", *[c.name for c in columns]], source)
+        )
+        db.commit()
+        return result.rowcount
+    
+    def remove_by_document(self, db: Session, *, document_id: int) -> int:
+        """Delete all chunks of a document, with the chat references to them"""
+        chunk_ids = select(DocumentChunk.id).where(DocumentChunk.document_id == document_id)
+        (
+            db.query(MessageChunkReference)
+            .filter(MessageChunkReference.chunk_id.in_(chunk_ids))
+            .delete(synchronize_session=False)
+        )
+        count = (
+            db.query(DocumentChunk)
+            .filter(DocumentChunk.document_id == document_id)
+            .delete(synchronize_session=False)
+        )
+        db.commit()
+        return count
+    
+    def remove_by_ids(self, db: Session, *, ids: Sequence[int]) -> int:
+        """Delete chunks by ID, with the chat references to them"""
+        if not ids:
+            return 0
+        # Bulk deletes skip the ORM cascade, and databases created before
+        # the reference's ON DELETE CASCADE would reject the delete
+        (
+            db.query(MessageChunkReference)
+            .filter(MessageChunkReference.chunk_id.in_(ids))
+            .delete(synchronize_session=False)
+        )
+        count = (
+            db.query(DocumentChunk)
+            .filter(DocumentChunk.id.in_(ids))
+            .delete(synchronize_session=False)
+        )
+        db.commit()
+        return count
+    
+    def bulk_update_positions(self, db: Session, *, rows: Sequence[Dict[str, Any]]) -> None:
+        """Move chunks to new positions, rows carry `id`, `chunk_index` and `metadata`"""
+        if not rows:
+            return
+        table = DocumentChunk.__table__
+        db.execute(
+            update(table)
+            .where(table.c.id == bindparam("_id"))
+            .values(chunk_index=bindparam("_chunk_index"), metadata=bindparam("_metadata")),
+            [
+                {"_id": r["id"], "_chunk_index": r["chunk_index"], "_metadata": r["metadata"]}
+                for r in rows
+            ],
+        )
+        db.commit()
+    
+    def bulk_set_vector_ids(self, db: Session, *, rows: Sequence[Dict[str, Any]]) -> None:
+        """Point chunks at their vectors, rows carry `id` and `vector_id`"""
+        if not rows:
+            return
+        table = DocumentChunk.__table__
+        db.execute(
+            update(table)
+            .where(table.c.id == bindparam("_id"))
+            .values(vector_id=bindparam("_vector_id")),
+            [{"_id": r["id"], "_vector_id": r["vector_id"]} for r in rows],
+        )
+        db.commit()
+    
+    def bulk_set_token_counts(self, db: Session, *, key: str, tokenizer: str, counts: Dict[int, int]) -> None:
+        """Store token counts of chunks under `metadata[key][tokenizer]`, keeping the rest of their metadata"""
+        if not counts:
+            return
+        table = DocumentChunk.__table__
+        rows = db.execute(select(table.c.id, table.c.metadata).where(table.c.id.in_(list(counts)))).all()
+        updated = []
+        for chunk_id, metadata in rows:
+            metadata = dict(metadata or {})
+            metadata[key] = {**(metadata.get(key) or {}), tokenizer: counts[chunk_id]}
+            updated.append({"_id": chunk_id, "_metadata": metadata})
+        if updated:
+            db.execute(
+                update(table).where(table.c.id == bindparam("_id")).values(metadata=bindparam("_metadata")),
+                updated,
+            )
+        db.commit()
+    
+    def get_unreferenced_vector_ids(
+        self, db: Session, *, vector_ids: Iterable[str], collection_id: Optional[int]
+    ) -> List[str]:
+        """Return the vector IDs no chunk in a collection, or outside all collections, points at"""
+        vector_ids = set(vector_ids)
+        if not vector_ids:
+            return []
+        if collection_id is None:
+            in_collection = Document.collection_id.is_(None)
+        else:
+            in_collection = Document.collection_id == collection_id
+        referenced = {
+            vector_id
+            for (vector_id,) in db.query(DocumentChunk.vector_id)
+            .join(Document, Document.id == DocumentChunk.document_id)
+            .filter(DocumentChunk.vector_id.in_(vector_ids), in_collection)
+            .distinct()
+        }
+        return sorted(vector_ids - referenced)
+    
+    def bulk_create(
+        self, db: Session, *, rows: Sequence[Dict[str, Any]], batch_size: int = 1000
+    ) -> List[int]:
+        """
+        Insert chunk rows in batches and return their IDs in input order.
+        
+        Each row is a dict of `DocumentChunk` column values. Rows bypass the
+        ORM unit of work: PostgreSQL receives each batch through a single COPY
+        with IDs reserved from the sequence up front, other databases get one
+        multi-row INSERT ... RETURNING. The session commits once per batch.
+        """
+        ids: List[int] = []
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            if db.get_bind().dialect.name == "postgresql":
+                ids.extend(self._copy_batch(db, batch))
+            else:
+                ids.extend(self._insert_batch(db, batch))
+            db.commit()
+        return ids
+    
+    def _insert_batch(self, db: Session, batch: Sequence[Dict[str, Any]]) -> List[int]:
+        table = DocumentChunk.__table__
+        result = db.execute(
+            insert(table).returning(table.c.id, sort_by_parameter_order=True),
+            list(batch),
+        )
+        return list(result.scalars())
+    
+    def _copy_batch(self, db: Session, batch: Sequence[Dict[str, Any]]) -> List[int]:
+        table = DocumentChunk.__table__
+        ids = list(
+            db.execute(
+                text(
+                    "SELECT nextval(pg_get_serial_sequence(:table, 'id')) "
+                    "FROM generate_series(1, :count)"
+                ),
+                {"table": table.name, "count": len(batch)},
+            ).scalars()
+        )
+        columns = [c.name for c in table.columns]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for id, row in zip(ids, batch):
+            values = {**row, "id": id}
+            writer.writerow([self._copy_value(values.get(c)) for c in columns])
+        buffer.seek(0)
+        
+        cursor = db.connection().connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+                buffer,
+            )
+        finally:
+            cursor.close()
+        return ids
+    
+    @staticmethod
+    def _copy_value(value: Any) -> Any:
+        if isinstance(value, (dict, list)):
+            return json.dumps(value)
+        return value
+
+document_chunk = CRUDDocumentChunk(DocumentChunk)
\ No newline at end of file
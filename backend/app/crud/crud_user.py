@@ -2,6 +2,7 @@ from typing import Any, Dict, Optional, Union
 
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
 from app.core.security import get_password_hash, verify_password
 from app.crud.base import CRUDBase
 from app.models.user import User
@@ -61,9 +62,8 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
         return user.is_active
     
     def is_superuser(self, user: User) -> bool:
-        """Check if a user is a superuser"""
-        admin_role = db.query(Role).filter(Role.name == "admin").first()
-        return admin_role in user.roles
+        """Check if a user is a superuser, the first superuser of the settings or an admin"""
+        return user.email == settings.FIRST_SUPERUSER or any(role.name == "admin" for role in user.roles)
     
     def add_role(self, db: Session, *, user: User, role: Role) -> User:
         """Add a role to a user"""
@@ -1,14 +1,28 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.api_v1.api import api_router
 from app.core.config import settings
+from app.services.llm import close_providers
+from app.services.search_client import close_elasticsearch, get_elasticsearch
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Every API process shares one Elasticsearch connection pool across requests
+    if settings.LEXICAL_BACKEND == "elasticsearch":
+        get_elasticsearch().open()
+    yield
+    await close_elasticsearch()
+    await close_providers()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     description="Extensible RAG API",
     version="0.1.0",
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan,
 )
 
 # CORS middleware setup
@@ -0,0 +1,7 @@
+from app.models.user import User, user_role
+from app.models.role import Permission, Role, role_permission
+from app.models.document import Document
+from app.models.collection import Collection
+from app.models.document_chunk import DocumentChunk, MessageChunkReference
+from app.models.conversation import Conversation
+from app.models.message import Message
\ No newline at end of file
@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import List, Optional
 
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Text, JSON
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.base_class import Base
@@ -15,6 +15,7 @@ class Collection(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     owner_id: Mapped[int] = mapped_column(Integer, ForeignKey("user.id"))
+    vector_index: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)  # Quantization settings of the vector store
     
     # Relationships
     owner: Mapped["User"] = relationship("User", back_populates="collections")
@@ -14,6 +14,8 @@ class Conversation(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     user_id: Mapped[int] = mapped_column(Integer, ForeignKey("user.id"))
+    summary: Mapped[Optional[str]] = mapped_column(Text, nullable=True)  # Rolling summary of the older messages
+    summarized_until: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)  # Last message ID in the summary
     
     # Relationships
     user: Mapped["User"] = relationship("User", back_populates="conversations")
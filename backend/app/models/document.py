@@ -16,12 +16,13 @@ class Document(Base):
     file_type: Mapped[str] = mapped_column(String)
     file_size: Mapped[int] = mapped_column(Integer)
     s3_path: Mapped[str] = mapped_column(String)
+    content_hash: Mapped[Optional[str]] = mapped_column(String(64), index=True, nullable=True)  # SHA-256 of the file
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     owner_id: Mapped[int] = mapped_column(Integer, ForeignKey("user.id"))
     collection_id: Mapped[Optional[int]] = mapped_column(Integer, ForeignKey("collection.id"), nullable=True)
     status: Mapped[str] = mapped_column(String, default="pending")  # pending, processing, indexed, error
-    metadata: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
+    metadata_: Mapped[Optional[dict]] = mapped_column("metadata", JSON, nullable=True)  # `metadata` is reserved by SQLAlchemy
     
     # Relationships
     owner: Mapped["User"] = relationship("User", back_populates="documents")
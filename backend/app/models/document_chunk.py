@@ -1,6 +1,6 @@
 from typing import List, Optional
 
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Text, JSON
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Index, Integer, String, Text, JSON
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.base_class import Base
@@ -8,24 +8,29 @@ from app.db.base_class import Base
 class DocumentChunk(Base):
     """Model for storing document chunks used for vector search"""
     
+    # Neighbour lookups read ranges of chunk indexes within a document
+    __table_args__ = (Index("ix_documentchunk_document_id_chunk_index", "document_id", "chunk_index"),)
+    
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     document_id: Mapped[int] = mapped_column(Integer, ForeignKey("document.id"))
     content: Mapped[str] = mapped_column(Text)
     chunk_index: Mapped[int] = mapped_column(Integer)
-    metadata: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
+    content_hash: Mapped[Optional[str]] = mapped_column(String(64), index=True, nullable=True)  # SHA-256 of the content
+    metadata_: Mapped[Optional[dict]] = mapped_column("metadata", JSON, nullable=True)
     vector_id: Mapped[Optional[str]] = mapped_column(String, nullable=True)  # ID in the vector store
     
     # Relationships
     document: Mapped["Document"] = relationship("Document", back_populates="chunks")
-    message_references: Mapped[List["MessageChunkReference"]] = relationship("MessageChunkReference", back_populates="chunk")
+    # Citations go with the chunk, left to the database when not loaded
+    message_references: Mapped[List["MessageChunkReference"]] = relationship("MessageChunkReference", back_populates="chunk", cascade="all, delete-orphan", passive_deletes=True)
 
 class MessageChunkReference(Base):
     """Model for tracking which chunks are referenced in message responses"""
     
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     message_id: Mapped[int] = mapped_column(Integer, ForeignKey("message.id"))
-    chunk_id: Mapped[int] = mapped_column(Integer, ForeignKey("documentchunk.id"))
-    relevance_score: Mapped[float] = mapped_column(Integer)
+    chunk_id: Mapped[int] = mapped_column(Integer, ForeignKey("documentchunk.id", ondelete="CASCADE"))
+    relevance_score: Mapped[float] = mapped_column(Float)
     
     # Relationships
     message: Mapped["Message"] = relationship("Message", back_populates="chunk_references")
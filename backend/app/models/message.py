@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import List, Optional
 
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Text, JSON
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, Text, JSON
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.base_class import Base
@@ -9,12 +9,15 @@ from app.db.base_class import Base
 class Message(Base):
     """Model for storing conversation messages"""
     
+    # Chat reads the latest messages of a conversation, newest first
+    __table_args__ = (Index("ix_message_conversation_id_id", "conversation_id", "id"),)
+    
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     conversation_id: Mapped[int] = mapped_column(Integer, ForeignKey("conversation.id"))
     role: Mapped[str] = mapped_column(String)  # user, assistant, system
     content: Mapped[str] = mapped_column(Text)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
-    metadata: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)  # Additional message metadata (tokens, model, etc.)
+    metadata_: Mapped[Optional[dict]] = mapped_column("metadata", JSON, nullable=True)  # Additional message metadata (tokens, model, etc.)
     
     # Relationships
     conversation: Mapped["Conversation"] = relationship("Conversation", back_populates="messages")
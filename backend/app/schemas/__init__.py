@@ -1,5 +1,7 @@
 from app.schemas.token import Token, TokenPayload
 from app.schemas.user import User, UserCreate, UserInDB, UserUpdate
 from app.schemas.document import Document, DocumentCreate, DocumentUpdate
-from app.schemas.collection import Collection, CollectionCreate, CollectionUpdate
-from app.schemas.conversation import Conversation, ConversationCreate, Message, MessageCreate
\ No newline at end of file
+from app.schemas.document_chunk import DocumentChunk, DocumentChunkCreate, DocumentChunkUpdate
+from app.schemas.collection import Collection, CollectionCreate, CollectionUpdate, VectorIndexConfig
+from app.schemas.conversation import ChatRequest, ChatResponse, Conversation, ConversationCreate, ConversationWithMessages, Message, MessageCreate
+from app.schemas.search import RetrievalResult, RetrievedChunk, SearchOptions
\ No newline at end of file
@@ -1,12 +1,29 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Literal, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, model_validator
+
+from app.core.config import settings
+
+# Vector store settings
+class VectorIndexConfig(BaseModel):
+    quantization: Literal["none", "int8", "pq"] = "none"
+    pq_subvectors: Optional[int] = Field(None, gt=0)  # Defaults to one per 8 dimensions
+    rescore: int = Field(4, ge=1)  # Candidates re-scored with full vectors, as a multiple of k
+    
+    @model_validator(mode="after")
+    def check_pq_subvectors(self) -> "VectorIndexConfig":
+        if self.pq_subvectors and settings.EMBEDDING_DIMENSION % self.pq_subvectors:
+            raise ValueError(
+                f"pq_subvectors must divide the embedding dimension {settings.EMBEDDING_DIMENSION}"
+            )
+        return self
 
 # Shared properties
 class CollectionBase(BaseModel):
     name: str
     description: Optional[str] = None
+    vector_index: Optional[VectorIndexConfig] = None
 
 # Properties to receive via API on creation
 class CollectionCreate(CollectionBase):
@@ -1,7 +1,9 @@
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 
-from pydantic import BaseModel
+from pydantic import AliasChoices, BaseModel, Field
+
+from app.schemas.search import SearchOptions
 
 # Message schemas
 class MessageBase(BaseModel):
@@ -15,7 +17,7 @@ class Message(MessageBase):
     id: int
     conversation_id: int
     created_at: datetime
-    metadata: Optional[Dict[str, Any]] = None
+    metadata: Optional[Dict[str, Any]] = Field(None, validation_alias=AliasChoices("metadata_", "metadata"))
     
     class Config:
         from_attributes = True
@@ -35,16 +37,20 @@ class Conversation(ConversationBase):
     created_at: datetime
     updated_at: datetime
     user_id: int
-    messages: List[Message] = []
+    summary: Optional[str] = None  # Of the messages before the latest turns
     
     class Config:
         from_attributes = True
 
+# A conversation with a page of its latest messages
+class ConversationWithMessages(Conversation):
+    messages: List[Message] = []
+
 # Chat request/response schemas
 class ChatRequest(BaseModel):
     conversation_id: Optional[int] = None
     message: str
-    search_options: Optional[Dict[str, Any]] = None
+    search_options: Optional[SearchOptions] = None
 
 class ChatResponse(BaseModel):
     conversation_id: int
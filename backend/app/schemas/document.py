@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import Dict, List, Optional
 
-from pydantic import BaseModel
+from pydantic import AliasChoices, BaseModel, Field
 
 # Shared properties
 class DocumentBase(BaseModel):
@@ -16,7 +16,6 @@ class DocumentCreate(DocumentBase):
 # Properties to receive via API on update
 class DocumentUpdate(DocumentBase):
     title: Optional[str] = None
-    status: Optional[str] = None
 
 # Properties to return via API
 class Document(DocumentBase):
@@ -25,11 +24,12 @@ class Document(DocumentBase):
     file_type: str
     file_size: int
     s3_path: str
+    content_hash: Optional[str] = None
     created_at: datetime
     updated_at: datetime
     owner_id: int
     status: str
-    metadata: Optional[Dict] = None
+    metadata: Optional[Dict] = Field(None, validation_alias=AliasChoices("metadata_", "metadata"))
     
     class Config:
         from_attributes = True
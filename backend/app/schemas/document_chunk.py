@@ -0,0 +1,28 @@
+from typing import Dict, Optional
+
+from pydantic import AliasChoices, BaseModel, Field
+
+# Shared properties
+class DocumentChunkBase(BaseModel):
+    content: str
+    chunk_index: int
+    metadata: Optional[Dict] = Field(None, validation_alias=AliasChoices("metadata_", "metadata"))
+
+# Properties to receive on creation
+class DocumentChunkCreate(DocumentChunkBase):
+    document_id: int
+    content_hash: Optional[str] = None
+
+# Properties to receive on update
+class DocumentChunkUpdate(BaseModel):
+    vector_id: Optional[str] = None
+    metadata: Optional[Dict] = None
+
+# Properties to return via API
+class DocumentChunk(DocumentChunkBase):
+    id: int
+    document_id: int
+    vector_id: Optional[str] = None
+    
+    class Config:
+        from_attributes = True
\ No newline at end of file
@@ -0,0 +1,40 @@
+from typing import List, Literal, Optional, Tuple
+
+from pydantic import BaseModel
+
+# Retrieval options of a chat request
+class SearchOptions(BaseModel):
+    collection_ids: List[int] = []  # Empty searches all collections of the user
+    use_semantic_search: bool = True
+    use_lexical_search: bool = True
+    max_results: int = 5
+    fusion: Literal["rrf", "weighted"] = "rrf"
+    semantic_weight: float = 0.5  # Share of the semantic score in weighted fusion
+    rerank: bool = False  # Rescore fused candidates with the cross-encoder
+    rerank_candidates: int = 30
+    rerank_budget_ms: Optional[float] = 250  # Unscored candidates keep their fused order
+    diversify: bool = False  # Skip near-duplicate candidates with maximal marginal relevance
+    mmr_lambda: float = 0.7  # 1 ranks by relevance only, 0 by novelty only
+    mmr_candidates: int = 20  # Candidates to pick from when diversifying or capping
+    max_per_document: Optional[int] = None  # Chunks allowed from one document
+    neighbour_chunks: int = 0  # Chunks before and after each hit added to its content
+
+# A retrieved chunk
+class RetrievedChunk(BaseModel):
+    chunk_id: int
+    document_id: int
+    chunk_index: int
+    content: str
+    score: float
+    semantic_rank: Optional[int] = None
+    lexical_rank: Optional[int] = None
+    rerank_score: Optional[float] = None
+    metadata: Optional[dict] = None
+    window: Optional[Tuple[int, int]] = None  # First and last chunk index in the content when expanded
+
+# Retrieved chunks and how long reranking them took
+class RetrievalResult(BaseModel):
+    chunks: List[RetrievedChunk]
+    reranked: int = 0  # Candidates scored by the cross-encoder
+    rerank_ms: Optional[float] = None  # None when reranking was not requested or cached
+    cached: bool = False
\ No newline at end of file
@@ -0,0 +1,140 @@
+import base64
+import hashlib
+import json
+import logging
+from functools import lru_cache
+from typing import Optional, Sequence
+
+import numpy as np
+import redis
+
+from app.core.config import settings
+from app.schemas.search import SearchOptions
+from app.services.diversity import _unit
+from app.services.retrieval_cache import RetrievalCache, get_retrieval_cache, normalize_query
+
+logger = logging.getLogger(__name__)
+
+class AnswerCache:
+    """
+    Final chat answers, with the chunks they were based on, cached in Redis.
+    
+    Entries are grouped in scopes: the models involved, the version of the
+    prompt templates, the owner, the sorted set of searched collections, the
+    search options and the current version of every one of those
+    collections, as kept by the retrieval cache. A change to any of them
+    starts a new scope, and entries of older scopes are never read again and
+    expire after `ttl_seconds`.
+    
+    Within a scope an entry is found by its normalized question. With a
+    `similarity` above zero the questions of the latest
+    `max_similar_questions` entries of the scope are also kept as
+    embeddings, and a question at least that similar to one of them gets its
+    answer.
+    
+    Redis errors are logged and treated as misses, so chat keeps working
+    when the cache is unavailable.
+    """
+    
+    def __init__(
+        self,
+        client: redis.Redis,
+        versions: RetrievalCache,
+        ttl_seconds: int,
+        *,
+        similarity: float = 0,
+        max_similar_questions: int = 1000,
+        prefix: str = "answer:",
+    ):
+        self.client = client
+        self.versions = versions
+        self.ttl_seconds = ttl_seconds
+        self.similarity = similarity
+        self.max_similar_questions = max_similar_questions
+        self.prefix = prefix
+    
+    @property
+    def semantic(self) -> bool:
+        return self.similarity > 0
+    
+    def scope(
+        self,
+        *,
+        model_names: Sequence[str],
+        prompt_version: int,
+        owner_id: int,
+        collection_ids: Sequence[Optional[int]],
+        options: SearchOptions,
+    ) -> Optional[str]:
+        """Scope of the answers to a question, None when the collection versions cannot be read"""
+        collections = sorted(collection_ids, key=lambda i: -1 if i is None else i)
+        versions = self.versions.versions(owner_id, collections)
+        if versions is None:
+            return None
+        payload = json.dumps(
+            {
+                "models": list(model_names),
+                "prompt_version": prompt_version,
+                "owner_id": owner_id,
+                "collections": collections,
+                "versions": versions,
+                "options": options.model_dump(exclude={"collection_ids"}),
+            },
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def _key(self, scope: str, question: str) -> str:
+        digest = hashlib.sha256(normalize_query(question).encode("utf-8")).hexdigest()
+        return f"{self.prefix}entry:{scope}:{digest}"
+    
+    def _questions_key(self, scope: str) -> str:
+        return f"{self.prefix}questions:{scope}"
+    
+    def get(self, scope: str, question: str, vector: Optional[np.ndarray] = None) -> Optional[dict]:
+        """The cached entry of the question, or of the most similar cached question when embedded"""
+        try:
+            value = self.client.get(self._key(scope, question))
+            if value is None and vector is not None and self.semantic:
+                key = self._most_similar(scope, vector)
+                value = None if key is None else self.client.get(key)
+        except redis.RedisError as e:
+            logger.warning("Answer cache unavailable: %s", e)
+            return None
+        return None if value is None else json.loads(value)
+    
+    def _most_similar(self, scope: str, vector: np.ndarray) -> Optional[str]:
+        entries = [json.loads(entry) for entry in self.client.lrange(self._questions_key(scope), 0, -1)]
+        if not entries:
+            return None
+        matrix = np.stack([np.frombuffer(base64.b64decode(e["vector"]), dtype=np.float32) for e in entries])
+        similarities = matrix @ _unit(vector)
+        best = int(np.argmax(similarities))
+        return entries[best]["key"] if similarities[best] >= self.similarity else None
+    
+    def put(self, scope: str, question: str, value: dict, vector: Optional[np.ndarray] = None) -> None:
+        key = self._key(scope, question)
+        try:
+            self.client.set(key, json.dumps(value), ex=self.ttl_seconds)
+            if vector is not None and self.semantic:
+                questions = self._questions_key(scope)
+                entry = {"key": key, "vector": base64.b64encode(_unit(vector).tobytes()).decode("ascii")}
+                self.client.lpush(questions, json.dumps(entry))
+                self.client.ltrim(questions, 0, self.max_similar_questions - 1)
+                self.client.expire(questions, self.ttl_seconds)
+        except redis.RedisError as e:
+            logger.warning("Answer cache unavailable: %s", e)
+
+@lru_cache()
+def get_answer_cache() -> Optional[AnswerCache]:
+    """Return the process-wide answer cache, None when disabled in settings"""
+    if not settings.ANSWER_CACHE:
+        return None
+    client = redis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, socket_timeout=1)
+    return AnswerCache(
+        client,
+        get_retrieval_cache(),
+        settings.ANSWER_CACHE_TTL,
+        similarity=settings.ANSWER_CACHE_SIMILARITY,
+        max_similar_questions=settings.ANSWER_CACHE_SIMILAR_QUESTIONS,
+    )
\ No newline at end of file
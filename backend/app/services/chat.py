@@ -0,0 +1,314 @@
+import logging
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app import crud
+from app.core.config import settings
+from app.models.conversation import Conversation
+from app.models.message import Message
+from app.schemas.conversation import ConversationCreate
+from app.schemas.search import RetrievalResult, RetrievedChunk, SearchOptions
+from app.services.answer_cache import AnswerCache, get_answer_cache
+from app.services.context import TOKEN_COUNTS_KEY, ContextPacker, get_context_packer
+from app.services.llm import ChatModel, LLMError, get_chat_model
+from app.services.retrieval import HybridRetriever, get_retriever, merge_results
+
+SYSTEM_PROMPT = (
+    "You answer questions about the user's documents. Use only the numbered context passages "
+    "below, cite them as [n], and say so when they do not contain the answer."
+)
+SUMMARY_PROMPT = (
+    "You keep a running summary of a conversation about the user's documents. Update the summary "
+    "with the numbered messages below, keep names, figures and open questions, and reply with the "
+    "new summary only."
+)
+# Bump when the prompts change, so cached answers to the old ones are not used
+PROMPT_VERSION = 1
+
+logger = logging.getLogger(__name__)
+
+def system_prompt(summary: Optional[str] = None) -> str:
+    """The system prompt up to its context passages, with the summary of earlier messages if any"""
+    if summary:
+        return f"{SYSTEM_PROMPT}\n\nSummary of the earlier conversation:\n{summary}\n\nContext:\n"
+    return f"{SYSTEM_PROMPT}\n\nContext:\n"
+
+def build_prompt(
+    history: Sequence[Dict[str, str]],
+    question: str,
+    chunks: Sequence[RetrievedChunk],
+    summary: Optional[str] = None,
+) -> List[Dict[str, str]]:
+    """Chat messages with the retrieved chunks as numbered passages in the system prompt"""
+    if chunks:
+        context = "\n\n".join(f"[{i}] {chunk.content}" for i, chunk in enumerate(chunks, start=1))
+    else:
+        context = "No passages were found."
+    return [
+        {"role": "system", "content": system_prompt(summary) + context},
+        *history,
+        {"role": "user", "content": question},
+    ]
+
+def build_summary_prompt(summary: Optional[str], messages: Sequence[Message]) -> List[Dict[str, str]]:
+    """Chat messages asking for the summary updated with older messages"""
+    numbered = "\n".join(
+        f"[{i}] {message.role}: {message.content}" for i, message in enumerate(messages, start=1)
+    )
+    return [
+        {
+            "role": "system",
+            "content": f"{SUMMARY_PROMPT}\n\nSummary:\n{summary or 'Nothing yet.'}\n\nMessages:\n{numbered}",
+        },
+        {"role": "user", "content": "Write the updated summary."},
+    ]
+
+def retrieval_queries(history: Sequence[Dict[str, str]], question: str) -> List[str]:
+    """Search queries of a question, a follow-up is also searched after the previous question"""
+    previous = next((m["content"] for m in reversed(history) if m["role"] == "user"), None)
+    if previous is None:
+        return [question]
+    return [question, f"{previous}\n{question}"]
+
+def chunk_summary(chunk: RetrievedChunk) -> dict:
+    """What clients are told about a retrieved chunk, without its content"""
+    return chunk.model_dump(exclude={"content"})
+
+@dataclass
+class ChatTurn:
+    """A question being answered, from retrieval until its answer is stored"""
+    conversation: Conversation
+    question: str
+    retrieval: RetrievalResult
+    chunks: List[RetrievedChunk]  # The retrieved chunks that fit in the prompt
+    prompt: List[Dict[str, str]]
+    prompt_tokens: int
+    started: float  # perf_counter() when the question came in
+    first_token: Optional[float] = None
+    answer: Optional[str] = None  # From the answer cache, the model is not asked
+    cache_scope: Optional[str] = None  # Set when the answer is to be cached
+    question_vector: Optional[np.ndarray] = None  # For semantic answer cache lookups
+
+class ChatService:
+    """
+    Answer a question in a conversation with retrieved chunks as context.
+    
+    A turn is split so callers can stream it: `start` stores the question,
+    retrieves chunks and packs as many of them and of the history as fit
+    into the prompt, `stream` yields the model's tokens as they arrive, and
+    `finish` stores the answer with references to the chunks it was given.
+    
+    Only the newest messages of a conversation are loaded, in one bounded
+    query. Older ones are folded into a rolling summary on the conversation
+    by `summarize`, `summary_turns` turns at a time once that many have
+    built up beyond the newest `history_turns`, so a turn costs the same
+    however long the conversation is.
+    
+    A follow-up question is searched on its own and after the previous
+    question, which names what a short follow-up refers to. Both queries
+    go to the retriever as one batch and their results are fused.
+    
+    With an answer cache, a question asked without history is looked up
+    before retrieval. A hit is stored and streamed as the answer without
+    asking the model, and the answers of misses are cached by `finish`.
+    """
+    
+    def __init__(
+        self,
+        retriever: HybridRetriever,
+        model: ChatModel,
+        packer: ContextPacker,
+        *,
+        history_turns: int = 10,
+        summary_turns: int = 10,
+        answer_cache: Optional[AnswerCache] = None,
+    ):
+        self.retriever = retriever
+        self.model = model
+        self.packer = packer
+        self.history_turns = history_turns
+        self.summary_turns = summary_turns
+        self.answer_cache = answer_cache
+    
+    async def start(
+        self,
+        db: Session,
+        *,
+        conversation: Optional[Conversation],
+        user_id: int,
+        question: str,
+        options: Optional[SearchOptions] = None,
+    ) -> ChatTurn:
+        """Store the question in a conversation, new if none is given, and retrieve its context"""
+        started = time.perf_counter()
+        if conversation is None:
+            conversation = await run_in_threadpool(
+                crud.conversation.create_with_user,
+                db,
+                obj_in=ConversationCreate(title=" ".join(question.split())[:80]),
+                user_id=user_id,
+            )
+            history: List[Dict[str, str]] = []
+        else:
+            # Messages not folded into the summary yet are loaded as well
+            messages = await run_in_threadpool(
+                crud.conversation.get_messages,
+                db,
+                conversation_id=conversation.id,
+                limit=2 * (self.history_turns + self.summary_turns),
+                after_id=conversation.summarized_until,
+            )
+            history = [{"role": message.role, "content": message.content} for message in messages]
+        summary = conversation.summary
+        options = options or SearchOptions()
+        scope = vector = None
+        if self.answer_cache is not None and not history and not summary:
+            scope, vector, cached = await self._cached_answer(db, question, user_id, options)
+            if cached is not None:
+                await run_in_threadpool(
+                    crud.conversation.add_message, db, conversation=conversation, role="user", content=question
+                )
+                chunks = [RetrievedChunk(**chunk) for chunk in cached["chunks"]]
+                retrieval = RetrievalResult(chunks=chunks, cached=True)
+                return ChatTurn(
+                    conversation, question, retrieval, chunks, [], 0, started, answer=cached["answer"]
+                )
+        # Both queries of a follow-up are embedded and searched as one batch
+        results = await self.retriever.retrieve_many(
+            db, retrieval_queries(history, question), owner_id=user_id, options=options
+        )
+        retrieval = merge_results(results, options.max_results, self.retriever.rrf_k)
+        await run_in_threadpool(
+            crud.conversation.add_message, db, conversation=conversation, role="user", content=question
+        )
+        packed = await run_in_threadpool(
+            self.packer.pack, system_prompt(summary), history, question, retrieval.chunks
+        )
+        if packed.token_counts:
+            await run_in_threadpool(
+                crud.document_chunk.bulk_set_token_counts,
+                db,
+                key=TOKEN_COUNTS_KEY,
+                tokenizer=self.packer.tokenizer.name,
+                counts=packed.token_counts,
+            )
+        prompt = build_prompt(packed.history, question, packed.chunks, summary)
+        return ChatTurn(
+            conversation,
+            question,
+            retrieval,
+            packed.chunks,
+            prompt,
+            packed.tokens,
+            started,
+            cache_scope=scope,
+            question_vector=vector,
+        )
+    
+    async def _cached_answer(
+        self, db: Session, question: str, owner_id: int, options: SearchOptions
+    ) -> Tuple[Optional[str], Optional[np.ndarray], Optional[dict]]:
+        """Look a question up in the answer cache, with the scope and embedding to cache its answer under"""
+        collection_ids = options.collection_ids or await run_in_threadpool(
+            crud.document.get_collection_ids, db, owner_id=owner_id
+        )
+        model_names = [self.model.name, self.retriever.embedder.model_name]
+        if options.rerank and self.retriever.reranker is not None:
+            model_names.append(self.retriever.reranker.model.name)
+        scope = await run_in_threadpool(
+            self.answer_cache.scope,
+            model_names=model_names,
+            prompt_version=PROMPT_VERSION,
+            owner_id=owner_id,
+            collection_ids=collection_ids,
+            options=options,
+        )
+        if scope is None:
+            return None, None, None
+        vector = (await self.retriever.embedder.aembed([question]))[0] if self.answer_cache.semantic else None
+        return scope, vector, await run_in_threadpool(self.answer_cache.get, scope, question, vector)
+    
+    async def stream(self, turn: ChatTurn) -> AsyncIterator[str]:
+        if turn.answer is not None:
+            turn.first_token = time.perf_counter()
+            yield turn.answer
+            return
+        async for token in self.model.stream(turn.prompt):
+            if turn.first_token is None:
+                turn.first_token = time.perf_counter()
+            yield token
+    
+    async def finish(self, db: Session, turn: ChatTurn, answer: str) -> Message:
+        """Store the answer of a turn"""
+        metadata = {
+            "model": self.model.name,
+            "retrieval_cached": turn.retrieval.cached,
+            "answer_cached": turn.answer is not None,
+            "reranked": turn.retrieval.reranked,
+            "rerank_ms": turn.retrieval.rerank_ms,
+            "prompt_tokens": turn.prompt_tokens,
+            "first_token_ms": None if turn.first_token is None else (turn.first_token - turn.started) * 1000,
+            "total_ms": (time.perf_counter() - turn.started) * 1000,
+        }
+        message = await run_in_threadpool(
+            crud.conversation.add_message,
+            db,
+            conversation=turn.conversation,
+            role="assistant",
+            content=answer,
+            metadata=metadata,
+            chunk_scores=[(chunk.chunk_id, chunk.score) for chunk in turn.chunks],
+        )
+        if turn.cache_scope is not None and answer:
+            await run_in_threadpool(
+                self.answer_cache.put,
+                turn.cache_scope,
+                turn.question,
+                {"answer": answer, "chunks": [chunk.model_dump() for chunk in turn.chunks]},
+                turn.question_vector,
+            )
+        return message
+    
+    async def summarize(self, db: Session, conversation: Conversation) -> bool:
+        """Fold the oldest messages outside the history window into the summary once enough have built up"""
+        summary, messages = await run_in_threadpool(
+            lambda: (
+                conversation.summary,
+                crud.conversation.get_unsummarized(
+                    db, conversation=conversation, keep=2 * self.history_turns, limit=2 * self.summary_turns
+                ),
+            )
+        )
+        if not messages or len(messages) < 2 * self.summary_turns:
+            return False
+        try:
+            summary = "".join([token async for token in self.model.stream(build_summary_prompt(summary, messages))])
+        except LLMError as e:
+            logger.warning("Summarizing conversation %s failed: %s", conversation.id, e)
+            return False
+        await run_in_threadpool(
+            crud.conversation.update_summary,
+            db,
+            conversation=conversation,
+            summary=summary.strip(),
+            summarized_until=messages[-1].id,
+        )
+        return True
+
+@lru_cache()
+def get_chat_service() -> ChatService:
+    """Return the process-wide chat service"""
+    return ChatService(
+        get_retriever(),
+        get_chat_model(),
+        get_context_packer(),
+        history_turns=settings.CHAT_HISTORY_TURNS,
+        summary_turns=settings.CHAT_SUMMARY_TURNS,
+        answer_cache=get_answer_cache(),
+    )
\ No newline at end of file
@@ -0,0 +1,83 @@
+import hashlib
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, List, Optional
+
+from app.core.config import settings
+from app.services.extraction import ExtractedPage
+
+@dataclass
+class TextChunk:
+    """A chunk of document text ready to be stored as a DocumentChunk"""
+    index: int
+    content: str
+    metadata: dict = field(default_factory=dict)
+    content_hash: str = ""
+    
+    def __post_init__(self):
+        if not self.content_hash:
+            self.content_hash = hash_text(self.content)
+
+def hash_text(text: str) -> str:
+    """SHA-256 of whitespace-normalized text"""
+    return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+def split_text(text: str, chunk_size: int, overlap: int) -> List[str]:
+    """
+    Split text into overlapping windows of at most `chunk_size` characters.
+    
+    Windows end on a word boundary where possible, so the same text always
+    produces the same chunks.
+    """
+    text = " ".join(text.split())
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_size, len(text))
+        if end < len(text):
+            boundary = text.rfind(" ", start + chunk_size // 2, end)
+            if boundary != -1:
+                end = boundary
+        chunks.append(text[start:end].strip())
+        if end == len(text):
+            break
+        next_start = max(end - overlap, start + 1)
+        boundary = text.find(" ", next_start, end)
+        start = boundary + 1 if boundary != -1 else next_start
+    return [c for c in chunks if c]
+
+def join_chunks(contents: Iterable[str]) -> str:
+    """
+    Join consecutive chunks of a document back into one text.
+    
+    `split_text` repeats the end of a window at the start of the next one,
+    so the longest start of every chunk that the text so far ends with, cut
+    at a word boundary, is dropped before appending it.
+    """
+    text = ""
+    for content in contents:
+        overlap = 0
+        boundary = content.find(" ")
+        while boundary != -1 and boundary <= len(text):
+            if text.endswith(content[:boundary]):
+                overlap = boundary
+            boundary = content.find(" ", boundary + 1)
+        if len(content) <= len(text) and text.endswith(content):
+            overlap = len(content)
+        rest = content[overlap:].strip()
+        if rest:
+            text = f"{text} {rest}" if text else rest
+    return text
+
+def chunk_pages(
+    pages: Iterable[ExtractedPage],
+    chunk_size: Optional[int] = None,
+    overlap: Optional[int] = None,
+) -> Iterator[TextChunk]:
+    """Chunk a stream of pages without materializing the whole document"""
+    chunk_size = chunk_size or settings.CHUNK_SIZE
+    overlap = settings.CHUNK_OVERLAP if overlap is None else overlap
+    index = 0
+    for page in pages:
+        for content in split_text(page.text, chunk_size, overlap):
+            yield TextChunk(index=index, content=content, metadata={"page": page.page_number})
+            index += 1
\ No newline at end of file
@@ -0,0 +1,166 @@
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Protocol, Sequence, Tuple
+
+from app.core.config import settings
+from app.schemas.search import RetrievedChunk
+
+# Chunk metadata key holding token counts by tokenizer name
+TOKEN_COUNTS_KEY = "token_counts"
+# Role and separators the chat format adds around every message
+MESSAGE_OVERHEAD = 4
+# "[n] " and the blank line before every passage
+PASSAGE_OVERHEAD = 4
+
+class Tokenizer(Protocol):
+    """Minimal interface the packer needs from a tokenizer"""
+    
+    name: str
+    
+    def count(self, texts: Sequence[str]) -> List[int]:
+        ...
+
+class TiktokenTokenizer:
+    """Exact counts for a tiktoken encoding"""
+    
+    def __init__(self, encoding: str = "cl100k_base"):
+        import tiktoken
+        
+        self.name = encoding
+        self._encoding = tiktoken.get_encoding(encoding)
+    
+    def count(self, texts: Sequence[str]) -> List[int]:
+        return [len(tokens) for tokens in self._encoding.encode_ordinary_batch(list(texts))]
+
+class WhitespaceTokenizer:
+    """
+    Dependency-free stand-in counting whitespace-separated words.
+    
+    It is exact for the fake provider, which streams words, and otherwise
+    only meant for tests and development setups.
+    """
+    
+    name = "whitespace"
+    
+    def count(self, texts: Sequence[str]) -> List[int]:
+        return [len(text.split()) for text in texts]
+
+@dataclass
+class PackedContext:
+    history: List[Dict[str, str]]  # Oldest first
+    chunks: List[RetrievedChunk]  # In retrieval order
+    tokens: int  # Of the prompt, without the answer
+    token_counts: Dict[int, int]  # Chunk ID to token count, for chunks that had none cached
+
+class ContextPacker:
+    """
+    Fit the system prompt, conversation history and retrieved chunks into
+    the model's context window.
+    
+    The window minus the tokens kept for the answer is the budget. The
+    system prompt and the question always go in. The newest history
+    messages come next, up to a share of what is left. Chunks are then
+    packed greedily by relevance per token, and any budget left after the
+    chunks goes to older history. Passing over a chunk that does not fit
+    still lets a smaller, less relevant one in.
+    
+    Chunk token counts are cached in the chunk metadata by tokenizer name,
+    so a chunk is tokenized once. Chunks expanded with their neighbours
+    are new text and are always counted.
+    """
+    
+    def __init__(
+        self,
+        tokenizer: Tokenizer,
+        *,
+        context_window: int,
+        answer_tokens: int,
+        history_share: float = 0.25,
+    ):
+        self.tokenizer = tokenizer
+        self.context_window = context_window
+        self.answer_tokens = answer_tokens
+        self.history_share = history_share
+    
+    def chunk_tokens(self, chunks: Sequence[RetrievedChunk]) -> Tuple[List[int], Dict[int, int]]:
+        """Token counts of chunks, and those of stored chunks that had none cached"""
+        counts: List[int] = [0] * len(chunks)
+        missing = []
+        for i, chunk in enumerate(chunks):
+            cached = ((chunk.metadata or {}).get(TOKEN_COUNTS_KEY) or {}).get(self.tokenizer.name)
+            if cached is not None and chunk.window is None:
+                counts[i] = cached
+            else:
+                missing.append(i)
+        new_counts = {}
+        for i, count in zip(missing, self.tokenizer.count([chunks[i].content for i in missing])):
+            counts[i] = count
+            if chunks[i].window is None:
+                new_counts[chunks[i].chunk_id] = count
+        return counts, new_counts
+    
+    def pack(
+        self,
+        system_prompt: str,
+        history: Sequence[Dict[str, str]],
+        question: str,
+        chunks: Sequence[RetrievedChunk],
+    ) -> PackedContext:
+        """Choose the history messages and chunks that fit next to the system prompt and question"""
+        fixed = self.tokenizer.count([system_prompt, question])
+        used = sum(fixed) + 3 * MESSAGE_OVERHEAD  # The answer is primed like a message
+        budget = self.context_window - self.answer_tokens - used
+        
+        history_costs = [
+            count + MESSAGE_OVERHEAD
+            for count in self.tokenizer.count([message["content"] for message in history])
+        ]
+        kept = 0  # Newest history messages included
+        history_used = 0
+        
+        def keep_history(limit: int) -> None:
+            nonlocal kept, history_used
+            while kept < len(history) and history_used + history_costs[-1 - kept] <= limit:
+                history_used += history_costs[-1 - kept]
+                kept += 1
+        
+        keep_history(int(max(budget, 0) * self.history_share))
+        
+        counts, new_counts = self.chunk_tokens(chunks)
+        costs = [count + PASSAGE_OVERHEAD for count in counts]
+        # The retriever's order already reflects reranking and diversification,
+        # which the fused scores do not, so relevance falls with rank
+        order = sorted(range(len(chunks)), key=lambda i: (-1 / ((i + 1) * costs[i]), i))
+        chunk_budget = budget - history_used
+        chosen = set()
+        chunks_used = 0
+        for i in order:
+            if chunks_used + costs[i] <= chunk_budget:
+                chosen.add(i)
+                chunks_used += costs[i]
+        
+        keep_history(budget - chunks_used)
+        
+        return PackedContext(
+            history=list(history[len(history) - kept:]),
+            chunks=[chunk for i, chunk in enumerate(chunks) if i in chosen],
+            tokens=used + history_used + chunks_used,
+            token_counts=new_counts,
+        )
+
+@lru_cache()
+def get_tokenizer() -> Tokenizer:
+    """Return the process-wide tokenizer of the chat model"""
+    if settings.CHAT_TOKENIZER == "whitespace":
+        return WhitespaceTokenizer()
+    return TiktokenTokenizer(settings.CHAT_TOKENIZER)
+
+@lru_cache()
+def get_context_packer() -> ContextPacker:
+    """Return the process-wide context packer"""
+    return ContextPacker(
+        get_tokenizer(),
+        context_window=settings.CHAT_CONTEXT_WINDOW,
+        answer_tokens=settings.CHAT_MAX_TOKENS,
+        history_share=settings.CHAT_HISTORY_SHARE,
+    )
\ No newline at end of file
@@ -0,0 +1,55 @@
+from collections import Counter
+from typing import List, Optional
+
+import numpy as np
+
+from app.schemas.search import RetrievedChunk
+
+def _unit(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1)
+
+def maximal_marginal_relevance(
+    query_vector: np.ndarray, vectors: np.ndarray, k: int, *, lambda_: float = 0.7
+) -> List[int]:
+    """
+    Pick `k` candidates trading relevance against similarity to earlier picks.
+    
+    Every step takes the candidate maximizing `lambda_ * sim(query, c) -
+    (1 - lambda_) * max sim(c, picked)` with cosine similarities. All
+    candidate similarities are computed in one matrix product up front and
+    the running maximum is updated with one vector operation per pick, so
+    selecting from a few dozen candidates costs well under a millisecond.
+    Returns positions into the candidates, in pick order.
+    """
+    n = len(vectors)
+    k = min(k, n)
+    if k <= 0:
+        return []
+    vectors = _unit(vectors)
+    relevance = vectors @ _unit(query_vector)
+    similarity = vectors @ vectors.T
+    
+    redundancy = np.zeros(n, dtype=np.float32)  # Max similarity to any picked candidate
+    available = np.ones(n, dtype=bool)
+    picked = []
+    for _ in range(k):
+        gain = np.where(available, lambda_ * relevance - (1 - lambda_) * redundancy, -np.inf)
+        best = int(np.argmax(gain))
+        picked.append(best)
+        available[best] = False
+        np.maximum(redundancy, similarity[best], out=redundancy)
+    return picked
+
+def cap_per_document(chunks: List[RetrievedChunk], max_per_document: Optional[int]) -> List[RetrievedChunk]:
+    """Drop chunks beyond the first `max_per_document` of each document, keeping the order"""
+    if not max_per_document:
+        return chunks
+    seen: Counter = Counter()
+    kept = []
+    for chunk in chunks:
+        seen[chunk.document_id] += 1
+        if seen[chunk.document_id] <= max_per_document:
+            kept.append(chunk)
+    return kept
\ No newline at end of file
@@ -0,0 +1,254 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Protocol, Sequence
+
+import numpy as np
+import redis
+
+from app.core.config import settings
+from app.services.embeddings import EmbeddingEngine, get_embedding_engine
+
+def cache_key(model_name: str, text: str) -> str:
+    """Key of a text embedded with a model, whitespace differences are ignored"""
+    normalized = " ".join(text.split())
+    return hashlib.sha256(f"{model_name}\0{normalized}".encode("utf-8")).hexdigest()
+
+class EmbeddingStore(Protocol):
+    def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        ...
+    
+    def put_many(self, items: Dict[str, np.ndarray]) -> None:
+        ...
+
+class DiskEmbeddingStore:
+    """
+    Embedding store in a local SQLite file with LRU eviction.
+    
+    The file can be shared by all worker processes on a host. Entries keep
+    their last access time and the least recently used ones are evicted
+    once the stored vectors exceed `max_bytes`.
+    """
+    
+    _BATCH = 500
+    
+    def __init__(self, path: str, max_bytes: int):
+        self.max_bytes = max_bytes
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embedding ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, size INTEGER NOT NULL, "
+            "last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_embedding_last_access ON embedding (last_access)")
+        self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embedding").fetchone()[0]
+    
+    @property
+    def size(self) -> int:
+        """Approximate number of stored vector bytes"""
+        return self._size
+    
+    def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        found: Dict[str, np.ndarray] = {}
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(keys), self._BATCH):
+                batch = list(keys[start:start + self._BATCH])
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embedding WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+                if rows:
+                    hit_keys = [key for key, _ in rows]
+                    self._conn.execute(
+                        f"UPDATE embedding SET last_access = ? WHERE key IN ({','.join('?' * len(hit_keys))})",
+                        [now, *hit_keys],
+                    )
+        return found
+    
+    def put_many(self, items: Dict[str, np.ndarray]) -> None:
+        if not items:
+            return
+        now = time.time()
+        rows = []
+        for key, vector in items.items():
+            blob = np.ascontiguousarray(vector, dtype=np.float32).tobytes()
+            rows.append((key, blob, len(blob), now))
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embedding (key, vector, size, last_access) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.execute("COMMIT")
+            self._size += sum(row[2] for row in rows)
+            if self._size > self.max_bytes:
+                self._evict()
+    
+    def _evict(self) -> None:
+        """Drop least recently used entries until the store is at 90% of its budget"""
+        self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embedding").fetchone()[0]
+        excess = self._size - int(self.max_bytes * 0.9)
+        if excess <= 0:
+            return
+        rows = self._conn.execute("SELECT key, size FROM embedding ORDER BY last_access").fetchall()
+        evict, freed = [], 0
+        for key, size in rows:
+            if freed >= excess:
+                break
+            evict.append((key,))
+            freed += size
+        self._conn.execute("BEGIN")
+        self._conn.executemany("DELETE FROM embedding WHERE key = ?", evict)
+        self._conn.execute("COMMIT")
+        self._size -= freed
+    
+    def close(self) -> None:
+        self._conn.close()
+
+class RedisEmbeddingStore:
+    """Embedding store shared by all hosts through Redis"""
+    
+    def __init__(self, client: redis.Redis, ttl_seconds: int, prefix: str = "embedding:"):
+        self._client = client
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+    
+    def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        if not keys:
+            return {}
+        blobs = self._client.mget([self.prefix + key for key in keys])
+        return {
+            key: np.frombuffer(blob, dtype=np.float32)
+            for key, blob in zip(keys, blobs)
+            if blob is not None
+        }
+    
+    def put_many(self, items: Dict[str, np.ndarray]) -> None:
+        if not items:
+            return
+        pipe = self._client.pipeline(transaction=False)
+        for key, vector in items.items():
+            pipe.set(
+                self.prefix + key,
+                np.ascontiguousarray(vector, dtype=np.float32).tobytes(),
+                ex=self.ttl_seconds,
+            )
+        pipe.execute()
+
+class TieredEmbeddingStore:
+    """Check stores in order, copying hits from slower tiers into faster ones"""
+    
+    def __init__(self, stores: List[EmbeddingStore]):
+        self.stores = stores
+    
+    def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        found: Dict[str, np.ndarray] = {}
+        missing = list(keys)
+        for i, store in enumerate(self.stores):
+            if not missing:
+                break
+            hits = store.get_many(missing)
+            if hits and i > 0:
+                for faster in self.stores[:i]:
+                    faster.put_many(hits)
+            found.update(hits)
+            missing = [key for key in missing if key not in hits]
+        return found
+    
+    def put_many(self, items: Dict[str, np.ndarray]) -> None:
+        for store in self.stores:
+            store.put_many(items)
+
+@dataclass
+class CacheStats:
+    hits: int
+    misses: int
+    
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+class CachedEmbedder:
+    """
+    Embedding engine front that only embeds texts missing from the cache.
+    
+    This is the entry point every caller should use to embed chunks or
+    queries, so repeated texts across collections and re-ingestions are
+    served from the cache.
+    """
+    
+    def __init__(self, engine: EmbeddingEngine, store: EmbeddingStore):
+        self.engine = engine
+        self.store = store
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+    
+    @property
+    def model_name(self) -> str:
+        return self.engine.model_name
+    
+    @property
+    def dimension(self) -> int:
+        return self.engine.dimension
+    
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Embed texts, returning a contiguous float32 array with a row per text"""
+        keys = [cache_key(self.model_name, text) for text in texts]
+        cached = self.store.get_many(list(dict.fromkeys(keys)))
+        missing = list(dict.fromkeys(key for key in keys if key not in cached))
+        if missing:
+            first_text = {}
+            for key, text in zip(keys, texts):
+                first_text.setdefault(key, text)
+            vectors = self.engine.embed([first_text[key] for key in missing])
+            computed = dict(zip(missing, vectors))
+            self.store.put_many(computed)
+            cached.update(computed)
+        
+        with self._lock:
+            self._misses += len(missing)
+            self._hits += len(keys) - len(missing)
+        
+        result = np.empty((len(texts), self.dimension), dtype=np.float32)
+        for row, key in enumerate(keys):
+            result[row] = cached[key]
+        return result
+    
+    async def aembed(self, texts: Sequence[str]) -> np.ndarray:
+        """Embed texts without blocking the event loop"""
+        return await asyncio.get_running_loop().run_in_executor(None, self.embed, texts)
+    
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(hits=self._hits, misses=self._misses)
+
+def build_embedding_store() -> EmbeddingStore:
+    """Build the cache store configured in settings"""
+    stores: List[EmbeddingStore] = [
+        DiskEmbeddingStore(settings.EMBEDDING_CACHE_PATH, settings.EMBEDDING_CACHE_MAX_BYTES)
+    ]
+    if settings.EMBEDDING_CACHE_REDIS:
+        client = redis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT)
+        stores.append(RedisEmbeddingStore(client, settings.EMBEDDING_CACHE_REDIS_TTL))
+    return stores[0] if len(stores) == 1 else TieredEmbeddingStore(stores)
+
+@lru_cache()
+def get_embedder() -> CachedEmbedder:
+    """Return the process-wide cached embedder"""
+    return CachedEmbedder(get_embedding_engine(), build_embedding_store())
\ No newline at end of file
@@ -0,0 +1,242 @@
+import asyncio
+import hashlib
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Deque, List, Optional, Protocol, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+
+class EmbeddingModel(Protocol):
+    """Minimal interface the engine needs from a model"""
+    
+    name: str
+    dimension: int
+    
+    def encode(self, texts: List[str]) -> np.ndarray:
+        ...
+
+class SentenceTransformerModel:
+    """CPU sentence-transformers model"""
+    
+    def __init__(self, name: str, num_threads: Optional[int] = None):
+        import torch
+        from sentence_transformers import SentenceTransformer
+        
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        self.name = name
+        self._model = SentenceTransformer(name, device="cpu")
+        self.dimension = self._model.get_sentence_embedding_dimension()
+    
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return self._model.encode(
+            texts,
+            batch_size=len(texts),
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False,
+        )
+
+class HashingEmbeddingModel:
+    """
+    Dependency-free model based on feature hashing of lowercase tokens.
+    
+    It has no semantic understanding but is deterministic and fast, which
+    makes it a stand-in for tests, benchmarks and development setups
+    without torch.
+    """
+    
+    def __init__(self, dimension: int = 384):
+        self.name = f"hashing-{dimension}"
+        self.dimension = dimension
+    
+    def encode(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in text.lower().split():
+                digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+                value = int.from_bytes(digest, "little")
+                vectors[row, value % self.dimension] += 1.0 if value >> 63 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+@dataclass
+class EmbeddingStats:
+    """Snapshot of the engine counters"""
+    requests: int
+    texts: int
+    batches: int
+    busy_seconds: float  # Time spent inside the model
+    texts_per_second: float  # Throughput while busy
+    mean_batch_size: float
+    latency_p50_ms: float
+    latency_p95_ms: float
+    latency_p99_ms: float
+
+class _Request:
+    __slots__ = ("texts", "future", "result", "remaining", "submitted")
+    
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.future: Future = Future()
+        self.result: Optional[np.ndarray] = None
+        self.remaining = len(texts)
+        self.submitted = time.perf_counter()
+
+class EmbeddingEngine:
+    """
+    Shared embedding engine with dynamic batching.
+    
+    Any number of threads or coroutines can submit texts. A single worker
+    thread collects everything that arrives within `max_wait_ms` of the first
+    pending text, sorts it by length and cuts it into batches of at most
+    `max_batch_size`, so texts of similar length are padded together. Every
+    caller gets back one contiguous float32 array with a row per text.
+    """
+    
+    def __init__(
+        self,
+        model: EmbeddingModel,
+        *,
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        latency_window: int = 1000,
+    ):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._pending: Deque[Tuple[_Request, int]] = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._latencies: Deque[float] = deque(maxlen=latency_window)
+        self._requests = 0
+        self._texts = 0
+        self._batches = 0
+        self._busy = 0.0
+        self._worker = threading.Thread(target=self._run, name="embedding-engine", daemon=True)
+        self._worker.start()
+    
+    @property
+    def model_name(self) -> str:
+        return self.model.name
+    
+    @property
+    def dimension(self) -> int:
+        return self.model.dimension
+    
+    def submit(self, texts: Sequence[str]) -> Future:
+        """Queue texts for embedding and return a future for their array"""
+        request = _Request(list(texts))
+        if not request.texts:
+            request.future.set_result(np.empty((0, self.dimension), dtype=np.float32))
+            return request.future
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Embedding engine is closed")
+            self._requests += 1
+            self._pending.extend((request, i) for i in range(len(request.texts)))
+            self._cond.notify()
+        return request.future
+    
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Embed texts, blocking until the result is ready"""
+        return self.submit(texts).result()
+    
+    async def aembed(self, texts: Sequence[str]) -> np.ndarray:
+        """Embed texts without blocking the event loop"""
+        return await asyncio.wrap_future(self.submit(texts))
+    
+    def stats(self) -> EmbeddingStats:
+        with self._cond:
+            latencies = np.array(self._latencies or [0.0]) * 1000
+            return EmbeddingStats(
+                requests=self._requests,
+                texts=self._texts,
+                batches=self._batches,
+                busy_seconds=self._busy,
+                texts_per_second=self._texts / self._busy if self._busy else 0.0,
+                mean_batch_size=self._texts / self._batches if self._batches else 0.0,
+                latency_p50_ms=float(np.percentile(latencies, 50)),
+                latency_p95_ms=float(np.percentile(latencies, 95)),
+                latency_p99_ms=float(np.percentile(latencies, 99)),
+            )
+    
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._worker.join()
+    
+    def _collect(self) -> List[Tuple[_Request, int]]:
+        """Wait for work and take everything that arrives within the batching window"""
+        with self._cond:
+            while not self._pending and not self._closed:
+                self._cond.wait()
+            deadline = time.monotonic() + self.max_wait
+            while len(self._pending) < self.max_batch_size and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            items = list(self._pending)
+            self._pending.clear()
+            return items
+    
+    def _run(self) -> None:
+        while True:
+            items = self._collect()
+            if not items:
+                return
+            items.sort(key=lambda item: len(item[0].texts[item[1]]))
+            for start in range(0, len(items), self.max_batch_size):
+                self._run_batch(items[start:start + self.max_batch_size])
+    
+    def _run_batch(self, batch: List[Tuple[_Request, int]]) -> None:
+        started = time.perf_counter()
+        try:
+            vectors = self.model.encode([request.texts[i] for request, i in batch])
+        except Exception as e:
+            for request, _ in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+            return
+        finished = time.perf_counter()
+        
+        done = []
+        for (request, i), vector in zip(batch, vectors):
+            if request.future.done():
+                continue
+            if request.result is None:
+                request.result = np.empty((len(request.texts), len(vector)), dtype=np.float32)
+            request.result[i] = vector
+            request.remaining -= 1
+            if request.remaining == 0:
+                request.future.set_result(request.result)
+                done.append(finished - request.submitted)
+        
+        with self._cond:
+            self._batches += 1
+            self._texts += len(batch)
+            self._busy += finished - started
+            self._latencies.extend(done)
+
+def load_embedding_model(name: str) -> EmbeddingModel:
+    """Load an embedding model by name, `hashing` selects the built-in stand-in"""
+    if name == "hashing":
+        return HashingEmbeddingModel(settings.EMBEDDING_DIMENSION)
+    return SentenceTransformerModel(name, num_threads=settings.EMBEDDING_THREADS)
+
+@lru_cache()
+def get_embedding_engine() -> EmbeddingEngine:
+    """Return the process-wide embedding engine"""
+    return EmbeddingEngine(
+        load_embedding_model(settings.EMBEDDING_MODEL),
+        max_batch_size=settings.EMBEDDING_BATCH_SIZE,
+        max_wait_ms=settings.EMBEDDING_MAX_WAIT_MS,
+    )
\ No newline at end of file
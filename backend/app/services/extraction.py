@@ -0,0 +1,150 @@
+import multiprocessing
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Deque, Dict, Iterator, List
+
+import docx
+import fitz
+from bs4 import BeautifulSoup
+
+from app.core.config import settings
+
+@dataclass
+class ExtractedPage:
+    """Text of a single page (or page-sized section) of a document"""
+    page_number: int
+    text: str
+
+class UnsupportedFileType(ValueError):
+    pass
+
+class Extractor(ABC):
+    """
+    Base class for file type specific text extractors.
+    
+    Extractors run inside worker processes. `page_count` is called once per
+    document and `extract` is then called for consecutive page ranges, so a
+    large PDF is spread over several workers. Formats that cannot be read
+    partially report a single unit and return all their pages at once.
+    """
+    
+    def page_count(self, path: str) -> int:
+        return 1
+    
+    @abstractmethod
+    def extract(self, path: str, start: int, stop: int) -> List[ExtractedPage]:
+        ...
+
+class PdfExtractor(Extractor):
+    def page_count(self, path: str) -> int:
+        with fitz.open(path) as pdf:
+            return pdf.page_count
+    
+    def extract(self, path: str, start: int, stop: int) -> List[ExtractedPage]:
+        with fitz.open(path) as pdf:
+            return [
+                ExtractedPage(page_number=i + 1, text=pdf.load_page(i).get_text())
+                for i in range(start, stop)
+            ]
+
+class DocxExtractor(Extractor):
+    # Word files have no stored page layout, paragraphs are grouped instead
+    PARAGRAPHS_PER_PAGE = 50
+    
+    def extract(self, path: str, start: int, stop: int) -> List[ExtractedPage]:
+        paragraphs = [p.text for p in docx.Document(path).paragraphs if p.text.strip()]
+        return [
+            ExtractedPage(
+                page_number=n + 1,
+                text="\n".join(paragraphs[i:i + self.PARAGRAPHS_PER_PAGE]),
+            )
+            for n, i in enumerate(range(0, len(paragraphs), self.PARAGRAPHS_PER_PAGE))
+        ]
+
+class HtmlExtractor(Extractor):
+    def extract(self, path: str, start: int, stop: int) -> List[ExtractedPage]:
+        with open(path, "rb") as f:
+            soup = BeautifulSoup(f, "html.parser")
+        for tag in soup(["script", "style", "noscript"]):
+            tag.decompose()
+        return [ExtractedPage(page_number=1, text=soup.get_text("\n", strip=True))]
+
+class TextExtractor(Extractor):
+    def extract(self, path: str, start: int, stop: int) -> List[ExtractedPage]:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            return [ExtractedPage(page_number=1, text=f.read())]
+
+EXTRACTORS: Dict[str, Extractor] = {
+    "pdf": PdfExtractor(),
+    "docx": DocxExtractor(),
+    "html": HtmlExtractor(),
+    "htm": HtmlExtractor(),
+    "txt": TextExtractor(),
+    "md": TextExtractor(),
+}
+
+def get_extractor(file_type: str) -> Extractor:
+    """Return the extractor registered for a file type"""
+    try:
+        return EXTRACTORS[file_type.lower()]
+    except KeyError:
+        raise UnsupportedFileType(f"Unsupported file type: {file_type}")
+
+# Entry points executed in the worker processes
+
+def _count_pages(file_type: str, path: str) -> int:
+    return get_extractor(file_type).page_count(path)
+
+def _extract_range(file_type: str, path: str, start: int, stop: int) -> List[ExtractedPage]:
+    return get_extractor(file_type).extract(path, start, stop)
+
+class ExtractionPool:
+    """
+    Bounded process pool that runs text extraction off the calling process.
+    
+    Every document is split into page ranges that are submitted as separate
+    tasks. Only `max_pending` tasks per document are in flight at a time and
+    pages are yielded in order as soon as their range finishes, so callers can
+    chunk and persist early pages while later ones are still being parsed and
+    memory stays bounded regardless of document size.
+    """
+    
+    def __init__(self, max_workers: int, pages_per_task: int, max_pending: int):
+        self.pages_per_task = pages_per_task
+        self.max_pending = max_pending
+        self._executor = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    
+    def iter_pages(self, file_type: str, path: str) -> Iterator[ExtractedPage]:
+        """Extract a document page by page"""
+        get_extractor(file_type)
+        total = self._executor.submit(_count_pages, file_type, path).result()
+        pending: Deque[Future] = deque()
+        try:
+            for start in range(0, total, self.pages_per_task):
+                stop = min(start + self.pages_per_task, total)
+                pending.append(self._executor.submit(_extract_range, file_type, path, start, stop))
+                if len(pending) >= self.max_pending:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+    
+    def shutdown(self) -> None:
+        self._executor.shutdown(cancel_futures=True)
+
+@lru_cache()
+def get_extraction_pool() -> ExtractionPool:
+    """Return the process-wide extraction pool"""
+    return ExtractionPool(
+        max_workers=settings.EXTRACTION_WORKERS,
+        pages_per_task=settings.EXTRACTION_PAGES_PER_TASK,
+        max_pending=settings.EXTRACTION_MAX_PENDING,
+    )
\ No newline at end of file
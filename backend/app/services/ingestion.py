@@ -0,0 +1,316 @@
+import logging
+from dataclasses import asdict, dataclass, field
+from difflib import SequenceMatcher
+from typing import List, Optional
+
+import numpy as np
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.core.config import settings
+from app.models.collection import Collection
+from app.models.document import Document
+from app.services.chunking import TextChunk, chunk_pages, hash_text
+from app.services.embedding_cache import CachedEmbedder, get_embedder
+from app.services.extraction import ExtractionPool, get_extraction_pool
+from app.services.lexical import LexicalDocument, LexicalIndex, get_lexical_index
+from app.services.retrieval_cache import RetrievalCache, get_retrieval_cache
+from app.services.storage import ObjectStorage, get_storage
+from app.services.vector_store import VectorStore, VectorStoreRegistry, get_vector_stores
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class IngestionReport:
+    """Summary of the work done, and skipped, while ingesting a document"""
+    chunk_count: int = 0
+    reused_document_id: Optional[int] = None  # Set when extraction was skipped
+    reused_vectors: int = 0  # Chunks whose content was already embedded
+    kept_chunks: int = 0  # Unchanged chunks kept by an incremental re-index
+    removed_chunks: int = 0
+    embedded_chunks: int = 0
+    # Vectors of removed chunks that no other chunk uses anymore
+    stale_vector_ids: List[str] = field(default_factory=list)
+    # Chunk rows written and deleted, to keep the lexical index in step
+    added_chunk_ids: List[int] = field(default_factory=list)
+    removed_chunk_ids: List[int] = field(default_factory=list)
+    
+    @property
+    def chunks_to_embed(self) -> int:
+        return self.chunk_count - self.reused_vectors
+    
+    def as_metadata(self) -> dict:
+        metadata = asdict(self)
+        metadata["stale_vector_ids"] = len(self.stale_vector_ids)
+        del metadata["added_chunk_ids"], metadata["removed_chunk_ids"]
+        return metadata
+
+def _set_status(db: Session, document: Document, status: str, **metadata) -> None:
+    document.status = status
+    if metadata:
+        document.metadata_ = {**(document.metadata_ or {}), **metadata}
+    db.add(document)
+    db.commit()
+
+def _chunk_row(document: Document, chunk: TextChunk) -> dict:
+    return {
+        "document_id": document.id,
+        "content": chunk.content,
+        "content_hash": chunk.content_hash,
+        "chunk_index": chunk.index,
+        "metadata": chunk.metadata,
+        "vector_id": None,
+    }
+
+def _insert_batch(db: Session, document: Document, batch: List[dict], report: IngestionReport) -> None:
+    """Insert a batch of chunks, pointing duplicates at existing vectors"""
+    vector_ids = crud.document_chunk.get_vector_ids_by_hash(
+        db, owner_id=document.owner_id, content_hashes=[row["content_hash"] for row in batch]
+    )
+    for row in batch:
+        row["vector_id"] = vector_ids.get(row["content_hash"])
+    report.reused_vectors += sum(1 for row in batch if row["vector_id"] is not None)
+    ids = crud.document_chunk.bulk_create(db, rows=batch)
+    report.chunk_count += len(ids)
+    report.added_chunk_ids.extend(ids)
+
+def _reuse_duplicate(db: Session, document: Document, report: IngestionReport) -> bool:
+    """Copy the chunks of an identical, already indexed document of the same owner"""
+    if not document.content_hash:
+        return False
+    source = crud.document.get_indexed_by_hash(
+        db,
+        owner_id=document.owner_id,
+        content_hash=document.content_hash,
+        exclude_id=document.id,
+    )
+    if not source:
+        return False
+    copied = crud.document_chunk.copy_from_document(db, source_id=source.id, target_id=document.id)
+    report.chunk_count = copied
+    report.reused_vectors = crud.document_chunk.count_embedded(db, document_id=document.id)
+    report.added_chunk_ids = [e.id for e in crud.document_chunk.get_index_entries(db, document_id=document.id)]
+    report.reused_document_id = source.id
+    return True
+
+def _apply_diff(
+    db: Session,
+    document: Document,
+    existing: List[Row],
+    chunks: List[TextChunk],
+    report: IngestionReport,
+) -> None:
+    """
+    Turn the existing chunks of a document into the new ones.
+    
+    Old and new chunks are aligned on their content hashes. Chunks in
+    unchanged runs keep their row and vector and are only moved to their
+    new position, the rest is deleted and inserted.
+    """
+    matcher = SequenceMatcher(
+        None, [e.content_hash for e in existing], [c.content_hash for c in chunks], autojunk=False
+    )
+    moved, removed, added = [], [], []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            for entry, chunk in zip(existing[i1:i2], chunks[j1:j2]):
+                if entry.chunk_index != chunk.index:
+                    moved.append({"id": entry.id, "chunk_index": chunk.index, "metadata": chunk.metadata})
+                report.kept_chunks += 1
+                report.reused_vectors += entry.vector_id is not None
+            continue
+        removed.extend(existing[i1:i2])
+        added.extend(chunks[j1:j2])
+    
+    # Insert before deleting so content that only moved between runs of
+    # changes can still pick up the vector of its old row
+    for start in range(0, len(added), settings.CHUNK_INSERT_BATCH_SIZE):
+        batch = added[start:start + settings.CHUNK_INSERT_BATCH_SIZE]
+        _insert_batch(db, document, [_chunk_row(document, c) for c in batch], report)
+    crud.document_chunk.bulk_update_positions(db, rows=moved)
+    crud.document_chunk.remove_by_ids(db, ids=[e.id for e in removed])
+    report.chunk_count += report.kept_chunks
+    report.removed_chunks = len(removed)
+    report.removed_chunk_ids = [e.id for e in removed]
+    report.stale_vector_ids = crud.document_chunk.get_unreferenced_vector_ids(
+        db,
+        vector_ids=[e.vector_id for e in removed if e.vector_id],
+        collection_id=document.collection_id,
+    )
+
+def vector_id_for(owner_id: int, content_hash: str) -> str:
+    """Vector ID of a chunk, chunks of an owner with the same content share it"""
+    return f"{owner_id}:{content_hash}"
+
+def _embed_chunks(
+    db: Session,
+    document: Document,
+    embedder: CachedEmbedder,
+    vector_store: VectorStore,
+    report: IngestionReport,
+) -> None:
+    """
+    Make sure every chunk of a document has a vector in the document's store.
+    
+    Chunks without a vector ID get one, and vectors missing from the store,
+    for instance because they were reused from a document in another
+    collection, are embedded and added. Reused texts mostly hit the
+    embedding cache.
+    """
+    entries = crud.document_chunk.get_vector_entries(db, document_id=document.id)
+    for start in range(0, len(entries), settings.CHUNK_INSERT_BATCH_SIZE):
+        batch = entries[start:start + settings.CHUNK_INSERT_BATCH_SIZE]
+        texts = {}
+        rows = []
+        for chunk in batch:
+            vector_id = chunk.vector_id or vector_id_for(
+                document.owner_id, chunk.content_hash or hash_text(chunk.content)
+            )
+            if chunk.vector_id is None:
+                rows.append({"id": chunk.id, "vector_id": vector_id})
+            if vector_id not in vector_store:
+                texts.setdefault(vector_id, chunk.content)
+        if texts:
+            vector_store.add(list(texts), embedder.embed(list(texts.values())))
+        crud.document_chunk.bulk_set_vector_ids(db, rows=rows)
+        report.embedded_chunks += len(texts)
+
+def _index_lexical(
+    db: Session, document: Document, lexical_index: LexicalIndex, report: IngestionReport
+) -> None:
+    """Mirror the chunks written and deleted by this run in the lexical index"""
+    lexical_index.delete(report.removed_chunk_ids)
+    _add_lexical(db, document, lexical_index, report.added_chunk_ids)
+    lexical_index.persist()
+
+def _add_lexical(db: Session, document: Document, lexical_index: LexicalIndex, chunk_ids: List[int]) -> None:
+    """Add or replace lexical entries of a document's chunks, in batches"""
+    for start in range(0, len(chunk_ids), settings.CHUNK_INSERT_BATCH_SIZE):
+        ids = chunk_ids[start:start + settings.CHUNK_INSERT_BATCH_SIZE]
+        lexical_index.add([
+            LexicalDocument(
+                chunk_id=row.id,
+                content=row.content,
+                document_id=document.id,
+                owner_id=document.owner_id,
+                collection_id=document.collection_id,
+            )
+            for row in crud.document_chunk.get_contents(db, ids=ids)
+        ])
+
+def ingest_document(
+    db: Session,
+    document: Document,
+    *,
+    storage: Optional[ObjectStorage] = None,
+    pool: Optional[ExtractionPool] = None,
+    embedder: Optional[CachedEmbedder] = None,
+    vector_store: Optional[VectorStore] = None,
+    lexical_index: Optional[LexicalIndex] = None,
+    retrieval_cache: Optional[RetrievalCache] = None,
+) -> IngestionReport:
+    """
+    Extract, chunk, embed and index a pending document.
+    
+    The status moves from `pending` to `processing` while pages stream in from
+    the extraction pool and ends as `indexed`, or `error` with the reason in
+    the document metadata. Files the owner has already ingested are not
+    parsed again, their chunks are copied instead, and chunks whose content
+    is already embedded for the owner keep the existing vector.
+    
+    A document that already has chunks, because its file was replaced or an
+    earlier run failed half way, is re-indexed incrementally: only chunks
+    whose content changed are written, so the cost follows the size of the
+    edit. Chunks are indexed in the vector store of the document's collection:
+    vectors missing there are embedded last and vectors no chunk of the
+    collection uses anymore are deleted. Written and deleted chunks are
+    mirrored in the lexical index and cached retrieval results of the
+    collection are invalidated, even if the run fails. The returned report
+    is also stored under `ingestion` in the document metadata.
+    """
+    storage = storage or get_storage()
+    pool = pool or get_extraction_pool()
+    embedder = embedder or get_embedder()
+    # An empty store is falsy, so `or` cannot be used here
+    if vector_store is None:
+        vector_store = get_vector_stores().for_collection(document.collection)
+    if lexical_index is None:
+        lexical_index = get_lexical_index()
+    if retrieval_cache is None:
+        retrieval_cache = get_retrieval_cache()
+    report = IngestionReport()
+    
+    _set_status(db, document, "processing")
+    try:
+        existing = crud.document_chunk.get_index_entries(db, document_id=document.id)
+        if existing or not _reuse_duplicate(db, document, report):
+            with storage.local_copy(document.s3_path) as path:
+                chunks = chunk_pages(pool.iter_pages(document.file_type, path))
+                if existing:
+                    _apply_diff(db, document, existing, list(chunks), report)
+                else:
+                    batch = []
+                    for chunk in chunks:
+                        batch.append(_chunk_row(document, chunk))
+                        if len(batch) >= settings.CHUNK_INSERT_BATCH_SIZE:
+                            _insert_batch(db, document, batch, report)
+                            batch = []
+                    if batch:
+                        _insert_batch(db, document, batch, report)
+        vector_store.delete(report.stale_vector_ids)
+        _embed_chunks(db, document, embedder, vector_store, report)
+        vector_store.persist()
+        _index_lexical(db, document, lexical_index, report)
+    except Exception as e:
+        logger.exception("Ingestion of document %s failed", document.id)
+        db.rollback()
+        _set_status(db, document, "error", error=str(e))
+        raise
+    finally:
+        if retrieval_cache is not None:
+            retrieval_cache.bump(document.owner_id, [document.collection_id])
+    
+    logger.info(
+        "Ingested document %s: %d chunks, %d kept, %d removed, %d reused vectors, %d embedded, duplicate of %s",
+        document.id, report.chunk_count, report.kept_chunks, report.removed_chunks,
+        report.reused_vectors, report.embedded_chunks, report.reused_document_id,
+    )
+    _set_status(db, document, "indexed", ingestion=report.as_metadata())
+    return report
+
+def move_document(
+    db: Session,
+    document: Document,
+    previous_collection: Optional[Collection],
+    *,
+    vector_stores: VectorStoreRegistry,
+    lexical_index: LexicalIndex,
+) -> None:
+    """
+    Move the search entries of a document that changed collection.
+    
+    Its vectors are copied from the store of the previous collection to the
+    store of the new one, without embedding them again, and deleted from the
+    previous store unless other chunks there still use them. Vectors missing
+    from the previous store are left to the next ingestion. Lexical entries
+    are replaced to carry the new collection.
+    """
+    source = vector_stores.for_collection(previous_collection)
+    target = vector_stores.for_collection(document.collection)
+    vector_ids = crud.document_chunk.get_vector_ids_by_document(db, document_id=document.id)
+    vectors = source.fetch(vector_ids)
+    if vectors:
+        target.add(list(vectors), np.stack(list(vectors.values())))
+        target.persist()
+    source.delete(
+        crud.document_chunk.get_unreferenced_vector_ids(
+            db,
+            vector_ids=vector_ids,
+            collection_id=previous_collection.id if previous_collection else None,
+        )
+    )
+    source.persist()
+    chunk_ids = [e.id for e in crud.document_chunk.get_index_entries(db, document_id=document.id)]
+    _add_lexical(db, document, lexical_index, chunk_ids)
+    lexical_index.persist()
\ No newline at end of file
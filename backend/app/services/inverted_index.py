@@ -0,0 +1,331 @@
+import math
+import os
+import re
+import threading
+from array import array
+from contextlib import contextmanager
+from itertools import accumulate
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services.lexical import LexicalDocument, LexicalIndex, ScoredChunk
+from app.services.vector_store.snapshot import (
+    append_rows,
+    file_name,
+    read_manifest,
+    read_rows,
+    snapshot_version,
+    write_lock,
+    write_manifest,
+)
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens, identifiers such as `E4711` are kept whole"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+def _segment(
+    postings: Dict[str, Tuple[Sequence[int], Sequence[int]]], chunk_ids, owners, collections, lengths
+) -> Dict[str, np.ndarray]:
+    """Arrays of a segment file, postings hold positions relative to its first document"""
+    terms = sorted(postings)
+    offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    np.cumsum([len(postings[t][0]) for t in terms], out=offsets[1:])
+    return {
+        "terms": np.array(terms, dtype=str),
+        "offsets": offsets,
+        "docs": np.concatenate([np.asarray(postings[t][0], dtype=np.uint32) for t in terms])
+        if terms else np.empty(0, dtype=np.uint32),
+        "freqs": np.concatenate([np.asarray(postings[t][1], dtype=np.uint32) for t in terms])
+        if terms else np.empty(0, dtype=np.uint32),
+        "chunk_ids": np.asarray(chunk_ids, dtype=np.int64),
+        "owners": np.asarray(owners, dtype=np.int64),
+        "collections": np.asarray(collections, dtype=np.int64),
+        "lengths": np.asarray(lengths, dtype=np.uint32),
+    }
+
+def _merge(segments: Sequence[Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+    """One segment holding the documents of consecutive segments in order"""
+    postings: Dict[str, Tuple[List[np.ndarray], List[np.ndarray]]] = {}
+    base = 0
+    for segment in segments:
+        offsets = segment["offsets"]
+        for i, term in enumerate(segment["terms"].tolist()):
+            start, stop = offsets[i], offsets[i + 1]
+            docs, freqs = postings.setdefault(term, ([], []))
+            docs.append(segment["docs"][start:stop] + np.uint32(base))
+            freqs.append(segment["freqs"][start:stop])
+        base += len(segment["chunk_ids"])
+    return _segment(
+        {term: (np.concatenate(docs), np.concatenate(freqs)) for term, (docs, freqs) in postings.items()},
+        *(np.concatenate([s[key] for s in segments]) for key in ("chunk_ids", "owners", "collections", "lengths")),
+    )
+
+class InvertedIndex(LexicalIndex):
+    """
+    In-process BM25 index for setups without Elasticsearch.
+    
+    Each term has a posting list of document positions and term frequencies
+    held in `array` buffers, so appending is cheap and a query reads them
+    as NumPy views without copying. Scoring is vectorized per query term and
+    owner and collection filters are applied as a mask over all documents.
+    
+    Deletes only tombstone documents. Posting lists are rewritten without
+    them once they make up half of the index.
+    
+    With a `path` the index lives in that directory and every change is
+    written as it is made, under a lock shared with other processes and
+    after catching up with their changes. Added documents go to a new
+    segment file and deletes are appended to a file of deleted positions, so
+    earlier data is not rewritten. The last segment is merged into the one
+    before it while that one is no larger, which keeps the number of
+    segments logarithmic in the number of documents. Other instances load
+    only the segments and deletes published since they last searched.
+    """
+    
+    def __init__(self, path: Optional[str] = None, *, k1: float = 1.2, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._version: Optional[tuple] = None
+        self._reset()
+        self._reload_if_changed()
+    
+    def _reset(self) -> None:
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._chunk_ids = array("q")
+        self._owners = array("q")
+        self._collections = array("q")  # -1 outside any collection
+        self._lengths = array("I")
+        self._live = bytearray()
+        self._positions: Dict[int, int] = {}
+        self._total_length = 0
+        self._segments: List[Tuple[str, int]] = []  # Files in `path` and their number of documents
+        self._deleted_file: Optional[str] = None
+        self._deleted = 0  # Positions written to the deleted file
+    
+    def __len__(self) -> int:
+        return len(self._positions)
+    
+    def add(self, documents: Sequence[LexicalDocument]) -> None:
+        # The last of repeated chunks wins
+        documents = list({d.chunk_id: d for d in documents}.values())
+        with self._writing():
+            self._remove([d.chunk_id for d in documents])
+            start = len(self._chunk_ids)
+            added: Dict[str, Tuple[List[int], List[int]]] = {}
+            for document in documents:
+                position = len(self._chunk_ids)
+                tokens = tokenize(document.content)
+                counts: Dict[str, int] = {}
+                for token in tokens:
+                    counts[token] = counts.get(token, 0) + 1
+                for term, count in counts.items():
+                    postings = self._postings.get(term)
+                    if postings is None:
+                        postings = self._postings[term] = (array("I"), array("I"))
+                    postings[0].append(position)
+                    postings[1].append(count)
+                    docs, freqs = added.setdefault(term, ([], []))
+                    docs.append(position - start)
+                    freqs.append(count)
+                self._chunk_ids.append(document.chunk_id)
+                self._owners.append(document.owner_id)
+                self._collections.append(-1 if document.collection_id is None else document.collection_id)
+                self._lengths.append(len(tokens))
+                self._live.append(1)
+                self._positions[document.chunk_id] = position
+                self._total_length += len(tokens)
+            if self.path and documents:
+                self._append_segment(_segment(
+                    added,
+                    self._chunk_ids[start:],
+                    self._owners[start:],
+                    self._collections[start:],
+                    self._lengths[start:],
+                ))
+    
+    def delete(self, chunk_ids: Sequence[int]) -> None:
+        with self._writing():
+            self._remove(chunk_ids)
+            if len(self._chunk_ids) - len(self._positions) > len(self._positions):
+                self._compact()
+                if self.path:
+                    # Positions changed, so the files are replaced as a whole
+                    self._segments = []
+                    self._deleted_file, self._deleted = file_name("deleted"), 0
+                    self._append_segment(_segment(
+                        self._postings, self._chunk_ids, self._owners, self._collections, self._lengths
+                    ))
+    
+    def search(
+        self,
+        query: str,
+        *,
+        owner_id: int,
+        collection_ids: Optional[Sequence[int]] = None,
+        k: int = 10,
+    ) -> List[ScoredChunk]:
+        terms = set(tokenize(query))
+        self._reload_if_changed()
+        with self._lock:
+            n_docs = len(self._positions)
+            if not n_docs or not terms or k <= 0:
+                return []
+            live = np.frombuffer(self._live, dtype=np.uint8).astype(bool)
+            allowed = live & (np.frombuffer(self._owners, dtype=np.int64) == owner_id)
+            if collection_ids:
+                allowed &= np.isin(np.frombuffer(self._collections, dtype=np.int64), list(collection_ids))
+            lengths = np.frombuffer(self._lengths, dtype=np.uint32).astype(np.float32)
+            norm = self.k1 * (1 - self.b + self.b * lengths / (self._total_length / n_docs))
+            
+            scores = np.zeros(len(self._chunk_ids), dtype=np.float32)
+            for term in terms:
+                postings = self._postings.get(term)
+                if postings is None:
+                    continue
+                docs = np.frombuffer(postings[0], dtype=np.uint32)
+                freqs = np.frombuffer(postings[1], dtype=np.uint32).astype(np.float32)
+                present = live[docs]
+                df = int(present.sum())
+                if not df:
+                    continue
+                keep = allowed[docs]
+                docs, freqs = docs[keep], freqs[keep]
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                scores[docs] += idf * freqs * (self.k1 + 1) / (freqs + norm[docs])
+            
+            matched = np.flatnonzero(scores)
+            if len(matched) > k:
+                matched = matched[np.argpartition(scores[matched], -k)[-k:]]
+            matched = matched[np.argsort(-scores[matched], kind="stable")]
+            return [ScoredChunk(self._chunk_ids[i], float(scores[i])) for i in matched]
+    
+    def persist(self) -> None:
+        """Changes are written as they are made, this only catches up with other processes"""
+        with self._writing():
+            pass
+    
+    @contextmanager
+    def _writing(self) -> Iterator[None]:
+        """Hold the write lock with the latest published index loaded, publishing changes after"""
+        with self._lock:
+            if not self.path:
+                yield
+                return
+            with write_lock(self.path):
+                self._reload_if_changed()
+                if self._deleted_file is None:
+                    self._deleted_file = file_name("deleted")
+                yield
+                write_manifest(self.path, {
+                    "segments": [count for _, count in self._segments],
+                    "deleted": self._deleted,
+                    "files": {"segments": [name for name, _ in self._segments], "deleted": self._deleted_file},
+                })
+                self._version = snapshot_version(self.path)
+    
+    def _reload_if_changed(self) -> None:
+        if not self.path:
+            return
+        version = snapshot_version(self.path)
+        if version is None or version == self._version:
+            return
+        with self._lock:
+            manifest = read_manifest(self.path)
+            files = manifest["files"]
+            # Merges keep positions, so loaded documents stay valid while they
+            # end on a segment boundary and no compaction replaced the files
+            boundaries = [0, *accumulate(manifest["segments"])]
+            if files["deleted"] != self._deleted_file or len(self._chunk_ids) not in boundaries:
+                self._reset()
+            segments = list(zip(files["segments"], manifest["segments"]))
+            for name, _ in segments[boundaries.index(len(self._chunk_ids)):]:
+                self._take(self._read_segment(name))
+            deleted = read_rows(
+                os.path.join(self.path, files["deleted"]), np.int64, self._deleted, manifest["deleted"]
+            )
+            for position in deleted.tolist():
+                if self._live[position]:
+                    self._live[position] = 0
+                    self._total_length -= self._lengths[position]
+                    if self._positions.get(self._chunk_ids[position]) == position:
+                        del self._positions[self._chunk_ids[position]]
+            self._segments = segments
+            self._deleted_file, self._deleted = files["deleted"], manifest["deleted"]
+            self._version = version
+    
+    def _take(self, segment: Dict[str, np.ndarray]) -> None:
+        """Append the documents of a segment file"""
+        base = len(self._chunk_ids)
+        docs, freqs, offsets = segment["docs"], segment["freqs"], segment["offsets"]
+        for i, term in enumerate(segment["terms"].tolist()):
+            start, stop = offsets[i], offsets[i + 1]
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = (array("I"), array("I"))
+            postings[0].frombytes((docs[start:stop] + np.uint32(base)).tobytes())
+            postings[1].frombytes(freqs[start:stop].tobytes())
+        self._chunk_ids.frombytes(segment["chunk_ids"].tobytes())
+        self._owners.frombytes(segment["owners"].tobytes())
+        self._collections.frombytes(segment["collections"].tobytes())
+        self._lengths.frombytes(segment["lengths"].tobytes())
+        self._live.extend(b"\x01" * len(segment["chunk_ids"]))
+        for i, chunk_id in enumerate(segment["chunk_ids"].tolist()):
+            self._positions[chunk_id] = base + i
+        self._total_length += int(segment["lengths"].sum())
+    
+    def _read_segment(self, name: str) -> Dict[str, np.ndarray]:
+        with np.load(os.path.join(self.path, name)) as data:
+            return {key: data[key] for key in data.files}
+    
+    def _write_segment(self, segment: Dict[str, np.ndarray]) -> str:
+        name = file_name("segment", "npz")
+        np.savez(os.path.join(self.path, name), **segment)
+        return name
+    
+    def _append_segment(self, segment: Dict[str, np.ndarray]) -> None:
+        self._segments.append((self._write_segment(segment), len(segment["chunk_ids"])))
+        while len(self._segments) > 1 and self._segments[-2][1] <= self._segments[-1][1]:
+            (first, first_count), (second, second_count) = self._segments[-2:]
+            merged = _merge([self._read_segment(first), self._read_segment(second)])
+            self._segments[-2:] = [(self._write_segment(merged), first_count + second_count)]
+    
+    def _remove(self, chunk_ids: Sequence[int]) -> None:
+        removed = []
+        for chunk_id in chunk_ids:
+            position = self._positions.pop(chunk_id, None)
+            if position is not None:
+                self._live[position] = 0
+                self._total_length -= self._lengths[position]
+                removed.append(position)
+        if self.path and removed:
+            deleted_path = os.path.join(self.path, self._deleted_file)
+            append_rows(deleted_path, np.array(removed, dtype=np.int64), self._deleted)
+            self._deleted += len(removed)
+    
+    def _compact(self) -> None:
+        """Rewrite all arrays without deleted documents"""
+        live = np.frombuffer(self._live, dtype=np.uint8).astype(bool)
+        if live.all():
+            return
+        remap = np.cumsum(live, dtype=np.int64) - 1
+        postings = {}
+        for term, (docs, freqs) in self._postings.items():
+            docs = np.frombuffer(docs, dtype=np.uint32)
+            keep = live[docs]
+            if keep.any():
+                postings[term] = (
+                    array("I", remap[docs[keep]].astype(np.uint32).tobytes()),
+                    array("I", np.frombuffer(freqs, dtype=np.uint32)[keep].tobytes()),
+                )
+        self._postings = postings
+        self._chunk_ids = array("q", np.frombuffer(self._chunk_ids, dtype=np.int64)[live].tobytes())
+        self._owners = array("q", np.frombuffer(self._owners, dtype=np.int64)[live].tobytes())
+        self._collections = array("q", np.frombuffer(self._collections, dtype=np.int64)[live].tobytes())
+        self._lengths = array("I", np.frombuffer(self._lengths, dtype=np.uint32)[live].tobytes())
+        self._live = bytearray(b"\x01" * len(self._chunk_ids))
+        self._positions = {chunk_id: i for i, chunk_id in enumerate(self._chunk_ids)}
\ No newline at end of file
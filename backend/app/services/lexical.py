@@ -0,0 +1,201 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Optional, Sequence
+
+from elasticsearch import NotFoundError, helpers
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.services.search_client import ElasticsearchClients, bulk_index, get_elasticsearch
+
+@dataclass
+class LexicalDocument:
+    """A chunk as seen by the lexical index"""
+    chunk_id: int
+    content: str
+    document_id: int
+    owner_id: int
+    collection_id: Optional[int] = None
+
+@dataclass
+class ScoredChunk:
+    chunk_id: int
+    score: float
+
+class LexicalIndex(ABC):
+    """
+    Keyword index over chunk contents.
+    
+    Chunks are addressed by `DocumentChunk.id` and every search is limited
+    to one owner and, optionally, a set of collections.
+    """
+    
+    @abstractmethod
+    def add(self, documents: Sequence[LexicalDocument]) -> None:
+        ...
+    
+    @abstractmethod
+    def delete(self, chunk_ids: Sequence[int]) -> None:
+        ...
+    
+    @abstractmethod
+    def search(
+        self,
+        query: str,
+        *,
+        owner_id: int,
+        collection_ids: Optional[Sequence[int]] = None,
+        k: int = 10,
+    ) -> List[ScoredChunk]:
+        ...
+    
+    async def asearch_many(
+        self,
+        queries: Sequence[str],
+        *,
+        owner_id: int,
+        collection_ids: Optional[Sequence[int]] = None,
+        k: int = 10,
+    ) -> List[List[ScoredChunk]]:
+        """Search several queries from the event loop, backends that can batch them override this"""
+        return await run_in_threadpool(
+            lambda: [self.search(q, owner_id=owner_id, collection_ids=collection_ids, k=k) for q in queries]
+        )
+    
+    def persist(self) -> None:
+        """Make changes durable, indexes backed by a service have nothing to do"""
+
+class ElasticsearchLexicalIndex(LexicalIndex):
+    """
+    BM25 search through an Elasticsearch index of chunks.
+    
+    Writes stream through the bulk helpers, retrying rejected items, and a
+    batch of queries is sent as one `msearch` request from the event loop.
+    Clients come from the process-wide pools in `clients`.
+    """
+    
+    MAPPINGS = {
+        "properties": {
+            "content": {"type": "text"},
+            "document_id": {"type": "integer"},
+            "owner_id": {"type": "integer"},
+            "collection_id": {"type": "integer"},
+        }
+    }
+    
+    def __init__(
+        self, clients: ElasticsearchClients, index: str, *, chunk_size: int = 500, max_retries: int = 5
+    ):
+        self.clients = clients
+        self.index = index
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        self._created = False
+    
+    def _ensure_index(self) -> None:
+        if self._created:
+            return
+        client = self.clients.sync
+        if not client.indices.exists(index=self.index):
+            client.indices.create(index=self.index, mappings=self.MAPPINGS)
+        self._created = True
+    
+    def _bulk(self, actions) -> None:
+        result = bulk_index(
+            self.clients.sync, actions, chunk_size=self.chunk_size, max_retries=self.max_retries
+        )
+        if result.errors:
+            raise helpers.BulkIndexError(f"{len(result.errors)} chunk(s) failed to index", result.errors)
+    
+    def _query(self, query: str, owner_id: int, collection_ids: Optional[Sequence[int]]) -> dict:
+        filters = [{"term": {"owner_id": owner_id}}]
+        if collection_ids:
+            filters.append({"terms": {"collection_id": list(collection_ids)}})
+        return {"bool": {"must": {"match": {"content": query}}, "filter": filters}}
+    
+    @staticmethod
+    def _hits(response) -> List[ScoredChunk]:
+        return [ScoredChunk(int(hit["_id"]), hit["_score"]) for hit in response["hits"]["hits"]]
+    
+    def add(self, documents: Sequence[LexicalDocument]) -> None:
+        if not documents:
+            return
+        self._ensure_index()
+        self._bulk(
+            (
+                {
+                    "_index": self.index,
+                    "_id": d.chunk_id,
+                    "content": d.content,
+                    "document_id": d.document_id,
+                    "owner_id": d.owner_id,
+                    "collection_id": d.collection_id,
+                }
+                for d in documents
+            )
+        )
+    
+    def delete(self, chunk_ids: Sequence[int]) -> None:
+        if not chunk_ids:
+            return
+        self._ensure_index()
+        self._bulk({"_op_type": "delete", "_index": self.index, "_id": i} for i in chunk_ids)
+    
+    def search(
+        self,
+        query: str,
+        *,
+        owner_id: int,
+        collection_ids: Optional[Sequence[int]] = None,
+        k: int = 10,
+    ) -> List[ScoredChunk]:
+        try:
+            response = self.clients.sync.search(
+                index=self.index, query=self._query(query, owner_id, collection_ids), size=k, source=False
+            )
+        except NotFoundError:
+            return []
+        return self._hits(response)
+    
+    async def asearch_many(
+        self,
+        queries: Sequence[str],
+        *,
+        owner_id: int,
+        collection_ids: Optional[Sequence[int]] = None,
+        k: int = 10,
+    ) -> List[List[ScoredChunk]]:
+        if not queries:
+            return []
+        searches = []
+        for query in queries:
+            searches.append({"index": self.index})
+            searches.append({"query": self._query(query, owner_id, collection_ids), "size": k, "_source": False})
+        response = await self.clients.aio.msearch(searches=searches)
+        results = []
+        for item in response["responses"]:
+            if "error" in item:
+                # A missing index only means nothing was indexed yet
+                if item.get("status") != 404:
+                    raise RuntimeError(f"Elasticsearch search failed: {item['error']}")
+                results.append([])
+            else:
+                results.append(self._hits(item))
+        return results
+
+@lru_cache()
+def get_lexical_index() -> LexicalIndex:
+    """Return the lexical index backend configured in settings"""
+    if settings.LEXICAL_BACKEND == "local":
+        from app.services.inverted_index import InvertedIndex
+        
+        return InvertedIndex(settings.LEXICAL_INDEX_PATH)
+    if settings.LEXICAL_BACKEND == "elasticsearch":
+        return ElasticsearchLexicalIndex(
+            get_elasticsearch(),
+            settings.ELASTICSEARCH_CHUNK_INDEX,
+            chunk_size=settings.ELASTICSEARCH_BULK_CHUNK_SIZE,
+            max_retries=settings.ELASTICSEARCH_BULK_RETRIES,
+        )
+    raise ValueError(f"Unknown lexical backend: {settings.LEXICAL_BACKEND}")
\ No newline at end of file
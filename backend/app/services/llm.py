@@ -0,0 +1,372 @@
+import asyncio
+import json
+import logging
+import random
+import re
+from abc import ABC, abstractmethod
+from collections import deque
+from functools import lru_cache
+from typing import AsyncIterator, Deque, Dict, List, Optional, Protocol, Set, Tuple
+
+import httpx
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class LLMError(Exception):
+    """A provider could not produce an answer"""
+
+class RetryableLLMError(LLMError):
+    """A failure worth retrying, such as a rate limit, a 5xx or a dropped connection"""
+
+class ChatModel(Protocol):
+    """Minimal interface the chat pipeline needs from an LLM"""
+    
+    name: str
+    
+    def stream(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        ...
+
+class LLMProvider(ABC):
+    """
+    An LLM API reached through one pooled async HTTP client.
+    
+    The client is shared by every model and request of the provider in a
+    process, so concurrent chats reuse keep-alive connections up to
+    `max_connections` instead of opening one per answer.
+    """
+    
+    name: str
+    
+    def __init__(
+        self, *, base_url: str, headers: Dict[str, str], max_connections: int = 20, connect_timeout: float = 5
+    ):
+        self._client_options = {
+            "base_url": base_url,
+            "headers": headers,
+            "limits": httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            # Reads are bounded by the caller's deadline
+            "timeout": httpx.Timeout(None, connect=connect_timeout),
+        }
+        self._client: Optional[httpx.AsyncClient] = None
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(**self._client_options)
+        return self._client
+    
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    @abstractmethod
+    def stream(
+        self, messages: List[Dict[str, str]], *, model: str, max_tokens: int, temperature: float
+    ) -> AsyncIterator[str]:
+        ...
+    
+    async def _events(self, path: str, body: dict) -> AsyncIterator[dict]:
+        """POST a streaming request and yield the JSON data of its server-sent events"""
+        try:
+            async with self.client.stream("POST", path, json=body) as response:
+                if response.status_code == 429 or response.status_code >= 500:
+                    raise RetryableLLMError(f"{self.name} answered {response.status_code}")
+                if response.status_code >= 400:
+                    await response.aread()
+                    raise LLMError(f"{self.name} answered {response.status_code}: {response.text[:200]}")
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        return
+                    yield json.loads(data)
+        except httpx.TransportError as e:
+            raise RetryableLLMError(f"{self.name} request failed: {e!r}") from e
+
+class OpenAIProvider(LLMProvider):
+    """OpenAI chat completions, also spoken by Mistral's API"""
+    
+    def __init__(
+        self, api_key: str, *, name: str = "openai", base_url: str = "https://api.openai.com/v1", **options
+    ):
+        super().__init__(base_url=base_url, headers={"Authorization": f"Bearer {api_key}"}, **options)
+        self.name = name
+    
+    async def stream(
+        self, messages: List[Dict[str, str]], *, model: str, max_tokens: int, temperature: float
+    ) -> AsyncIterator[str]:
+        body = {
+            "model": model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "stream": True,
+        }
+        async for event in self._events("/chat/completions", body):
+            choices = event.get("choices") or [{}]
+            text = (choices[0].get("delta") or {}).get("content")
+            if text:
+                yield text
+
+class AnthropicProvider(LLMProvider):
+    """Anthropic messages API, which takes the system prompt separately"""
+    
+    name = "anthropic"
+    
+    def __init__(self, api_key: str, *, base_url: str = "https://api.anthropic.com/v1", **options):
+        super().__init__(
+            base_url=base_url,
+            headers={"x-api-key": api_key, "anthropic-version": "2023-06-01"},
+            **options,
+        )
+    
+    async def stream(
+        self, messages: List[Dict[str, str]], *, model: str, max_tokens: int, temperature: float
+    ) -> AsyncIterator[str]:
+        system = "\n\n".join(m["content"] for m in messages if m["role"] == "system")
+        body = {
+            "model": model,
+            "system": system,
+            "messages": [m for m in messages if m["role"] != "system"],
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "stream": True,
+        }
+        async for event in self._events("/messages", body):
+            if event.get("type") == "content_block_delta":
+                text = event["delta"].get("text")
+                if text:
+                    yield text
+            elif event.get("type") == "error":
+                raise RetryableLLMError(f"anthropic stream failed: {event.get('error')}")
+
+class FakeProvider(LLMProvider):
+    """
+    Local stand-in answering with the first passage of the context.
+    
+    Like the hashing embedding model it is meant for tests, benchmarks and
+    development setups without an API key. It waits `first_token_ms` before
+    the first word and `token_ms` between words, and fails the first
+    `failures` requests with a retryable error, to exercise deadlines,
+    retries and hedging.
+    """
+    
+    name = "fake"
+    
+    def __init__(self, *, first_token_ms: float = 0, token_ms: float = 0, failures: int = 0):
+        self.first_token_ms = first_token_ms
+        self.token_ms = token_ms
+        self.failures = failures
+        self.requests = 0
+    
+    async def aclose(self) -> None:
+        pass
+    
+    async def stream(
+        self,
+        messages: List[Dict[str, str]],
+        *,
+        model: str = "fake",
+        max_tokens: int = 512,
+        temperature: float = 0,
+    ) -> AsyncIterator[str]:
+        self.requests += 1
+        await asyncio.sleep(self.first_token_ms / 1000)
+        if self.requests <= self.failures:
+            raise RetryableLLMError("fake provider failure")
+        passage = re.search(r"^\[1\] (.+)$", messages[0]["content"], flags=re.M)
+        answer = passage.group(1) if passage else "I could not find anything about this in your documents."
+        for i, word in enumerate(re.findall(r"\S+\s*", answer)[:max_tokens]):
+            if i and self.token_ms:
+                await asyncio.sleep(self.token_ms / 1000)
+            yield word
+
+class ProviderModel:
+    """One model of a provider with its generation settings"""
+    
+    def __init__(self, provider: LLMProvider, model: str, *, max_tokens: int = 512, temperature: float = 0.2):
+        self.provider = provider
+        self.model = model
+        self.name = f"{provider.name}:{model}"
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+    
+    def stream(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        return self.provider.stream(
+            messages, model=self.model, max_tokens=self.max_tokens, temperature=self.temperature
+        )
+
+async def _first_token(model: ChatModel, messages: List[Dict[str, str]]) -> Tuple[str, AsyncIterator[str]]:
+    """Start a stream and wait for its first token, an empty answer gives an empty token"""
+    stream = model.stream(messages)
+    try:
+        return await stream.__anext__(), stream
+    except StopAsyncIteration:
+        return "", stream
+
+class ResilientChatModel:
+    """
+    A primary model guarded by a deadline, retries and an optional hedge.
+    
+    The whole answer has to arrive within `timeout_s`. Retryable failures
+    before the first token are retried up to `retries` times after a full
+    jitter backoff, so clients that failed together do not come back
+    together. Once a token was streamed the answer cannot be restarted and
+    a failure is final.
+    
+    With a `backup`, a request whose first token takes longer than the
+    `hedge_percentile` of the primary's recent first-token latencies is
+    hedged: the backup is asked as well and whichever answers first is
+    streamed, the other request is cancelled. Until `min_samples`
+    latencies are known nothing is hedged. A primary that is cancelled
+    before its first token is recorded with the time it had taken so far,
+    a lower bound, so that hedged requests keep their slow samples and the
+    percentile does not drift down.
+    """
+    
+    def __init__(
+        self,
+        primary: ChatModel,
+        backup: Optional[ChatModel] = None,
+        *,
+        timeout_s: float = 60,
+        retries: int = 2,
+        backoff_s: float = 0.5,
+        hedge_percentile: float = 95,
+        min_samples: int = 20,
+    ):
+        self.primary = primary
+        self.backup = backup
+        self.name = primary.name
+        self.timeout_s = timeout_s
+        self.retries = retries
+        self.backoff_s = backoff_s
+        self.hedge_percentile = hedge_percentile
+        self.min_samples = min_samples
+        self._latencies: Deque[float] = deque(maxlen=500)  # Seconds to the primary's first token
+    
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait for the primary before hedging, None while there is too little data"""
+        if self.backup is None or len(self._latencies) < self.min_samples:
+            return None
+        return float(np.percentile(self._latencies, self.hedge_percentile))
+    
+    async def stream(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout_s
+        attempt = 0
+        while True:
+            try:
+                async with asyncio.timeout_at(deadline):
+                    first, rest = await self._race(messages)
+                break
+            except TimeoutError as e:
+                raise LLMError(f"No answer from {self.name} within {self.timeout_s}s") from e
+            except RetryableLLMError as e:
+                backoff = random.uniform(0, self.backoff_s * 2 ** attempt)
+                if attempt >= self.retries or loop.time() + backoff >= deadline:
+                    raise
+                logger.warning("Retrying %s in %.2fs after: %s", self.name, backoff, e)
+                attempt += 1
+                await asyncio.sleep(backoff)
+        
+        try:
+            if first:
+                yield first
+            async with asyncio.timeout_at(deadline):
+                async for token in rest:
+                    yield token
+        except TimeoutError as e:
+            raise LLMError(f"Answer of {self.name} not complete within {self.timeout_s}s") from e
+        finally:
+            await rest.aclose()
+    
+    async def _race(self, messages: List[Dict[str, str]]) -> Tuple[str, AsyncIterator[str]]:
+        """First token of the primary or, when hedging, of whichever model answers first"""
+        started = asyncio.get_running_loop().time()
+        primary = asyncio.ensure_future(_first_token(self.primary, messages))
+        pending: Set[asyncio.Future] = {primary}
+        losers: List[asyncio.Future] = []
+        error: Optional[BaseException] = None
+        try:
+            delay = self.hedge_delay()
+            if delay is not None:
+                done, _ = await asyncio.wait(pending, timeout=delay)
+                if not done:
+                    logger.info("Hedging %s after %.2fs with %s", self.name, delay, self.backup.name)
+                    pending.add(asyncio.ensure_future(_first_token(self.backup, messages)))
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                answered = [task for task in done if task.exception() is None]
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                if answered:
+                    if primary in answered:
+                        self._latencies.append(asyncio.get_running_loop().time() - started)
+                    losers = answered[1:]
+                    return answered[0].result()
+            raise error
+        finally:
+            if not primary.done():
+                self._latencies.append(asyncio.get_running_loop().time() - started)
+            for task in pending:
+                task.cancel()
+            for task in losers:
+                await task.result()[1].aclose()
+
+_providers: Dict[str, LLMProvider] = {}
+
+def get_provider(name: str) -> LLMProvider:
+    """Return the process-wide client of a provider"""
+    provider = _providers.get(name)
+    if provider is None:
+        provider = _providers[name] = _create_provider(name)
+    return provider
+
+def _create_provider(name: str) -> LLMProvider:
+    options = {"max_connections": settings.LLM_CONNECTIONS}
+    if name == "openai":
+        return OpenAIProvider(_api_key(settings.OPENAI_API_KEY, "OPENAI_API_KEY"), **options)
+    if name == "anthropic":
+        return AnthropicProvider(_api_key(settings.ANTHROPIC_API_KEY, "ANTHROPIC_API_KEY"), **options)
+    if name == "mistral":
+        return OpenAIProvider(
+            _api_key(settings.MISTRAL_API_KEY, "MISTRAL_API_KEY"),
+            name="mistral",
+            base_url="https://api.mistral.ai/v1",
+            **options,
+        )
+    if name == "fake":
+        return FakeProvider(first_token_ms=settings.LLM_FAKE_LATENCY_MS)
+    raise ValueError(f"Unknown LLM provider: {name}")
+
+def _api_key(value: Optional[str], setting: str) -> str:
+    if not value:
+        raise ValueError(f"{setting} is required for this LLM provider")
+    return value
+
+@lru_cache()
+def get_chat_model() -> ChatModel:
+    """Return the chat model, and its hedge if any, configured in settings"""
+    options = {"max_tokens": settings.CHAT_MAX_TOKENS, "temperature": settings.CHAT_TEMPERATURE}
+    backup = None
+    if settings.CHAT_BACKUP_PROVIDER:
+        backup = ProviderModel(get_provider(settings.CHAT_BACKUP_PROVIDER), settings.CHAT_BACKUP_MODEL, **options)
+    return ResilientChatModel(
+        ProviderModel(get_provider(settings.CHAT_PROVIDER), settings.CHAT_MODEL, **options),
+        backup,
+        timeout_s=settings.CHAT_TIMEOUT,
+        retries=settings.CHAT_RETRIES,
+        hedge_percentile=settings.CHAT_HEDGE_PERCENTILE,
+    )
+
+async def close_providers() -> None:
+    """Close the connection pools of the providers used so far, the next use opens new ones"""
+    for provider in _providers.values():
+        await provider.aclose()
\ No newline at end of file
@@ -0,0 +1,122 @@
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Optional, Protocol, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.schemas.search import RetrievedChunk
+
+class RerankModel(Protocol):
+    """Minimal interface the reranker needs from a cross-encoder"""
+    
+    name: str
+    
+    def predict(self, pairs: List[Tuple[str, str]]) -> np.ndarray:
+        ...
+
+class CrossEncoderModel:
+    """
+    CPU sentence-transformers cross-encoder.
+    
+    The model, and torch with it, is loaded by the first `predict`, so
+    processes that never rerank do not pay for it at startup.
+    """
+    
+    def __init__(self, name: str, max_length: int = 512):
+        self.name = name
+        self.max_length = max_length
+        self._model = None
+    
+    def predict(self, pairs: List[Tuple[str, str]]) -> np.ndarray:
+        if self._model is None:
+            from sentence_transformers import CrossEncoder
+            
+            self._model = CrossEncoder(self.name, max_length=self.max_length, device="cpu")
+        return np.asarray(
+            self._model.predict(pairs, batch_size=len(pairs), show_progress_bar=False),
+            dtype=np.float32,
+        )
+
+class TokenOverlapModel:
+    """
+    Dependency-free stand-in scoring the share of query tokens in a passage.
+    
+    Like the hashing embedding model it is only meant for tests, benchmarks
+    and development setups without torch.
+    """
+    
+    name = "overlap"
+    
+    def predict(self, pairs: List[Tuple[str, str]]) -> np.ndarray:
+        scores = np.zeros(len(pairs), dtype=np.float32)
+        for i, (query, passage) in enumerate(pairs):
+            terms = set(query.lower().split())
+            if terms:
+                scores[i] = len(terms & set(passage.lower().split())) / len(terms)
+        return scores
+
+@dataclass
+class RerankResult:
+    chunks: List[RetrievedChunk]
+    reranked: int  # Leading candidates scored before the budget ran out
+    seconds: float
+
+class Reranker:
+    """
+    Second retrieval stage scoring (query, chunk) pairs with a cross-encoder.
+    
+    Candidates are scored in batches in their first-stage order. Before each
+    batch the time spent so far plus the duration of the previous batch is
+    checked against the latency budget, so scoring stops before a batch that
+    would overrun it. Scored candidates come first, ordered by the model,
+    and the rest keep their first-stage order. Calls are serialized because
+    the model already uses all CPU threads.
+    """
+    
+    def __init__(self, model: RerankModel, *, batch_size: int = 16):
+        self.model = model
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+    
+    def rerank(
+        self, query: str, chunks: Sequence[RetrievedChunk], *, budget_ms: Optional[float] = None
+    ) -> RerankResult:
+        """Reorder first-stage candidates, spending at most about `budget_ms`"""
+        started = time.perf_counter()
+        deadline = None if budget_ms is None else started + budget_ms / 1000
+        scores: List[float] = []
+        with self._lock:
+            last_batch = 0.0
+            for start in range(0, len(chunks), self.batch_size):
+                now = time.perf_counter()
+                if deadline is not None and now + last_batch > deadline:
+                    break
+                batch = chunks[start:start + self.batch_size]
+                scores.extend(self.model.predict([(query, chunk.content) for chunk in batch]).tolist())
+                last_batch = time.perf_counter() - now
+        
+        scored = [
+            chunk.model_copy(update={"rerank_score": score}) for chunk, score in zip(chunks, scores)
+        ]
+        scored.sort(key=lambda chunk: -chunk.rerank_score)
+        return RerankResult(
+            chunks=scored + list(chunks[len(scores):]),
+            reranked=len(scores),
+            seconds=time.perf_counter() - started,
+        )
+
+def load_rerank_model(name: str) -> RerankModel:
+    """Load a cross-encoder by name, `overlap` selects the built-in stand-in"""
+    if name == "overlap":
+        return TokenOverlapModel()
+    return CrossEncoderModel(name)
+
+@lru_cache()
+def get_reranker() -> Optional[Reranker]:
+    """Return the process-wide reranker, None when no model is configured"""
+    if not settings.RERANK_MODEL:
+        return None
+    return Reranker(load_rerank_model(settings.RERANK_MODEL), batch_size=settings.RERANK_BATCH_SIZE)
\ No newline at end of file
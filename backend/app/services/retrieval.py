@@ -0,0 +1,471 @@
+import asyncio
+import heapq
+import logging
+from functools import lru_cache
+from collections import defaultdict
+from typing import Awaitable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app import crud
+from app.core.config import settings
+from app.schemas.search import RetrievalResult, RetrievedChunk, SearchOptions
+from app.services.chunking import join_chunks
+from app.services.diversity import cap_per_document, maximal_marginal_relevance
+from app.services.embedding_cache import CachedEmbedder, get_embedder
+from app.services.lexical import LexicalIndex, ScoredChunk, get_lexical_index
+from app.services.reranking import Reranker, get_reranker
+from app.services.retrieval_cache import RetrievalCache, get_retrieval_cache
+from app.services.vector_store import VectorHit, VectorStore, VectorStoreRegistry, get_vector_stores
+
+logger = logging.getLogger(__name__)
+
+def reciprocal_rank_fusion(rankings: Dict[str, List[ScoredChunk]], k: int = 60) -> Dict[int, float]:
+    """Sum 1 / (k + rank) over the rankings every chunk appears in"""
+    fused: Dict[int, float] = {}
+    for ranking in rankings.values():
+        for rank, hit in enumerate(ranking, start=1):
+            fused[hit.chunk_id] = fused.get(hit.chunk_id, 0.0) + 1.0 / (k + rank)
+    return fused
+
+def weighted_score_fusion(
+    rankings: Dict[str, List[ScoredChunk]], weights: Dict[str, float]
+) -> Dict[int, float]:
+    """Sum min-max normalized scores, weighted per ranking"""
+    fused: Dict[int, float] = {}
+    for name, ranking in rankings.items():
+        if not ranking:
+            continue
+        scores = np.array([hit.score for hit in ranking], dtype=np.float64)
+        low, span = scores.min(), scores.max() - scores.min()
+        normalized = (scores - low) / span if span > 0 else np.ones_like(scores)
+        for hit, score in zip(ranking, normalized):
+            fused[hit.chunk_id] = fused.get(hit.chunk_id, 0.0) + weights.get(name, 1.0) * float(score)
+    return fused
+
+def merge_results(results: Sequence[RetrievalResult], k: int, rrf_k: int = 60) -> RetrievalResult:
+    """
+    Fuse the results of several queries of one turn by reciprocal rank.
+    
+    The best `k` chunks are kept, ties going to the earlier query. Rerank
+    counts and times add up and the result is cached only if all were.
+    """
+    if len(results) == 1:
+        return results[0]
+    fused = reciprocal_rank_fusion({str(i): result.chunks for i, result in enumerate(results)}, rrf_k)
+    chunks: Dict[int, RetrievedChunk] = {}
+    for result in results:
+        for chunk in result.chunks:
+            chunks.setdefault(chunk.chunk_id, chunk)
+    rerank_ms = [result.rerank_ms for result in results if result.rerank_ms is not None]
+    return RetrievalResult(
+        chunks=[chunks[i] for i in sorted(chunks, key=lambda i: -fused[i])[:k]],
+        reranked=sum(result.reranked for result in results),
+        rerank_ms=sum(rerank_ms) if rerank_ms else None,
+        cached=all(result.cached for result in results),
+    )
+
+def merge_windows(chunks: Sequence[RetrievedChunk], neighbours: int) -> List[Tuple[RetrievedChunk, int, int]]:
+    """
+    Merge the `chunk_index ± neighbours` windows of hits that overlap or touch.
+    
+    Returns (hit, first, last) per merged window, where the hit is the best
+    ranked one inside the window, in the order of those hits.
+    """
+    by_document: Dict[int, List[Tuple[int, int, int]]] = defaultdict(list)
+    for rank, chunk in enumerate(chunks):
+        index = chunk.chunk_index
+        by_document[chunk.document_id].append((max(0, index - neighbours), index + neighbours, rank))
+    merged = []
+    for windows in by_document.values():
+        windows.sort()
+        first, last, best = windows[0]
+        for start, stop, rank in windows[1:]:
+            if start <= last + 1:
+                last, best = max(last, stop), min(best, rank)
+            else:
+                merged.append((best, first, last))
+                first, last, best = start, stop, rank
+        merged.append((best, first, last))
+    merged.sort()
+    return [(chunks[best], first, last) for best, first, last in merged]
+
+class HybridRetriever:
+    """
+    Retrieve chunks by combining vector and lexical search.
+    
+    Both searches run concurrently off the event loop, each returning up to
+    `candidates` chunks, and their rankings are fused with reciprocal rank
+    fusion or a weighted sum of normalized scores as chosen in the search
+    options. Vector search only visits the stores of the requested
+    collections and, inside them, the owner's vectors. Keyword matches
+    catch exact identifiers such as part numbers or error codes that
+    embeddings tend to blur. If one search fails the other one's results
+    are still returned.
+    
+    When the options ask for it and a `reranker` is configured, the best
+    `rerank_candidates` fused chunks are reordered by a cross-encoder within
+    the request's latency budget before the top results are cut.
+    
+    Options can then cap the chunks taken from one document and diversify
+    the rest with maximal marginal relevance, so near-identical chunks do
+    not take up several context slots.
+    
+    With a `cache`, results are looked up by query and searched collections
+    first, so a repeated question skips embedding and both searches and only
+    loads the cached chunks.
+    
+    Finally each hit can be expanded with its neighbouring chunks, merging
+    the windows of hits close to each other in the same document.
+    """
+    
+    def __init__(
+        self,
+        embedder: CachedEmbedder,
+        vector_stores: VectorStoreRegistry,
+        lexical_index: LexicalIndex,
+        reranker: Optional[Reranker] = None,
+        *,
+        cache: Optional[RetrievalCache] = None,
+        candidates: int = 50,
+        rrf_k: int = 60,
+    ):
+        self.embedder = embedder
+        self.vector_stores = vector_stores
+        self.lexical_index = lexical_index
+        self.reranker = reranker
+        self.cache = cache
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+    
+    def _stores_for(
+        self, db: Session, owner_id: int, collection_ids: Optional[Sequence[int]]
+    ) -> List[VectorStore]:
+        """Vector stores holding the owner's chunks in the requested collections"""
+        if collection_ids:
+            collections = crud.collection.get_multi_by_ids(db, ids=collection_ids, owner_id=owner_id)
+            return [self.vector_stores.for_collection(c) for c in collections]
+        used = crud.document.get_collection_ids(db, owner_id=owner_id)
+        collections = crud.collection.get_multi_by_ids(
+            db, ids=[i for i in used if i is not None], owner_id=owner_id
+        )
+        stores = [self.vector_stores.for_collection(c) for c in collections]
+        if None in used:
+            stores.append(self.vector_stores.for_collection(None))
+        return stores
+    
+    async def _semantic(
+        self, embedded: Awaitable[np.ndarray], stores: List[VectorStore], owner_id: int, k: int
+    ) -> List[List[VectorHit]]:
+        vectors = await embedded
+        
+        def search() -> List[List[VectorHit]]:
+            # Vector IDs are scoped by owner, so other owners' vectors are skipped inside the index
+            return [
+                heapq.nlargest(
+                    k,
+                    [hit for store in stores for hit in store.search(vector, k, scope=str(owner_id))],
+                    key=lambda hit: hit.score,
+                )
+                for vector in vectors
+            ]
+        
+        return await run_in_threadpool(search)
+    
+    def _chunks_for_vectors(
+        self,
+        db: Session,
+        hits: List[VectorHit],
+        owner_id: int,
+        collection_ids: Optional[Sequence[int]],
+    ) -> List[ScoredChunk]:
+        """Rank the owner's chunks by the score of the vector they use"""
+        rows = crud.document_chunk.get_ids_by_vector_ids(
+            db, vector_ids=[hit.vector_id for hit in hits], owner_id=owner_id, collection_ids=collection_ids
+        )
+        scores = {hit.vector_id: hit.score for hit in hits}
+        ranked = [ScoredChunk(row.id, scores[row.vector_id]) for row in rows]
+        ranked.sort(key=lambda hit: (-hit.score, hit.chunk_id))
+        return ranked
+    
+    async def retrieve(
+        self, db: Session, query: str, *, owner_id: int, options: Optional[SearchOptions] = None
+    ) -> RetrievalResult:
+        """Return the best chunks of the owner for a query, best first"""
+        return (await self.retrieve_many(db, [query], owner_id=owner_id, options=options))[0]
+    
+    async def retrieve_many(
+        self,
+        db: Session,
+        queries: Sequence[str],
+        *,
+        owner_id: int,
+        options: Optional[SearchOptions] = None,
+    ) -> List[RetrievalResult]:
+        """
+        Retrieve for several queries of one chat turn at once.
+        
+        The queries not answered from the cache are embedded in one call and
+        sent to the lexical index as one batch, which backends such as
+        Elasticsearch serve with a single request.
+        """
+        options = options or SearchOptions()
+        results: List[Optional[RetrievalResult]] = [None] * len(queries)
+        keys: List[Optional[str]] = [None] * len(queries)
+        if self.cache is not None:
+            keys = await run_in_threadpool(self._cache_keys, db, queries, owner_id, options)
+            for i, key in enumerate(keys):
+                cached = None if key is None else await run_in_threadpool(self.cache.get, key)
+                if cached is not None:
+                    results[i] = await run_in_threadpool(self._from_cache, db, cached)
+        
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            searched = await self._search(db, [queries[i] for i in missing], owner_id, options)
+            for i, result in zip(missing, searched):
+                results[i] = result
+                if keys[i] is not None:
+                    await run_in_threadpool(self.cache.put, keys[i], self._to_cache(result))
+        if options.neighbour_chunks > 0:
+            results = await run_in_threadpool(self._expand, db, results, options.neighbour_chunks)
+        return results
+    
+    @staticmethod
+    def _expand(db: Session, results: List[RetrievalResult], neighbours: int) -> List[RetrievalResult]:
+        """Replace the content of hits by their merged windows, reading all windows in one query"""
+        windows = [merge_windows(result.chunks, neighbours) for result in results]
+        ranges = [(hit.document_id, first, last) for merged in windows for hit, first, last in merged]
+        contents: Dict[int, List[Tuple[int, str]]] = defaultdict(list)
+        for row in crud.document_chunk.get_ranges(db, ranges=ranges):
+            contents[row.document_id].append((row.chunk_index, row.content))
+        
+        expanded = []
+        for result, merged in zip(results, windows):
+            chunks = []
+            for hit, first, last in merged:
+                # A hit whose document changed since it was cached keeps its own content
+                rows = [(i, c) for i, c in contents[hit.document_id] if first <= i <= last]
+                rows = rows or [(hit.chunk_index, hit.content)]
+                chunks.append(hit.model_copy(update={
+                    "content": join_chunks(content for _, content in rows),
+                    "window": (rows[0][0], rows[-1][0]),
+                }))
+            expanded.append(result.model_copy(update={"chunks": chunks}))
+        return expanded
+    
+    def _cache_keys(
+        self, db: Session, queries: Sequence[str], owner_id: int, options: SearchOptions
+    ) -> List[Optional[str]]:
+        collection_ids = options.collection_ids or crud.document.get_collection_ids(db, owner_id=owner_id)
+        model_names = [self.embedder.model_name]
+        if options.rerank and self.reranker is not None:
+            model_names.append(self.reranker.model.name)
+        return [
+            self.cache.key(
+                query,
+                model_names=model_names,
+                owner_id=owner_id,
+                collection_ids=collection_ids,
+                options=options,
+            )
+            for query in queries
+        ]
+    
+    @staticmethod
+    def _to_cache(result: RetrievalResult) -> dict:
+        return {
+            "chunks": [
+                [c.chunk_id, c.score, c.semantic_rank, c.lexical_rank, c.rerank_score] for c in result.chunks
+            ],
+            "reranked": result.reranked,
+        }
+    
+    @staticmethod
+    def _from_cache(db: Session, cached: dict) -> RetrievalResult:
+        chunks = {
+            chunk.id: chunk
+            for chunk in crud.document_chunk.get_multi_by_ids(db, ids=[entry[0] for entry in cached["chunks"]])
+        }
+        return RetrievalResult(
+            chunks=[
+                RetrievedChunk(
+                    chunk_id=chunk_id,
+                    document_id=chunks[chunk_id].document_id,
+                    chunk_index=chunks[chunk_id].chunk_index,
+                    content=chunks[chunk_id].content,
+                    score=score,
+                    semantic_rank=semantic_rank,
+                    lexical_rank=lexical_rank,
+                    rerank_score=rerank_score,
+                    metadata=chunks[chunk_id].metadata_,
+                )
+                for chunk_id, score, semantic_rank, lexical_rank, rerank_score in cached["chunks"]
+                if chunk_id in chunks
+            ],
+            reranked=cached["reranked"],
+            cached=True,
+        )
+    
+    def _fuse(self, rankings: Dict[str, List[ScoredChunk]], options: SearchOptions, limit: int) -> List[tuple]:
+        if options.fusion == "weighted":
+            fused = weighted_score_fusion(
+                rankings,
+                {"semantic": options.semantic_weight, "lexical": 1 - options.semantic_weight},
+            )
+        else:
+            fused = reciprocal_rank_fusion(rankings, self.rrf_k)
+        return heapq.nlargest(limit, fused.items(), key=lambda item: (item[1], -item[0]))
+    
+    @staticmethod
+    def _stored_vectors(stores: Sequence[VectorStore], vector_ids: Iterable[str]) -> Dict[str, np.ndarray]:
+        """Vectors by ID, looked up store by store until all are found"""
+        found: Dict[str, np.ndarray] = {}
+        for store in stores:
+            missing = [vector_id for vector_id in vector_ids if vector_id not in found]
+            if not missing:
+                break
+            found.update(store.fetch(missing))
+        return found
+    
+    async def _diversify(
+        self,
+        query_vector: np.ndarray,
+        chunks: List[RetrievedChunk],
+        stores: Sequence[VectorStore],
+        vector_ids: Dict[int, Optional[str]],
+        options: SearchOptions,
+    ) -> List[RetrievedChunk]:
+        """Pick `max_results` of the ranked chunks by maximal marginal relevance"""
+        # Candidates are compared by the vectors indexed for them, only chunks
+        # not in the searched stores yet are embedded
+        wanted = [vector_ids.get(chunk.chunk_id) for chunk in chunks]
+        stored = await run_in_threadpool(self._stored_vectors, stores, {i for i in wanted if i})
+        vectors = np.empty((len(chunks), len(query_vector)), dtype=np.float32)
+        missing = []
+        for i, vector_id in enumerate(wanted):
+            if vector_id in stored:
+                vectors[i] = stored[vector_id]
+            else:
+                missing.append(i)
+        if missing:
+            vectors[missing] = await self.embedder.aembed([chunks[i].content for i in missing])
+        picked = maximal_marginal_relevance(
+            query_vector, vectors, options.max_results, lambda_=options.mmr_lambda
+        )
+        return [chunks[i] for i in picked]
+    
+    async def _search(
+        self, db: Session, queries: Sequence[str], owner_id: int, options: SearchOptions
+    ) -> List[RetrievalResult]:
+        rerank = options.rerank and self.reranker is not None
+        collection_ids = options.collection_ids or None
+        candidates = max(self.candidates, options.max_results)
+        
+        searches = {}
+        stores: Optional[List[VectorStore]] = None
+        embedded: Optional[asyncio.Future] = None
+        if options.use_semantic_search:
+            stores = await run_in_threadpool(self._stores_for, db, owner_id, collection_ids)
+            # Kept for diversifying, which compares candidates with the same query vectors
+            embedded = asyncio.ensure_future(self.embedder.aembed(queries))
+            searches["semantic"] = self._semantic(embedded, stores, owner_id, candidates)
+        if options.use_lexical_search:
+            searches["lexical"] = self.lexical_index.asearch_many(
+                queries, owner_id=owner_id, collection_ids=collection_ids, k=candidates
+            )
+        if not searches:
+            return [RetrievalResult(chunks=[]) for _ in queries]
+        results = await asyncio.gather(*searches.values(), return_exceptions=True)
+        
+        per_search: Dict[str, list] = {}
+        for name, result in zip(searches, results):
+            if isinstance(result, Exception):
+                logger.warning("%s search failed: %s", name, result)
+                continue
+            per_search[name] = result
+        if not per_search:
+            raise results[0]
+        if "semantic" in per_search:
+            per_search["semantic"] = await run_in_threadpool(
+                lambda: [
+                    self._chunks_for_vectors(db, hits, owner_id, collection_ids)
+                    for hits in per_search["semantic"]
+                ]
+            )
+        
+        limit = options.max_results
+        if rerank:
+            limit = max(limit, options.rerank_candidates)
+        if options.diversify or options.max_per_document:
+            limit = max(limit, options.mmr_candidates)
+        rankings = [{name: ranked[i] for name, ranked in per_search.items()} for i in range(len(queries))]
+        tops = [self._fuse(r, options, limit) for r in rankings]
+        chunks = {
+            chunk.id: chunk
+            for chunk in await run_in_threadpool(
+                crud.document_chunk.get_multi_by_ids,
+                db,
+                ids=list({chunk_id for top in tops for chunk_id, _ in top}),
+            )
+        }
+        
+        vector_ids = {chunk.id: chunk.vector_id for chunk in chunks.values()}
+        
+        results = []
+        for i, (query, ranking, top) in enumerate(zip(queries, rankings, tops)):
+            ranks = {
+                name: {hit.chunk_id: rank for rank, hit in enumerate(ranked, start=1)}
+                for name, ranked in ranking.items()
+            }
+            retrieved = [
+                RetrievedChunk(
+                    chunk_id=chunk_id,
+                    document_id=chunks[chunk_id].document_id,
+                    chunk_index=chunks[chunk_id].chunk_index,
+                    content=chunks[chunk_id].content,
+                    score=score,
+                    semantic_rank=ranks.get("semantic", {}).get(chunk_id),
+                    lexical_rank=ranks.get("lexical", {}).get(chunk_id),
+                    metadata=chunks[chunk_id].metadata_,
+                )
+                for chunk_id, score in top
+                if chunk_id in chunks
+            ]
+            stats = {}
+            if rerank:
+                reranked = await run_in_threadpool(
+                    self.reranker.rerank, query, retrieved, budget_ms=options.rerank_budget_ms
+                )
+                logger.debug(
+                    "Reranked %d of %d candidates in %.1f ms",
+                    reranked.reranked,
+                    len(retrieved),
+                    reranked.seconds * 1000,
+                )
+                retrieved = reranked.chunks
+                stats = {"reranked": reranked.reranked, "rerank_ms": reranked.seconds * 1000}
+            
+            retrieved = cap_per_document(retrieved, options.max_per_document)
+            if options.diversify and len(retrieved) > options.max_results:
+                if stores is None:
+                    stores = await run_in_threadpool(self._stores_for, db, owner_id, collection_ids)
+                if embedded is None:
+                    embedded = asyncio.ensure_future(self.embedder.aembed(queries))
+                retrieved = await self._diversify((await embedded)[i], retrieved, stores, vector_ids, options)
+            results.append(RetrievalResult(chunks=retrieved[:options.max_results], **stats))
+        return results
+
+@lru_cache()
+def get_retriever() -> HybridRetriever:
+    """Return the process-wide retriever"""
+    return HybridRetriever(
+        get_embedder(),
+        get_vector_stores(),
+        get_lexical_index(),
+        get_reranker(),
+        cache=get_retrieval_cache() if settings.RETRIEVAL_CACHE else None,
+        candidates=settings.RETRIEVAL_CANDIDATES,
+        rrf_k=settings.RETRIEVAL_RRF_K,
+    )
\ No newline at end of file
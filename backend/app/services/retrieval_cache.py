@@ -0,0 +1,115 @@
+import hashlib
+import json
+import logging
+from functools import lru_cache
+from typing import List, Optional, Sequence
+
+import redis
+
+from app.core.config import settings
+from app.schemas.search import SearchOptions
+
+logger = logging.getLogger(__name__)
+
+def normalize_query(query: str) -> str:
+    """Lowercase and collapse whitespace, so trivially different questions share entries"""
+    return " ".join(query.lower().split())
+
+class RetrievalCache:
+    """
+    Retrieval results cached in Redis.
+    
+    Entries hold chunk IDs with their scores and ranks, not chunk contents,
+    and are keyed by the normalized query, the models involved, the owner,
+    the sorted set of searched collections, the search options and the
+    current version of every one of those collections. Each collection, and
+    the documents an owner keeps outside any collection, has a version
+    counter that is bumped whenever a document in it is indexed, re-indexed
+    or deleted. Entries of older versions are never read again and expire
+    after `ttl_seconds`.
+    
+    Redis errors are logged and treated as misses, so retrieval keeps
+    working when the cache is unavailable.
+    """
+    
+    def __init__(self, client: redis.Redis, ttl_seconds: int, prefix: str = "retrieval:"):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+    
+    def _version_key(self, owner_id: int, collection_id: Optional[int]) -> str:
+        if collection_id is None:
+            return f"{self.prefix}version:owner:{owner_id}"
+        return f"{self.prefix}version:collection:{collection_id}"
+    
+    def versions(self, owner_id: int, collection_ids: Sequence[Optional[int]]) -> Optional[List[int]]:
+        """Current versions of the collections in the order given, None when they cannot be read"""
+        try:
+            versions = self.client.mget([self._version_key(owner_id, c) for c in collection_ids]) if collection_ids else []
+        except redis.RedisError as e:
+            logger.warning("Retrieval cache unavailable: %s", e)
+            return None
+        return [int(v or 0) for v in versions]
+    
+    def key(
+        self,
+        query: str,
+        *,
+        model_names: Sequence[str],
+        owner_id: int,
+        collection_ids: Sequence[Optional[int]],
+        options: SearchOptions,
+    ) -> Optional[str]:
+        """Key of the entry for a search, None when the versions cannot be read"""
+        collections = sorted(collection_ids, key=lambda i: -1 if i is None else i)
+        versions = self.versions(owner_id, collections)
+        if versions is None:
+            return None
+        payload = json.dumps(
+            {
+                "query": normalize_query(query),
+                "models": list(model_names),
+                "owner_id": owner_id,
+                "collections": collections,
+                "versions": versions,
+                "options": options.model_dump(exclude={"collection_ids"}),
+            },
+            sort_keys=True,
+        )
+        return f"{self.prefix}result:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+    
+    def get(self, key: str) -> Optional[dict]:
+        try:
+            value = self.client.get(key)
+        except redis.RedisError as e:
+            logger.warning("Retrieval cache unavailable: %s", e)
+            return None
+        return None if value is None else json.loads(value)
+    
+    def put(self, key: str, value: dict) -> None:
+        try:
+            self.client.set(key, json.dumps(value), ex=self.ttl_seconds)
+        except redis.RedisError as e:
+            logger.warning("Retrieval cache unavailable: %s", e)
+    
+    def bump(self, owner_id: int, collection_ids: Sequence[Optional[int]]) -> None:
+        """Invalidate the cached results of searches over these collections"""
+        try:
+            for collection_id in set(collection_ids):
+                self.client.incr(self._version_key(owner_id, collection_id))
+        except redis.RedisError as e:
+            logger.warning("Could not invalidate retrieval cache: %s", e)
+
+@lru_cache()
+def get_retrieval_cache() -> Optional[RetrievalCache]:
+    """
+    Return the process-wide retrieval cache, None when disabled in settings.
+    
+    The answer cache keys its entries by the same collection versions, so
+    the cache is also returned, and bumped by ingestion, when only answers
+    are cached.
+    """
+    if not (settings.RETRIEVAL_CACHE or settings.ANSWER_CACHE):
+        return None
+    client = redis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, socket_timeout=1)
+    return RetrievalCache(client, settings.RETRIEVAL_CACHE_TTL)
\ No newline at end of file
@@ -0,0 +1,104 @@
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Iterable, List, Optional
+
+from elasticsearch import AsyncElasticsearch, Elasticsearch, helpers
+
+from app.core.config import settings
+
+@dataclass
+class BulkResult:
+    succeeded: int = 0
+    errors: List[dict] = field(default_factory=list)  # Items that failed after all retries
+
+def _failed(ok: bool, item: dict) -> bool:
+    # Deleting a document that is already gone is not an error
+    return not ok and item.get("delete", {}).get("status") != 404
+
+class ElasticsearchClients:
+    """
+    The Elasticsearch clients of one process.
+    
+    A synchronous client serves ingestion workers and an async one the API
+    event loop, each keeping a pool of up to `connections_per_node`
+    keep-alive connections per node. The API creates them on startup and
+    closes them on shutdown, workers create them on first use, after
+    forking, so every process has exactly one pool of each kind.
+    """
+    
+    def __init__(self, url: str, *, connections_per_node: int = 10, request_timeout: float = 10):
+        self.url = url
+        self._options = {"connections_per_node": connections_per_node, "request_timeout": request_timeout}
+        self._sync: Optional[Elasticsearch] = None
+        self._async: Optional[AsyncElasticsearch] = None
+    
+    @property
+    def sync(self) -> Elasticsearch:
+        if self._sync is None:
+            self._sync = Elasticsearch(self.url, **self._options)
+        return self._sync
+    
+    @property
+    def aio(self) -> AsyncElasticsearch:
+        if self._async is None:
+            self._async = AsyncElasticsearch(self.url, **self._options)
+        return self._async
+    
+    def open(self) -> None:
+        """Create both clients now instead of on first use"""
+        if self._sync is None:
+            self._sync = Elasticsearch(self.url, **self._options)
+        if self._async is None:
+            self._async = AsyncElasticsearch(self.url, **self._options)
+    
+    async def close(self) -> None:
+        if self._async is not None:
+            await self._async.close()
+            self._async = None
+        if self._sync is not None:
+            self._sync.close()
+            self._sync = None
+
+def bulk_index(
+    client: Elasticsearch,
+    actions: Iterable[dict],
+    *,
+    chunk_size: int = 500,
+    max_retries: int = 5,
+    initial_backoff: float = 1.0,
+) -> BulkResult:
+    """
+    Stream bulk actions in requests of `chunk_size` actions.
+    
+    Items rejected with 429 because the cluster is overloaded are retried
+    up to `max_retries` times, waiting `initial_backoff` seconds and twice
+    as long on every further attempt.
+    """
+    result = BulkResult()
+    for ok, item in helpers.streaming_bulk(
+        client,
+        actions,
+        chunk_size=chunk_size,
+        max_retries=max_retries,
+        initial_backoff=initial_backoff,
+        raise_on_error=False,
+    ):
+        if _failed(ok, item):
+            result.errors.append(item)
+        else:
+            result.succeeded += 1
+    return result
+
+@lru_cache()
+def get_elasticsearch() -> ElasticsearchClients:
+    """Return the Elasticsearch clients of this process"""
+    return ElasticsearchClients(
+        f"http://{settings.ELASTICSEARCH_HOST}:{settings.ELASTICSEARCH_PORT}",
+        connections_per_node=settings.ELASTICSEARCH_CONNECTIONS,
+        request_timeout=settings.ELASTICSEARCH_TIMEOUT,
+    )
+
+async def close_elasticsearch() -> None:
+    """Close the connection pools, the next use creates new ones"""
+    if get_elasticsearch.cache_info().currsize:
+        await get_elasticsearch().close()
\ No newline at end of file
@@ -0,0 +1,263 @@
+import hashlib
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import AsyncIterator, Iterator, List, Optional
+
+import boto3
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+
+@dataclass
+class StoredObject:
+    """Result of a completed upload"""
+    key: str
+    size: int
+    content_hash: str  # hex encoded SHA-256 of the object body
+
+class ObjectWriter(ABC):
+    """
+    Incremental writer for a single object.
+    
+    Incoming data is buffered until a full part is available and each part is
+    handed to the backend as soon as it fills, so at most one part (plus the
+    chunk being written) is held in memory. Size and SHA-256 are computed on
+    the fly while the data passes through.
+    """
+    
+    def __init__(self, key: str, part_size: int):
+        self.key = key
+        self.part_size = part_size
+        self.size = 0
+        self._hasher = hashlib.sha256()
+        self._buffer = bytearray()
+    
+    @property
+    def buffered(self) -> int:
+        """Number of bytes waiting for the next part"""
+        return len(self._buffer)
+    
+    def write(self, data: bytes) -> None:
+        """Append data, flushing every full part to the backend"""
+        self._hasher.update(data)
+        self.size += len(data)
+        self._buffer += data
+        while len(self._buffer) >= self.part_size:
+            part = bytes(self._buffer[:self.part_size])
+            del self._buffer[:self.part_size]
+            self._write_part(part)
+    
+    def complete(self) -> StoredObject:
+        """Flush the remaining data and finalize the object"""
+        if self._buffer:
+            self._write_part(bytes(self._buffer))
+            self._buffer.clear()
+        self._complete()
+        return StoredObject(key=self.key, size=self.size, content_hash=self._hasher.hexdigest())
+    
+    def abort(self) -> None:
+        """Discard everything written so far"""
+        self._buffer.clear()
+        self._abort()
+    
+    @abstractmethod
+    def _write_part(self, data: bytes) -> None:
+        ...
+    
+    @abstractmethod
+    def _complete(self) -> None:
+        ...
+    
+    @abstractmethod
+    def _abort(self) -> None:
+        ...
+
+class ObjectStorage(ABC):
+    """Storage backend for original document files"""
+    
+    part_size: int
+    
+    @abstractmethod
+    def open_writer(self, key: str) -> ObjectWriter:
+        """Start a new object upload"""
+    
+    @abstractmethod
+    def iter_chunks(self, key: str, chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+        """Read an object back in chunks"""
+    
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Delete an object if it exists"""
+    
+    @contextmanager
+    def local_copy(self, key: str) -> Iterator[str]:
+        """Download an object to a temporary file and yield its path"""
+        suffix = os.path.splitext(key)[1]
+        with tempfile.NamedTemporaryFile(suffix=suffix) as f:
+            for chunk in self.iter_chunks(key):
+                f.write(chunk)
+            f.flush()
+            yield f.name
+
+class S3MultipartWriter(ObjectWriter):
+    """Writer that maps every part onto an S3 multipart upload part"""
+    
+    def __init__(self, client, bucket: str, key: str, part_size: int):
+        super().__init__(key, part_size)
+        self._client = client
+        self._bucket = bucket
+        self._upload_id: Optional[str] = None
+        self._parts: List[dict] = []
+    
+    def _write_part(self, data: bytes) -> None:
+        if self._upload_id is None:
+            response = self._client.create_multipart_upload(Bucket=self._bucket, Key=self.key)
+            self._upload_id = response["UploadId"]
+        part_number = len(self._parts) + 1
+        response = self._client.upload_part(
+            Bucket=self._bucket,
+            Key=self.key,
+            UploadId=self._upload_id,
+            PartNumber=part_number,
+            Body=data,
+        )
+        self._parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+    
+    def _complete(self) -> None:
+        if self._upload_id is None:
+            # Empty file, multipart uploads need at least one part
+            self._client.put_object(Bucket=self._bucket, Key=self.key, Body=b"")
+            return
+        self._client.complete_multipart_upload(
+            Bucket=self._bucket,
+            Key=self.key,
+            UploadId=self._upload_id,
+            MultipartUpload={"Parts": self._parts},
+        )
+    
+    def _abort(self) -> None:
+        if self._upload_id is not None:
+            self._client.abort_multipart_upload(
+                Bucket=self._bucket, Key=self.key, UploadId=self._upload_id
+            )
+            self._upload_id = None
+
+class S3Storage(ObjectStorage):
+    """Object storage backed by an S3 bucket"""
+    
+    def __init__(self, bucket: str, part_size: int, client=None):
+        self.bucket = bucket
+        self.part_size = part_size
+        self.client = client or boto3.client(
+            "s3",
+            region_name=settings.AWS_REGION,
+            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+        )
+    
+    def open_writer(self, key: str) -> ObjectWriter:
+        return S3MultipartWriter(self.client, self.bucket, key, self.part_size)
+    
+    def iter_chunks(self, key: str, chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+        body = self.client.get_object(Bucket=self.bucket, Key=key)["Body"]
+        try:
+            yield from body.iter_chunks(chunk_size)
+        finally:
+            body.close()
+    
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+class LocalFileWriter(ObjectWriter):
+    """Writer that appends parts to a temporary file and renames it on completion"""
+    
+    def __init__(self, path: str, key: str, part_size: int):
+        super().__init__(key, part_size)
+        self._path = path
+        self._tmp_path = f"{path}.part"
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._file = open(self._tmp_path, "wb")
+    
+    def _write_part(self, data: bytes) -> None:
+        self._file.write(data)
+    
+    def _complete(self) -> None:
+        self._file.close()
+        os.replace(self._tmp_path, self._path)
+    
+    def _abort(self) -> None:
+        self._file.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+class LocalStorage(ObjectStorage):
+    """Object storage on the local filesystem, used for development and tests"""
+    
+    def __init__(self, root: str, part_size: int):
+        self.root = os.path.abspath(root)
+        self.part_size = part_size
+    
+    def path_for(self, key: str) -> str:
+        """Resolve a key to a path inside the storage root"""
+        path = os.path.abspath(os.path.join(self.root, key))
+        if os.path.commonpath([self.root, path]) != self.root:
+            raise ValueError(f"Invalid storage key: {key}")
+        return path
+    
+    def open_writer(self, key: str) -> ObjectWriter:
+        return LocalFileWriter(self.path_for(key), key, self.part_size)
+    
+    def iter_chunks(self, key: str, chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+        with open(self.path_for(key), "rb") as f:
+            while chunk := f.read(chunk_size):
+                yield chunk
+    
+    @contextmanager
+    def local_copy(self, key: str) -> Iterator[str]:
+        yield self.path_for(key)
+    
+    def delete(self, key: str) -> None:
+        path = self.path_for(key)
+        if os.path.exists(path):
+            os.remove(path)
+
+@lru_cache()
+def get_storage() -> ObjectStorage:
+    """Return the storage backend configured in settings"""
+    if settings.STORAGE_BACKEND == "local":
+        return LocalStorage(settings.LOCAL_STORAGE_PATH, settings.UPLOAD_PART_SIZE)
+    if settings.STORAGE_BACKEND == "s3":
+        return S3Storage(settings.S3_BUCKET_NAME, settings.UPLOAD_PART_SIZE)
+    raise ValueError(f"Unknown storage backend: {settings.STORAGE_BACKEND}")
+
+async def iter_upload_file(file: UploadFile, chunk_size: int) -> AsyncIterator[bytes]:
+    """Read an uploaded form file in fixed-size chunks"""
+    while chunk := await file.read(chunk_size):
+        yield chunk
+
+async def stream_to_storage(
+    storage: ObjectStorage, key: str, chunks: AsyncIterator[bytes]
+) -> StoredObject:
+    """
+    Stream an async byte source into storage.
+    
+    Chunks are buffered in the event loop and only the calls that flush a
+    part (and therefore block on I/O) are moved to the thread pool. The
+    upload is aborted if the source fails or the client disconnects.
+    """
+    writer = storage.open_writer(key)
+    try:
+        async for chunk in chunks:
+            if writer.buffered + len(chunk) >= writer.part_size:
+                await run_in_threadpool(writer.write, chunk)
+            else:
+                writer.write(chunk)
+        return await run_in_threadpool(writer.complete)
+    except BaseException:
+        await run_in_threadpool(writer.abort)
+        raise
\ No newline at end of file
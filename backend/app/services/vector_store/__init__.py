@@ -0,0 +1,29 @@
+from functools import lru_cache
+
+from app.core.config import settings
+from app.services.vector_store.base import VectorHit, VectorStore, scope_of
+from app.services.vector_store.ivf import IVFVectorStore
+from app.services.vector_store.quantization import (
+    ProductQuantizer,
+    QuantizationReport,
+    Quantizer,
+    ScalarQuantizer,
+    build_quantizer,
+    quantization_report,
+)
+from app.services.vector_store.registry import VectorStoreRegistry
+from app.services.vector_store.sharded import ShardedVectorStore, shard_of
+
+@lru_cache()
+def get_vector_stores() -> VectorStoreRegistry:
+    """Return the per-collection vector stores of the backend configured in settings"""
+    if settings.VECTOR_STORE_BACKEND == "local":
+        return VectorStoreRegistry(
+            settings.VECTOR_STORE_PATH,
+            settings.EMBEDDING_DIMENSION,
+            n_probe=settings.VECTOR_STORE_N_PROBE,
+            train_size=settings.VECTOR_STORE_TRAIN_SIZE,
+            shards=settings.VECTOR_STORE_SHARDS,
+            search_threads=settings.VECTOR_STORE_SEARCH_THREADS,
+        )
+    raise ValueError(f"Unknown vector store backend: {settings.VECTOR_STORE_BACKEND}")
\ No newline at end of file
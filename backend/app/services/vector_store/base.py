@@ -0,0 +1,56 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+@dataclass
+class VectorHit:
+    """A search result, scores are inner products of normalized vectors"""
+    vector_id: str
+    score: float
+
+def scope_of(vector_id: str) -> str:
+    """Scope of a vector, the part of its ID before the first colon"""
+    return vector_id.split(":", 1)[0]
+
+class VectorStore(ABC):
+    """
+    Interface of the stores `DocumentChunk.vector_id` points into.
+    
+    Vectors are addressed by string IDs. Adding an existing ID replaces its
+    vector and deleting unknown IDs is a no-op, so callers can replay the
+    same changes safely.
+    
+    IDs of the form `scope:key` place a vector in a scope, searches can be
+    limited to one scope without ranking the vectors outside of it.
+    """
+    
+    dimension: int
+    
+    @abstractmethod
+    def add(self, ids: Sequence[str], vectors: np.ndarray) -> None:
+        ...
+    
+    @abstractmethod
+    def delete(self, ids: Sequence[str]) -> None:
+        ...
+    
+    @abstractmethod
+    def search(self, query: np.ndarray, k: int, *, scope: Optional[str] = None) -> List[VectorHit]:
+        ...
+    
+    @abstractmethod
+    def fetch(self, ids: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Stored vectors by ID, unknown IDs are left out"""
+    
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+    
+    @abstractmethod
+    def __contains__(self, vector_id: str) -> bool:
+        ...
+    
+    def persist(self) -> None:
+        """Make changes durable, stores backed by a service have nothing to do"""
\ No newline at end of file
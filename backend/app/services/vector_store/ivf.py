@@ -0,0 +1,553 @@
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services.vector_store.base import VectorHit, VectorStore, scope_of
+from app.services.vector_store.quantization import Quantizer
+from app.services.vector_store.snapshot import (
+    append_bytes,
+    append_rows,
+    file_name,
+    map_rows,
+    read_bytes,
+    read_manifest,
+    read_rows,
+    save_array,
+    snapshot_version,
+    write_lock,
+    write_manifest,
+)
+
+# Rows copied, encoded or assigned to lists at once
+BLOCK_ROWS = 65536
+
+def spherical_kmeans(data: np.ndarray, n_lists: int, rng: np.random.Generator, iterations: int = 10) -> np.ndarray:
+    """Unit-length centroids of `n_lists` clusters of the rows by inner product"""
+    centroids = data[rng.choice(len(data), n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        labels = np.argmax(data @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, data)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        # Empty lists keep their previous centroid
+        centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+    return centroids.astype(np.float32)
+
+class IVFVectorStore(VectorStore):
+    """
+    In-process inverted file index over NumPy arrays.
+    
+    Vectors live in one contiguous float32 matrix and are searched exactly
+    until `train_size` of them exist. From then on they are clustered with
+    spherical k-means into about sqrt(n) lists and a query only scores the
+    vectors of the `n_probe` lists whose centroids are closest. The lists are
+    re-trained whenever the index has grown four-fold since the last time.
+    With `train_lists` off the store leaves that to its owner, which passes
+    centroids to `set_centroids`, so several stores can share the same lists.
+    
+    With a `quantizer`, trained together with the lists, candidates are
+    ranked on compressed codes and only the best `rescore * k` of them are
+    scored again with the float32 vectors. The float matrix is then only read
+    for those few rows per query, and with a `path` it stays in its file and
+    only those rows are paged in. Without a `path` it is kept in memory next
+    to the codes.
+    
+    Every vector carries the code of its scope, the owner prefix of its ID.
+    A scoped search looks up the positions of the scope's live vectors and
+    how many of them each list holds, cached until the next change. Scopes
+    smaller than `train_size` are scanned exactly over just those positions.
+    Larger ones only probe lists holding vectors of the scope, skipping
+    other rows before scoring, and keep probing until `k` of them are found.
+    
+    Deleted vectors are tombstoned and the matrix is compacted once they
+    outnumber the live ones.
+    
+    With a `path` the vectors, IDs, list assignments and codes are kept in
+    append-only files in that directory, memory-mapped read-only and
+    searched in place, so every API and worker process on a host shares
+    the page-cached copy. A manifest names the files and how many rows of
+    them are published. Every change takes the directory's write lock,
+    first catches up with what other processes appended, then appends its
+    own rows and tombstones and publishes a new manifest, so concurrent
+    writers never overwrite each other. Only compaction and training write
+    new files. Readers pick up a newer manifest on their next search,
+    reading just the appended IDs and tombstones.
+    """
+    
+    def __init__(
+        self,
+        dimension: int,
+        *,
+        n_probe: int = 8,
+        train_size: int = 1024,
+        path: Optional[str] = None,
+        quantizer: Optional[Quantizer] = None,
+        rescore: int = 4,
+        train_lists: bool = True,
+        seed: int = 0,
+    ):
+        self.dimension = dimension
+        self.n_probe = n_probe
+        self.train_size = train_size
+        self.quantizer = quantizer
+        self.rescore = rescore
+        self.train_lists = train_lists
+        self.path = path
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.RLock()
+        self._version: Optional[tuple] = None
+        self._reset()
+        self._reload_if_changed()
+    
+    def _reset(self) -> None:
+        self._vectors = np.empty((0, self.dimension), dtype=np.float32)
+        self._count = 0
+        self._ids: List[str] = []
+        self._positions: Dict[str, int] = {}
+        self._live = np.empty(0, dtype=bool)
+        self._centroids: Optional[np.ndarray] = None
+        self._assign = np.empty(0, dtype=np.int32)
+        self._codes: Optional[np.ndarray] = None
+        self._trained_count = 0
+        self._lists: Optional[List[np.ndarray]] = None
+        self._scopes = np.empty(0, dtype=np.int32)
+        self._scope_codes: Dict[str, int] = {}
+        self._filters: Dict[str, Tuple[np.ndarray, Optional[np.ndarray]]] = {}
+        self._files: Dict[str, str] = {}  # Array name to the file in `path` holding it
+        self._ids_bytes = 0  # Of the IDs file
+        self._deleted = 0  # Tombstones in the deleted file
+    
+    def __len__(self) -> int:
+        return len(self._positions)
+    
+    def __contains__(self, vector_id: str) -> bool:
+        return vector_id in self._positions
+    
+    @property
+    def is_trained(self) -> bool:
+        return self._centroids is not None
+    
+    @property
+    def trained_count(self) -> int:
+        """Live vectors when the lists were last trained"""
+        return self._trained_count
+    
+    @property
+    def is_mapped(self) -> bool:
+        """Whether vectors are read from files shared with other processes"""
+        return isinstance(self._vectors, np.memmap)
+    
+    @property
+    def memory_bytes(self) -> int:
+        """Bytes of vectors, codes and list assignments held in this process's own memory"""
+        return sum(array.nbytes for array in self._row_arrays() if not isinstance(array, np.memmap))
+    
+    @property
+    def mapped_bytes(self) -> int:
+        """Bytes of the files mapped instead, shared through the page cache"""
+        return sum(array.nbytes for array in self._row_arrays() if isinstance(array, np.memmap))
+    
+    @property
+    def searched_bytes(self) -> int:
+        """Bytes ranked per query scan, the codes when quantized"""
+        if self._codes is not None:
+            return self._codes[:self._count].nbytes
+        return self._vectors[:self._count].nbytes
+    
+    def _row_arrays(self) -> List[np.ndarray]:
+        arrays = [self._vectors, self._assign]
+        return arrays if self._codes is None else arrays + [self._codes]
+    
+    def configure(self, quantizer: Optional[Quantizer], rescore: int = 4) -> None:
+        """Switch quantization, re-encoding the stored vectors if already trained"""
+        with self._lock:
+            self.quantizer = quantizer
+            self.rescore = rescore
+            self._drop_codes()
+            if quantizer is not None and self._centroids is not None:
+                self._train_quantizer()
+    
+    def add(self, ids: Sequence[str], vectors: np.ndarray) -> None:
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, self.dimension)
+        if len(ids) != len(vectors):
+            raise ValueError("Number of IDs and vectors differ")
+        if not len(ids):
+            return
+        if len(set(ids)) != len(ids):
+            # The last vector given for an ID wins
+            keep = sorted({vector_id: i for i, vector_id in enumerate(ids)}.values())
+            ids, vectors = [ids[i] for i in keep], vectors[keep]
+        with self._writing():
+            self._mark_deleted(ids)
+            assign = self._nearest_list(vectors) if self._centroids is not None else np.zeros(len(ids), np.int32)
+            self._append_rows("vectors", vectors)
+            self._append_rows("assign", assign)
+            if self._codes is not None:
+                self._append_rows("codes", self._encode(vectors))
+            if self.path:
+                data = "".join(f"{vector_id}\n" for vector_id in ids).encode("utf-8")
+                append_bytes(self._file("ids"), data, self._ids_bytes)
+                self._ids_bytes += len(data)
+            self._extend(ids)
+            live = len(self._positions)
+            if self.train_lists and live >= self.train_size and live >= 4 * self._trained_count:
+                self._train()
+    
+    def delete(self, ids: Sequence[str]) -> None:
+        with self._writing():
+            self._mark_deleted(ids)
+            if self._count - len(self._positions) > len(self._positions):
+                self._compact()
+    
+    def persist(self) -> None:
+        """Publish codes re-encoded by `configure`, other changes are written as they are made"""
+        if self.path:
+            with self._writing():
+                pass
+    
+    def search(self, query: np.ndarray, k: int, *, scope: Optional[str] = None) -> List[VectorHit]:
+        query = np.asarray(query, dtype=np.float32).reshape(self.dimension)
+        self._reload_if_changed()
+        with self._lock:
+            if not self._positions or k <= 0:
+                return []
+            if scope is None:
+                k = min(k, len(self._positions))
+                if self._centroids is None:
+                    # Scan the whole matrix in place, a gather would copy it
+                    scores = self._vectors[:self._count] @ query
+                    scores[~self._live[:self._count]] = -np.inf
+                    return self._top_k(np.arange(self._count), scores, k)
+                lists = self._inverted_lists()
+                probe = np.argsort(self._centroids @ query)[::-1][:self.n_probe]
+                candidates = np.concatenate([lists[i] for i in probe])
+                candidates = candidates[self._live[candidates]]
+            else:
+                positions, list_counts = self._scope_filter(scope)
+                if not len(positions):
+                    return []
+                k = min(k, len(positions))
+                if list_counts is None or len(positions) < self.train_size:
+                    candidates = positions
+                else:
+                    lists = self._inverted_lists()
+                    order = np.argsort(self._centroids @ query)[::-1]
+                    order = order[list_counts[order] > 0]
+                    n_lists = max(self.n_probe, int(np.searchsorted(np.cumsum(list_counts[order]), k)) + 1)
+                    candidates = np.concatenate([lists[i] for i in order[:n_lists]])
+                    code = self._scope_codes[scope]
+                    candidates = candidates[self._live[candidates] & (self._scopes[candidates] == code)]
+            if self._codes is not None and len(candidates) > k:
+                approx = self.quantizer.score(self._codes[candidates], query)
+                shortlist = max(k, self.rescore * k)
+                if len(candidates) > shortlist:
+                    candidates = candidates[np.argpartition(approx, -shortlist)[-shortlist:]]
+            scores = self._vectors[candidates] @ query
+            return self._top_k(candidates, scores, k)
+    
+    def sample(self, n: int) -> np.ndarray:
+        """Up to `n` live vectors drawn at random, to train lists shared with other stores"""
+        self._reload_if_changed()
+        with self._lock:
+            live = np.flatnonzero(self._live[:self._count])
+            if len(live) > n:
+                live = np.sort(self._rng.choice(live, n, replace=False))
+            return np.array(self._vectors[live])
+    
+    def set_centroids(self, centroids: np.ndarray, trained_count: int) -> None:
+        """Use lists trained elsewhere, `trained_count` live vectors at the time"""
+        with self._writing():
+            self._use_centroids(np.asarray(centroids, dtype=np.float32), trained_count)
+    
+    def fetch(self, ids: Sequence[str]) -> Dict[str, np.ndarray]:
+        with self._lock:
+            found = [vector_id for vector_id in ids if vector_id in self._positions]
+            rows = self._vectors[[self._positions[vector_id] for vector_id in found]]
+        return dict(zip(found, rows))
+    
+    def _scope_filter(self, scope: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Positions of a scope's live vectors and their number per list"""
+        cached = self._filters.get(scope)
+        if cached is None:
+            code = self._scope_codes.get(scope)
+            if code is None:
+                positions = np.empty(0, dtype=np.int64)
+            else:
+                positions = np.flatnonzero((self._scopes[:self._count] == code) & self._live[:self._count])
+            list_counts = None
+            if self._centroids is not None:
+                list_counts = np.bincount(self._assign[positions], minlength=len(self._centroids))
+            cached = self._filters[scope] = (positions, list_counts)
+        return cached
+    
+    def _scope_code(self, scope: str) -> int:
+        return self._scope_codes.setdefault(scope, len(self._scope_codes))
+    
+    def _invalidate(self) -> None:
+        """Drop the lists and scope filters derived from the current rows"""
+        self._lists = None
+        self._filters = {}
+    
+    def _top_k(self, positions: np.ndarray, scores: np.ndarray, k: int) -> List[VectorHit]:
+        if len(positions) > k:
+            top = np.argpartition(scores, -k)[-k:]
+        else:
+            top = np.arange(len(positions))
+        top = top[np.argsort(scores[top])[::-1]]
+        return [VectorHit(self._ids[positions[i]], float(scores[i])) for i in top]
+    
+    @contextmanager
+    def _writing(self) -> Iterator[None]:
+        """Make a change on top of the latest published rows and publish it"""
+        with self._lock:
+            if not self.path:
+                yield
+                return
+            with write_lock(self.path):
+                self._reload_if_changed()
+                if not self._files:
+                    # The first write creates the files
+                    self._files = {name: file_name(name) for name in ("vectors", "ids", "deleted")}
+                yield
+                self._publish()
+    
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, self._files[name])
+    
+    def _publish(self) -> None:
+        """Write codes only held in memory and point a new manifest at the current files"""
+        if self._codes is not None and "codes" not in self._files:
+            self._replace_rows("codes", self._codes[:self._count])
+            for key, value in self.quantizer.get_state().items():
+                self._files[f"q_{key}"] = save_array(self.path, f"q_{key}", value)
+        write_manifest(
+            self.path,
+            {
+                "dimension": self.dimension,
+                "count": self._count,
+                "ids_bytes": self._ids_bytes,
+                "deleted": self._deleted,
+                "trained_count": self._trained_count,
+                "quantizer": self.quantizer.name if "codes" in self._files else None,
+                "files": self._files,
+            },
+        )
+        self._version = snapshot_version(self.path)
+    
+    def _reload_if_changed(self) -> None:
+        if not self.path:
+            return
+        version = snapshot_version(self.path)
+        if version is None or version == self._version:
+            return
+        with self._lock:
+            manifest = read_manifest(self.path)
+            if manifest["dimension"] != self.dimension:
+                raise ValueError(
+                    f"Index at {self.path} has dimension {manifest['dimension']}, expected {self.dimension}"
+                )
+            if self._appended_only(manifest):
+                self._follow(manifest)
+            else:
+                self._load(manifest)
+            self._version = version
+    
+    def _appended_only(self, manifest: dict) -> bool:
+        """Whether the manifest only adds rows and tombstones to the files already read"""
+        files = manifest["files"]
+        if not self._files or manifest["count"] < self._count:
+            return False
+        structure = ("vectors", "ids", "deleted", "assign", "centroids")
+        if any(files.get(name) != self._files.get(name) for name in structure):
+            return False
+        if "codes" in self._files:
+            return files.get("codes") == self._files["codes"]
+        # Codes this process encoded itself are replaced by published ones of the same quantizer
+        return self.quantizer is None or manifest["quantizer"] != self.quantizer.name
+    
+    def _load(self, manifest: dict) -> None:
+        self._reset()
+        self._files = dict(manifest["files"])
+        if "centroids" in self._files:
+            self._centroids = np.load(self._file("centroids"))
+        quantized = self.quantizer is not None and manifest["quantizer"] == self.quantizer.name
+        if quantized:
+            self.quantizer.set_state(
+                {key[2:]: np.load(self._file(key)) for key in self._files if key.startswith("q_")}
+            )
+            self._codes = np.empty((0, self.quantizer.bytes_per_vector(self.dimension)), dtype=np.uint8)
+        else:
+            self._drop_codes()
+        self._follow(manifest)
+        if not quantized and self.quantizer is not None and self._centroids is not None:
+            self._train_quantizer()
+    
+    def _follow(self, manifest: dict) -> None:
+        """Take in the rows and tombstones published since the files were last read"""
+        count = manifest["count"]
+        ids = read_bytes(self._file("ids"), self._ids_bytes, manifest["ids_bytes"]).decode("utf-8").splitlines()
+        self._ids_bytes = manifest["ids_bytes"]
+        self._vectors = map_rows(self._file("vectors"), np.float32, (self.dimension,), count)
+        if "assign" in self._files:
+            self._assign = map_rows(self._file("assign"), np.int32, (), count)
+        else:
+            self._append_rows("assign", np.zeros(len(ids), dtype=np.int32))
+        if self._codes is not None:
+            if "codes" in self._files:
+                self._codes = map_rows(self._file("codes"), np.uint8, self._codes.shape[1:], count)
+            else:
+                self._append_rows("codes", self._encode(self._vectors[self._count:count]))
+        self._extend(ids)
+        for position in read_rows(self._file("deleted"), np.int64, self._deleted, manifest["deleted"]):
+            self._live[position] = False
+            if self._positions.get(self._ids[position]) == position:
+                del self._positions[self._ids[position]]
+        self._deleted = manifest["deleted"]
+        self._trained_count = manifest["trained_count"]
+        self._invalidate()
+    
+    def _append_rows(self, name: str, rows: np.ndarray) -> None:
+        """Add rows after the current ones, to the array's file when it has one"""
+        array = getattr(self, f"_{name}")
+        end = self._count + len(rows)
+        if name in self._files:
+            append_rows(self._file(name), rows, self._count)
+            array = map_rows(self._file(name), array.dtype, array.shape[1:], end)
+        else:
+            if end > len(array):
+                grown = np.zeros((max(end, 2 * len(array), 64), *array.shape[1:]), dtype=array.dtype)
+                grown[:self._count] = array[:self._count]
+                array = grown
+            array[self._count:end] = rows
+        setattr(self, f"_{name}", array)
+    
+    def _replace_rows(self, name: str, rows: np.ndarray) -> None:
+        """Replace all rows of an array, in a new file when stored in `path`"""
+        if self.path:
+            self._files[name] = file_name(name)
+            append_rows(self._file(name), rows, 0)
+            rows = map_rows(self._file(name), rows.dtype, rows.shape[1:], len(rows))
+        setattr(self, f"_{name}", rows)
+    
+    def _copy_rows(self, name: str, positions: np.ndarray) -> None:
+        """Keep only the rows at `positions`, copied block by block into a new file when stored in one"""
+        array = getattr(self, f"_{name}")
+        if name not in self._files:
+            setattr(self, f"_{name}", array[positions])
+            return
+        self._files[name] = file_name(name)
+        for start in range(0, len(positions), BLOCK_ROWS):
+            append_rows(self._file(name), array[positions[start:start + BLOCK_ROWS]], start)
+        setattr(self, f"_{name}", map_rows(self._file(name), array.dtype, array.shape[1:], len(positions)))
+    
+    def _extend(self, ids: Sequence[str]) -> None:
+        """Register IDs for the rows just appended"""
+        start, end = self._count, self._count + len(ids)
+        capacity = len(self._live)
+        if end > capacity:
+            capacity = max(end, 2 * capacity, 64)
+            live = np.zeros(capacity, dtype=bool)
+            live[:start] = self._live[:start]
+            scopes = np.zeros(capacity, dtype=np.int32)
+            scopes[:start] = self._scopes[:start]
+            self._live, self._scopes = live, scopes
+        self._live[start:end] = True
+        self._scopes[start:end] = [self._scope_code(scope_of(i)) for i in ids]
+        for offset, vector_id in enumerate(ids):
+            self._positions[vector_id] = start + offset
+        self._ids.extend(ids)
+        self._count = end
+        self._invalidate()
+    
+    def _mark_deleted(self, ids: Sequence[str]) -> None:
+        deleted = []
+        for vector_id in ids:
+            position = self._positions.pop(vector_id, None)
+            if position is not None:
+                self._live[position] = False
+                deleted.append(position)
+        if deleted and self.path:
+            append_rows(self._file("deleted"), np.array(deleted, dtype=np.int64), self._deleted)
+            self._deleted += len(deleted)
+        self._invalidate()
+    
+    def _compact(self) -> None:
+        live = np.flatnonzero(self._live[:self._count])
+        self._copy_rows("vectors", live)
+        self._copy_rows("assign", live)
+        if self._codes is not None:
+            self._copy_rows("codes", live)
+        self._scopes = self._scopes[live]
+        self._ids = [self._ids[i] for i in live]
+        self._positions = {vector_id: i for i, vector_id in enumerate(self._ids)}
+        self._live = np.ones(len(live), dtype=bool)
+        self._count = len(live)
+        if self.path:
+            data = "".join(f"{vector_id}\n" for vector_id in self._ids).encode("utf-8")
+            self._files["ids"] = file_name("ids")
+            append_bytes(self._file("ids"), data, 0)
+            self._ids_bytes = len(data)
+            self._files["deleted"] = file_name("deleted")
+            self._deleted = 0
+        self._invalidate()
+    
+    def _train(self, iterations: int = 10) -> None:
+        """Cluster the live vectors with spherical k-means"""
+        live = np.flatnonzero(self._live[:self._count])
+        n_lists = max(1, int(np.sqrt(len(live))))
+        sample = live
+        if len(sample) > 64 * n_lists:
+            sample = np.sort(self._rng.choice(live, 64 * n_lists, replace=False))
+        self._use_centroids(spherical_kmeans(self._vectors[sample], n_lists, self._rng, iterations), len(live))
+    
+    def _use_centroids(self, centroids: np.ndarray, trained_count: int) -> None:
+        """Assign every vector to the nearest of new lists"""
+        self._centroids = centroids
+        if self.path:
+            self._files["centroids"] = save_array(self.path, "centroids", self._centroids)
+        self._replace_rows("assign", self._nearest_list(self._vectors[:self._count]))
+        self._trained_count = trained_count
+        self._invalidate()
+        if self.quantizer is not None:
+            self._train_quantizer()
+    
+    def _train_quantizer(self) -> None:
+        """Train the quantizer and encode all vectors, published with the next change"""
+        live = np.flatnonzero(self._live[:self._count])
+        sample = live
+        if len(sample) > 100_000:
+            sample = self._rng.choice(live, 100_000, replace=False)
+        self.quantizer.train(self._vectors[sample])
+        self._drop_codes()
+        self._codes = self._encode(self._vectors[:self._count])
+    
+    def _drop_codes(self) -> None:
+        self._codes = None
+        for key in [key for key in self._files if key == "codes" or key.startswith("q_")]:
+            del self._files[key]
+    
+    def _encode(self, vectors: np.ndarray) -> np.ndarray:
+        """Codes of the vectors, encoded block by block so mapped rows are not all read at once"""
+        codes = np.empty((len(vectors), self.quantizer.bytes_per_vector(self.dimension)), dtype=np.uint8)
+        for start in range(0, len(vectors), BLOCK_ROWS):
+            codes[start:start + BLOCK_ROWS] = self.quantizer.encode(vectors[start:start + BLOCK_ROWS])
+        return codes
+    
+    def _nearest_list(self, vectors: np.ndarray) -> np.ndarray:
+        assign = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), BLOCK_ROWS):
+            scores = vectors[start:start + BLOCK_ROWS] @ self._centroids.T
+            assign[start:start + BLOCK_ROWS] = np.argmax(scores, axis=1)
+        return assign
+    
+    def _inverted_lists(self) -> List[np.ndarray]:
+        """Group vector positions by list, rebuilt lazily after changes"""
+        if self._lists is None:
+            assign = self._assign[:self._count]
+            order = np.argsort(assign, kind="stable")
+            bounds = np.searchsorted(assign[order], np.arange(len(self._centroids) + 1))
+            self._lists = [order[bounds[i]:bounds[i + 1]] for i in range(len(self._centroids))]
+        return self._lists
\ No newline at end of file
@@ -0,0 +1,211 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+class Quantizer(ABC):
+    """
+    Interface of compressed vector codes.
+    
+    A quantizer is trained on a sample of vectors, encodes vectors into
+    compact uint8 codes and scores codes against a full precision query.
+    Scores approximate the inner product, so stores re-score their best
+    candidates with the original vectors.
+    """
+    
+    name: str = "none"
+    is_trained: bool = False
+    
+    @abstractmethod
+    def train(self, vectors: np.ndarray) -> None:
+        ...
+    
+    @abstractmethod
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        ...
+    
+    @abstractmethod
+    def score(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        ...
+    
+    @abstractmethod
+    def bytes_per_vector(self, dimension: int) -> int:
+        ...
+    
+    @abstractmethod
+    def get_state(self) -> Dict[str, np.ndarray]:
+        """Arrays that restore the trained quantizer through `set_state`"""
+    
+    @abstractmethod
+    def set_state(self, state: Dict[str, np.ndarray]) -> None:
+        ...
+
+class ScalarQuantizer(Quantizer):
+    """8-bit scalar quantization with a per-dimension range, 4x smaller than float32"""
+    
+    name = "int8"
+    
+    def train(self, vectors: np.ndarray) -> None:
+        self.offset = vectors.min(axis=0).astype(np.float32)
+        self.scale = np.maximum(vectors.max(axis=0) - self.offset, 1e-12).astype(np.float32) / 255
+        self.is_trained = True
+    
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        codes = np.rint((vectors - self.offset) / self.scale)
+        return np.clip(codes, 0, 255).astype(np.uint8)
+    
+    def score(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        # q . (offset + scale * c) without decoding the codes
+        return codes @ (query * self.scale) + float(query @ self.offset)
+    
+    def bytes_per_vector(self, dimension: int) -> int:
+        return dimension
+    
+    def get_state(self) -> Dict[str, np.ndarray]:
+        return {"offset": self.offset, "scale": self.scale}
+    
+    def set_state(self, state: Dict[str, np.ndarray]) -> None:
+        self.offset = state["offset"].astype(np.float32)
+        self.scale = state["scale"].astype(np.float32)
+        self.is_trained = True
+
+class ProductQuantizer(Quantizer):
+    """
+    Product quantization with 256 centroids per sub-vector.
+    
+    The vector is split into `n_subvectors` slices that are quantized
+    separately, so a vector is stored in `n_subvectors` bytes. Queries are
+    scored through a per-query lookup table of sub-vector inner products.
+    """
+    
+    name = "pq"
+    
+    def __init__(self, n_subvectors: int, n_centroids: int = 256, iterations: int = 15, seed: int = 0):
+        if n_centroids > 256:
+            raise ValueError("Product quantization codes are single bytes")
+        self.n_subvectors = n_subvectors
+        self.n_centroids = n_centroids
+        self.iterations = iterations
+        self._rng = np.random.default_rng(seed)
+    
+    def _split(self, vectors: np.ndarray) -> np.ndarray:
+        n, dimension = vectors.shape
+        if dimension % self.n_subvectors:
+            raise ValueError(f"Dimension {dimension} is not divisible by {self.n_subvectors} sub-vectors")
+        return vectors.reshape(n, self.n_subvectors, dimension // self.n_subvectors)
+    
+    def train(self, vectors: np.ndarray) -> None:
+        sub = self._split(np.asarray(vectors, dtype=np.float32))
+        k = min(self.n_centroids, len(vectors))
+        codebooks = np.empty((self.n_subvectors, self.n_centroids, sub.shape[2]), dtype=np.float32)
+        for m in range(self.n_subvectors):
+            data = sub[:, m]
+            centroids = data[self._rng.choice(len(data), k, replace=False)].copy()
+            for _ in range(self.iterations):
+                labels = self._nearest(data, centroids)
+                counts = np.bincount(labels, minlength=k)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, labels, data)
+                # Empty clusters keep their previous centroid
+                filled = counts > 0
+                centroids[filled] = sums[filled] / counts[filled, None]
+            codebooks[m, :k] = centroids
+            # Unused code points repeat the first centroid and are never assigned
+            codebooks[m, k:] = centroids[0]
+        self.codebooks = codebooks
+        self.is_trained = True
+    
+    @staticmethod
+    def _nearest(data: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        distances = (centroids ** 2).sum(axis=1) - 2 * data @ centroids.T
+        return np.argmin(distances, axis=1)
+    
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        sub = self._split(np.asarray(vectors, dtype=np.float32))
+        codes = np.empty((len(vectors), self.n_subvectors), dtype=np.uint8)
+        for m in range(self.n_subvectors):
+            codes[:, m] = self._nearest(sub[:, m], self.codebooks[m])
+        return codes
+    
+    def score(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        table = np.einsum("mkd,md->mk", self.codebooks, self._split(query[None])[0])
+        return table[np.arange(self.n_subvectors), codes].sum(axis=1)
+    
+    def bytes_per_vector(self, dimension: int) -> int:
+        return self.n_subvectors
+    
+    def get_state(self) -> Dict[str, np.ndarray]:
+        return {"codebooks": self.codebooks}
+    
+    def set_state(self, state: Dict[str, np.ndarray]) -> None:
+        self.codebooks = state["codebooks"].astype(np.float32)
+        self.n_subvectors, self.n_centroids = self.codebooks.shape[:2]
+        self.is_trained = True
+
+def build_quantizer(config: Optional[dict], dimension: int) -> Optional[Quantizer]:
+    """
+    Build the quantizer selected by a collection's `vector_index` settings.
+    
+    `quantization` is `none` (default), `int8` or `pq`. Product quantization
+    uses `pq_subvectors` slices, by default one per 8 dimensions.
+    """
+    quantization = (config or {}).get("quantization", "none")
+    if quantization == "none":
+        return None
+    if quantization == "int8":
+        return ScalarQuantizer()
+    if quantization == "pq":
+        return ProductQuantizer(config.get("pq_subvectors") or max(1, dimension // 8))
+    raise ValueError(f"Unknown quantization: {quantization}")
+
+@dataclass
+class QuantizationReport:
+    """Memory use and recall of one quantization setting on a sample"""
+    name: str
+    bytes_per_vector: int  # Size of the codes searched in memory
+    memory_bytes: int  # Codes of all sample vectors
+    compression: float  # Relative to float32
+    recall: float  # recall@k ranking by code scores only
+    recall_rescored: float  # recall@k after re-scoring `rescore * k` candidates
+
+def quantization_report(
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    quantizers: Dict[str, Optional[Quantizer]],
+    *,
+    k: int = 10,
+    rescore: int = 4,
+) -> List[QuantizationReport]:
+    """Compare quantizers against exact search on a sample of vectors and queries"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    exact = vectors @ np.asarray(queries, dtype=np.float32).T
+    truth = [set(np.argsort(column)[::-1][:k]) for column in exact.T]
+    float_bytes = vectors.shape[1] * 4
+    reports = []
+    for name, quantizer in quantizers.items():
+        if quantizer is None:
+            reports.append(QuantizationReport(name, float_bytes, float_bytes * len(vectors), 1.0, 1.0, 1.0))
+            continue
+        quantizer.train(vectors)
+        codes = quantizer.encode(vectors)
+        recall, recall_rescored = [], []
+        for query, expected, exact_scores in zip(queries, truth, exact.T):
+            approx = quantizer.score(codes, query)
+            order = np.argsort(approx)[::-1]
+            recall.append(len(expected & set(order[:k])) / k)
+            candidates = order[:k * rescore]
+            rescored = candidates[np.argsort(exact_scores[candidates])[::-1][:k]]
+            recall_rescored.append(len(expected & set(rescored)) / k)
+        size = quantizer.bytes_per_vector(vectors.shape[1])
+        reports.append(
+            QuantizationReport(
+                name=name,
+                bytes_per_vector=size,
+                memory_bytes=size * len(vectors),
+                compression=float_bytes / size,
+                recall=float(np.mean(recall)),
+                recall_rescored=float(np.mean(recall_rescored)),
+            )
+        )
+    return reports
\ No newline at end of file
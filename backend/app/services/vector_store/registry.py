@@ -0,0 +1,98 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Union
+
+from app.models.collection import Collection
+from app.services.vector_store.ivf import IVFVectorStore
+from app.services.vector_store.quantization import build_quantizer
+from app.services.vector_store.sharded import ShardedVectorStore
+
+class VectorStoreRegistry:
+    """
+    One vector store per collection.
+    
+    Documents outside any collection share a default store. Each store is
+    saved to its own snapshot directory under `directory` and built with
+    the quantization in its collection's `vector_index` settings. Changing
+    those settings re-encodes the store in place on its next use.
+    
+    With more than one shard every store is a `ShardedVectorStore` whose
+    shards are saved in subdirectories and searched on a thread pool shared
+    by all collections.
+    """
+    
+    def __init__(
+        self,
+        directory: Optional[str],
+        dimension: int,
+        *,
+        n_probe: int,
+        train_size: int,
+        shards: int = 1,
+        search_threads: int = 1,
+    ):
+        self.directory = directory
+        self.dimension = dimension
+        self.n_probe = n_probe
+        self.train_size = train_size
+        self.shards = shards
+        self.search_threads = search_threads
+        self._lock = threading.Lock()
+        self._stores: Dict[Optional[int], Union[IVFVectorStore, ShardedVectorStore]] = {}
+        self._configs: Dict[Optional[int], Optional[dict]] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+    
+    def path_for(self, collection_id: Optional[int]) -> Optional[str]:
+        if not self.directory:
+            return None
+        name = "default" if collection_id is None else f"collection_{collection_id}"
+        return os.path.join(self.directory, name)
+    
+    def _create(self, path: Optional[str], config: dict) -> IVFVectorStore:
+        return IVFVectorStore(
+            self.dimension,
+            n_probe=self.n_probe,
+            train_size=self.train_size,
+            path=path,
+            quantizer=build_quantizer(config, self.dimension),
+            rescore=config.get("rescore", 4),
+        )
+    
+    def get(
+        self, collection_id: Optional[int], config: Optional[dict] = None
+    ) -> Union[IVFVectorStore, ShardedVectorStore]:
+        """Return the store of a collection, configured as given"""
+        config = config or {}
+        with self._lock:
+            store = self._stores.get(collection_id)
+            if store is None:
+                path = self.path_for(collection_id)
+                if self.shards > 1:
+                    if self._executor is None:
+                        self._executor = ThreadPoolExecutor(self.search_threads, thread_name_prefix="vector-search")
+                    store = ShardedVectorStore(
+                        [
+                            self._create(path and os.path.join(path, f"shard_{i}_of_{self.shards}"), config)
+                            for i in range(self.shards)
+                        ],
+                        executor=self._executor,
+                    )
+                else:
+                    store = self._create(path, config)
+                self._stores[collection_id] = store
+            elif self._configs[collection_id] != config:
+                # Every shard trains its own quantizer
+                for shard in _shards_of(store):
+                    shard.configure(build_quantizer(config, self.dimension), config.get("rescore", 4))
+            self._configs[collection_id] = config
+            return store
+    
+    def for_collection(self, collection: Optional[Collection]) -> Union[IVFVectorStore, ShardedVectorStore]:
+        """Return the store documents of a collection, or of no collection, are indexed in"""
+        if collection is None:
+            return self.get(None)
+        return self.get(collection.id, collection.vector_index)
+
+def _shards_of(store: Union[IVFVectorStore, ShardedVectorStore]) -> List[IVFVectorStore]:
+    return store.shards if isinstance(store, ShardedVectorStore) else [store]
\ No newline at end of file
@@ -0,0 +1,103 @@
+import heapq
+import threading
+import zlib
+from concurrent.futures import Executor
+from itertools import chain
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.services.vector_store.base import VectorHit, VectorStore
+from app.services.vector_store.ivf import IVFVectorStore, spherical_kmeans
+
+def shard_of(vector_id: str, n_shards: int) -> int:
+    """Shard a vector ID belongs to, stable across processes and restarts"""
+    return zlib.crc32(vector_id.encode("utf-8")) % n_shards
+
+class ShardedVectorStore(VectorStore):
+    """
+    A collection's vectors partitioned by ID hash over several IVF stores.
+    
+    A search queries every shard for its own top `k` on `executor` and
+    merges them with a heap, which gives exactly the top `k` of an
+    unsharded store as long as the shards search exactly.
+    
+    Lists are trained for the whole collection instead of per shard, on a
+    sample drawn from every shard once `train_size` vectors exist and again
+    whenever it has grown four-fold, and the same centroids are given to
+    each shard. A query then probes the same `n_probe` lists in every shard
+    and, without quantization, finds exactly what one store with those lists
+    would. Scoped searches may probe more lists per shard, never fewer.
+    
+    The scans are matrix products that NumPy runs with the GIL released, so
+    a thread pool keeps one core busy per shard while still seeing changes
+    not yet persisted. Each shard keeps its own snapshot, memory-mapped by
+    every process on the host like an unsharded store.
+    """
+    
+    def __init__(self, shards: Sequence[IVFVectorStore], *, executor: Optional[Executor] = None, seed: int = 0):
+        if not shards:
+            raise ValueError("A sharded store needs at least one shard")
+        self.shards = list(shards)
+        self.dimension = self.shards[0].dimension
+        self.train_size = self.shards[0].train_size
+        self.executor = executor
+        self._rng = np.random.default_rng(seed)
+        self._train_lock = threading.Lock()
+        for shard in self.shards:
+            shard.train_lists = False
+    
+    def _split(self, ids: Sequence[str]) -> Dict[int, List[int]]:
+        """Positions of the IDs grouped by shard"""
+        groups: Dict[int, List[int]] = {}
+        for i, vector_id in enumerate(ids):
+            groups.setdefault(shard_of(vector_id, len(self.shards)), []).append(i)
+        return groups
+    
+    def add(self, ids: Sequence[str], vectors: np.ndarray) -> None:
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dimension)
+        if len(ids) != len(vectors):
+            raise ValueError("Number of IDs and vectors differ")
+        for shard, positions in self._split(ids).items():
+            self.shards[shard].add([ids[i] for i in positions], vectors[positions])
+        self._train_if_grown()
+    
+    def _train_if_grown(self) -> None:
+        with self._train_lock:
+            live = len(self)
+            if live < self.train_size or live < 4 * max(shard.trained_count for shard in self.shards):
+                return
+            n_lists = max(1, int(np.sqrt(live)))
+            # Each shard contributes in proportion to its size
+            sample = np.concatenate([shard.sample(64 * n_lists * len(shard) // live + 1) for shard in self.shards])
+            centroids = spherical_kmeans(sample, n_lists, self._rng)
+            for shard in self.shards:
+                shard.set_centroids(centroids, live)
+    
+    def delete(self, ids: Sequence[str]) -> None:
+        for shard, positions in self._split(ids).items():
+            self.shards[shard].delete([ids[i] for i in positions])
+    
+    def search(self, query: np.ndarray, k: int, *, scope: Optional[str] = None) -> List[VectorHit]:
+        if self.executor is None or len(self.shards) == 1:
+            results = [shard.search(query, k, scope=scope) for shard in self.shards]
+        else:
+            futures = [self.executor.submit(shard.search, query, k, scope=scope) for shard in self.shards]
+            results = [future.result() for future in futures]
+        return heapq.nlargest(k, chain.from_iterable(results), key=lambda hit: hit.score)
+    
+    def fetch(self, ids: Sequence[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        for shard, positions in self._split(ids).items():
+            found.update(self.shards[shard].fetch([ids[i] for i in positions]))
+        return found
+    
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self.shards)
+    
+    def __contains__(self, vector_id: str) -> bool:
+        return vector_id in self.shards[shard_of(vector_id, len(self.shards))]
+    
+    def persist(self) -> None:
+        for shard in self.shards:
+            shard.persist()
\ No newline at end of file
@@ -0,0 +1,112 @@
+import fcntl
+import json
+import os
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+
+MANIFEST = "manifest.json"
+LOCK = "write.lock"
+
+def file_name(name: str, suffix: str = "bin") -> str:
+    """A new file name for an array, never reused so mapped files are not overwritten"""
+    return f"{name}-{time.time_ns()}-{os.getpid()}.{suffix}"
+
+@contextmanager
+def write_lock(directory: str) -> Iterator[None]:
+    """Hold the lock serializing writers of a directory across processes"""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, LOCK), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def append_bytes(path: str, data: bytes, start: int) -> None:
+    """
+    Write data at offset `start` of a file, created if missing.
+    
+    Anything after `start`, left by a writer that failed before publishing
+    it, is dropped. Bytes before it are never touched, so processes that
+    mapped them keep reading consistent data.
+    """
+    with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+        f.truncate(start)
+        f.seek(start)
+        f.write(data)
+
+def append_rows(path: str, rows: np.ndarray, start: int) -> None:
+    """Write rows after the first `start` rows of a file of fixed-size rows"""
+    rows = np.ascontiguousarray(rows)
+    row_bytes = rows.dtype.itemsize * int(np.prod(rows.shape[1:], dtype=np.int64))
+    append_bytes(path, rows.tobytes(), start * row_bytes)
+
+def map_rows(path: str, dtype, shape: Tuple[int, ...], count: int) -> np.ndarray:
+    """Memory-map the first `count` rows of a file read-only"""
+    if not count:
+        # Empty files cannot be mapped
+        return np.empty((0, *shape), dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=(count, *shape))
+
+def read_rows(path: str, dtype, start: int, stop: int) -> np.ndarray:
+    """Read rows `start` to `stop` of a file of single values"""
+    if stop <= start:
+        return np.empty(0, dtype=dtype)
+    return np.fromfile(path, dtype=dtype, count=stop - start, offset=start * np.dtype(dtype).itemsize)
+
+def read_bytes(path: str, start: int, stop: int) -> bytes:
+    if stop <= start:
+        return b""
+    with open(path, "rb") as f:
+        f.seek(start)
+        return f.read(stop - start)
+
+def save_array(directory: str, name: str, array: np.ndarray) -> str:
+    """Save a small array as a new `.npy` file and return its name"""
+    name = file_name(name, "npy")
+    np.save(os.path.join(directory, name), np.ascontiguousarray(array))
+    return name
+
+def write_manifest(directory: str, manifest: dict) -> None:
+    """
+    Publish a manifest, whose `files` name the files holding the data,
+    either one per key or a list of them.
+    
+    The files of the previous manifest are kept for readers that loaded it
+    just before the switch, other files are removed. Callers hold the write
+    lock.
+    """
+    previous = read_manifest(directory)
+    tmp_path = os.path.join(directory, f"{MANIFEST}.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, os.path.join(directory, MANIFEST))
+    
+    keep = {MANIFEST, LOCK, *_file_names(manifest)}
+    if previous:
+        keep.update(_file_names(previous))
+    for entry in os.scandir(directory):
+        if entry.is_file() and entry.name not in keep:
+            os.remove(entry.path)
+
+def _file_names(manifest: dict) -> Iterator[str]:
+    for value in manifest.get("files", {}).values():
+        yield from value if isinstance(value, list) else [value]
+
+def read_manifest(directory: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def snapshot_version(directory: str) -> Optional[tuple]:
+    """Identity of the current manifest file, None without a snapshot"""
+    try:
+        stat = os.stat(os.path.join(directory, MANIFEST))
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
\ No newline at end of file
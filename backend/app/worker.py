@@ -0,0 +1,27 @@
+from celery import Celery
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.document import Document
+from app.services.ingestion import ingest_document
+
+celery_app = Celery(
+    "rag",
+    broker=f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}/0",
+)
+
+@celery_app.task(name="documents.ingest")
+def ingest_document_task(document_id: int) -> None:
+    """
+    Process an uploaded document.
+    
+    Parsing runs in the shared extraction process pool, so the Celery worker
+    itself can use a thread or solo pool and only coordinates the pipeline.
+    """
+    db = SessionLocal()
+    try:
+        document = db.query(Document).filter(Document.id == document_id).first()
+        if document and document.status in ("pending", "error"):
+            ingest_document(db, document)
+    finally:
+        db.close()
\ No newline at end of file
@@ -0,0 +1,67 @@
+import argparse
+import json
+import sys
+from typing import Dict, List, Optional, Tuple
+
+def _key(result: dict) -> Tuple[str, str, str]:
+    return result["kind"], result["backend"], json.dumps(result["params"], sort_keys=True)
+
+def compare(
+    baseline: dict, candidate: dict, *, max_latency_increase: float, max_recall_drop: float
+) -> List[dict]:
+    """
+    Pair the results of two runs and flag regressions.
+    
+    p95 latency may grow by `max_latency_increase` (relative) and recall@k
+    and hit rate may drop by `max_recall_drop` (absolute) before a result
+    counts as regressed. Results present in only one run are skipped.
+    """
+    before: Dict[tuple, dict] = {_key(r): r for r in baseline["results"]}
+    rows = []
+    for result in candidate["results"]:
+        old = before.get(_key(result))
+        if old is None:
+            continue
+        reasons = []
+        if result["p95_ms"] > old["p95_ms"] * (1 + max_latency_increase):
+            reasons.append("latency")
+        for metric in ("recall_at_k", "hit_rate"):
+            if metric in result and result[metric] < old[metric] - max_recall_drop:
+                reasons.append(metric)
+        rows.append({"key": _key(result), "before": old, "after": result, "regressions": reasons})
+    return rows
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--max-latency-increase", type=float, default=0.2)
+    parser.add_argument("--max-recall-drop", type=float, default=0.01)
+    args = parser.parse_args(argv)
+    
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    if baseline["config"] != candidate["config"]:
+        print("Warning: the runs used different configurations", file=sys.stderr)
+    
+    rows = compare(
+        baseline,
+        candidate,
+        max_latency_increase=args.max_latency_increase,
+        max_recall_drop=args.max_recall_drop,
+    )
+    for row in rows:
+        kind, backend, params = row["key"]
+        before, after = row["before"], row["after"]
+        print(
+            f"{kind:8} {backend:15} {params:40} "
+            f"p95 {before['p95_ms']:.2f} -> {after['p95_ms']:.2f}ms "
+            f"hit {before['hit_rate']:.3f} -> {after['hit_rate']:.3f} "
+            f"{'REGRESSED: ' + ', '.join(row['regressions']) if row['regressions'] else 'ok'}"
+        )
+    return 1 if any(row["regressions"] for row in rows) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,55 @@
+from dataclasses import dataclass
+from typing import List
+
+import numpy as np
+
+@dataclass
+class SyntheticCorpus:
+    """Chunks with texts and embeddings, and queries derived from some of them"""
+    texts: List[str]
+    vectors: np.ndarray  # Unit vectors, one row per chunk
+    queries: List[str]
+    query_vectors: np.ndarray
+    sources: np.ndarray  # Chunk each query was derived from
+
+def make_corpus(
+    n_chunks: int,
+    *,
+    chunk_tokens: int = 128,
+    dimension: int = 384,
+    n_queries: int = 200,
+    vocabulary: int = 20000,
+    seed: int = 0,
+) -> SyntheticCorpus:
+    """
+    Generate a corpus that behaves roughly like chunked documents.
+    
+    Chunks belong to about sqrt(n) topics. Their embeddings are noisy copies
+    of the topic centre, so neighbours cluster like real embeddings do, and
+    their texts mix Zipf-distributed common words with words specific to the
+    topic. Queries are a few words of a source chunk and a perturbed copy of
+    its embedding.
+    """
+    rng = np.random.default_rng(seed)
+    n_topics = max(1, int(np.sqrt(n_chunks)))
+    topics = rng.integers(n_topics, size=n_chunks)
+    
+    centres = rng.normal(size=(n_topics, dimension)).astype(np.float32)
+    vectors = centres[topics] + 2.0 * rng.normal(size=(n_chunks, dimension)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    
+    frequencies = 1.0 / np.arange(1, vocabulary + 1) ** 1.1
+    common = rng.choice(vocabulary, size=(n_chunks, chunk_tokens), p=frequencies / frequencies.sum())
+    topic_words = rng.integers(vocabulary, 2 * vocabulary, size=(n_topics, 64))
+    specific = topic_words[topics[:, None], rng.integers(64, size=(n_chunks, chunk_tokens))]
+    tokens = np.where(rng.random((n_chunks, chunk_tokens)) < 0.3, specific, common)
+    texts = [" ".join(f"w{t}" for t in row) for row in tokens]
+    
+    sources = rng.choice(n_chunks, size=min(n_queries, n_chunks), replace=False)
+    queries = [
+        " ".join(f"w{t}" for t in rng.choice(tokens[i], size=6, replace=False)) for i in sources
+    ]
+    noise = rng.normal(size=(len(sources), dimension)).astype(np.float32) / np.sqrt(dimension)
+    query_vectors = vectors[sources] + 0.3 * noise
+    query_vectors /= np.linalg.norm(query_vectors, axis=1, keepdims=True)
+    return SyntheticCorpus(texts, vectors, queries, query_vectors, sources)
\ No newline at end of file
@@ -0,0 +1,268 @@
+import argparse
+import json
+import os
+import platform
+import time
+import tracemalloc
+from concurrent.futures import Executor, ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Union
+
+import numpy as np
+
+from app.services.inverted_index import InvertedIndex
+from app.services.lexical import LexicalDocument, LexicalIndex
+from app.services.vector_store import IVFVectorStore, ShardedVectorStore, build_quantizer
+from benchmarks.corpus import SyntheticCorpus, make_corpus
+
+BATCH_SIZE = 1000  # Chunks added per call, like ingestion batches
+
+def latency_summary(seconds: List[float]) -> Dict[str, float]:
+    """p50/p95/p99 and mean of per-query latencies in milliseconds"""
+    ms = np.asarray(seconds) * 1000
+    return {
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "mean_ms": float(ms.mean()),
+    }
+
+def exact_neighbours(corpus: SyntheticCorpus, k: int) -> List[set]:
+    """Top-k chunks of every query by brute-force inner product"""
+    scores = corpus.query_vectors @ corpus.vectors.T
+    top = np.argpartition(-scores, min(k, scores.shape[1] - 1), axis=1)[:, :k]
+    return [set(row.tolist()) for row in top]
+
+def measure_build(build: Callable[[], object]) -> Dict[str, object]:
+    """Build twice, once timed and once traced, the timing run is not slowed by tracing"""
+    started = time.perf_counter()
+    index = build()
+    seconds = time.perf_counter() - started
+    del index
+    tracemalloc.start()
+    try:
+        index = build()
+        memory = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return {"index": index, "build_seconds": seconds, "memory_bytes": memory}
+
+def build_vector_store(
+    corpus: SyntheticCorpus, config: dict, *, train_size: int, executor: Optional[Executor] = None
+) -> Union[IVFVectorStore, ShardedVectorStore]:
+    dimension = corpus.vectors.shape[1]
+    shards = [
+        IVFVectorStore(
+            dimension,
+            train_size=train_size,
+            quantizer=build_quantizer(config, dimension),
+            rescore=config.get("rescore", 4),
+        )
+        for _ in range(config.get("shards", 1))
+    ]
+    store = ShardedVectorStore(shards, executor=executor) if len(shards) > 1 else shards[0]
+    for start in range(0, len(corpus.vectors), BATCH_SIZE):
+        stop = min(start + BATCH_SIZE, len(corpus.vectors))
+        store.add([f"1:{i}" for i in range(start, stop)], corpus.vectors[start:stop])
+    return store
+
+def build_lexical_index(corpus: SyntheticCorpus, index: LexicalIndex) -> LexicalIndex:
+    for start in range(0, len(corpus.texts), BATCH_SIZE):
+        index.add([
+            LexicalDocument(chunk_id=i, content=corpus.texts[i], document_id=i, owner_id=1)
+            for i in range(start, min(start + BATCH_SIZE, len(corpus.texts)))
+        ])
+    return index
+
+def bench_vector_backends(
+    corpus: SyntheticCorpus,
+    *,
+    k: int,
+    quantizations: List[str],
+    n_probes: List[int],
+    train_size: int,
+    shards: int = 1,
+) -> List[dict]:
+    """
+    Measure the IVF store per quantization and recall/latency per `n_probe`.
+    
+    The `exact` backend never trains its lists and scans every vector, it is
+    the latency baseline the approximate configurations are compared to.
+    With more than one shard, an unquantized `sharded` store is measured
+    too, its lists trained once for all shards and its shards searched on a
+    thread pool like the collection stores of the API.
+    """
+    truth = exact_neighbours(corpus, k)
+    configs = [("exact", {}, len(corpus.vectors) + 1)]
+    configs += [(f"ivf-{q}", {"quantization": q}, train_size) for q in quantizations]
+    if shards > 1:
+        configs.append(("sharded", {"quantization": "none", "shards": shards}, train_size))
+    results = []
+    with ThreadPoolExecutor(max(1, shards), thread_name_prefix="vector-search") as executor:
+        for name, config, size in configs:
+            results += _bench_vector_store(
+                corpus, truth, name, config, k=k, n_probes=n_probes, train_size=size, executor=executor
+            )
+    return results
+
+def _bench_vector_store(
+    corpus: SyntheticCorpus,
+    truth: List[set],
+    name: str,
+    config: dict,
+    *,
+    k: int,
+    n_probes: List[int],
+    train_size: int,
+    executor: Executor,
+) -> List[dict]:
+    build = measure_build(lambda: build_vector_store(corpus, config, train_size=train_size, executor=executor))
+    store = build["index"]
+    shards = store.shards if isinstance(store, ShardedVectorStore) else [store]
+    results = []
+    for n_probe in n_probes if all(shard.is_trained for shard in shards) else [None]:
+        if n_probe is not None:
+            for shard in shards:
+                shard.n_probe = n_probe
+        latencies, recall, hits = [], [], 0
+        for query, expected, source in zip(corpus.query_vectors, truth, corpus.sources):
+            started = time.perf_counter()
+            found = store.search(query, k)
+            latencies.append(time.perf_counter() - started)
+            ids = {int(hit.vector_id.split(":")[1]) for hit in found}
+            recall.append(len(ids & expected) / k)
+            hits += source in ids
+        results.append({
+            "kind": "vector",
+            "backend": name,
+            "params": {**config, "n_probe": n_probe},
+            "build_seconds": build["build_seconds"],
+            "memory_bytes": build["memory_bytes"],
+            "searched_bytes": sum(shard.searched_bytes for shard in shards),
+            "recall_at_k": float(np.mean(recall)),
+            "hit_rate": hits / len(corpus.queries),
+            **latency_summary(latencies),
+        })
+    return results
+
+def bench_lexical_backends(
+    corpus: SyntheticCorpus, *, k: int, elasticsearch_url: Optional[str] = None
+) -> List[dict]:
+    """
+    Measure the lexical backends by how often a query finds its source chunk.
+    
+    Both backends score exact BM25, so there is no approximate recall to
+    report. Elasticsearch is only measured when a URL is given, in a
+    throwaway index that is deleted afterwards.
+    """
+    backends: Dict[str, Callable[[], LexicalIndex]] = {"inverted-index": InvertedIndex}
+    if elasticsearch_url:
+        from app.services.lexical import ElasticsearchLexicalIndex
+        from app.services.search_client import ElasticsearchClients
+        
+        clients = ElasticsearchClients(elasticsearch_url)
+        client = clients.sync
+        name = f"benchmark-chunks-{os.getpid()}"
+        
+        def elasticsearch_index() -> LexicalIndex:
+            client.options(ignore_status=404).indices.delete(index=name)
+            return ElasticsearchLexicalIndex(clients, name)
+        
+        backends["elasticsearch"] = elasticsearch_index
+    
+    results = []
+    for backend, factory in backends.items():
+        if backend == "elasticsearch":
+            started = time.perf_counter()
+            index = build_lexical_index(corpus, factory())
+            client.indices.refresh(index=name)
+            build = {"build_seconds": time.perf_counter() - started, "memory_bytes": None}
+        else:
+            build = measure_build(lambda: build_lexical_index(corpus, factory()))
+            index = build["index"]
+        latencies, hits = [], 0
+        for query, source in zip(corpus.queries, corpus.sources):
+            started = time.perf_counter()
+            found = index.search(query, owner_id=1, k=k)
+            latencies.append(time.perf_counter() - started)
+            hits += any(hit.chunk_id == source for hit in found)
+        results.append({
+            "kind": "lexical",
+            "backend": backend,
+            "params": {},
+            "build_seconds": build["build_seconds"],
+            "memory_bytes": build["memory_bytes"],
+            "hit_rate": hits / len(corpus.queries),
+            **latency_summary(latencies),
+        })
+        if backend == "elasticsearch":
+            client.indices.delete(index=name)
+    return results
+
+def environment() -> dict:
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+def run(args: argparse.Namespace) -> dict:
+    corpus = make_corpus(
+        args.chunks,
+        chunk_tokens=args.chunk_tokens,
+        dimension=args.dimension,
+        n_queries=args.queries,
+        seed=args.seed,
+    )
+    results = bench_vector_backends(
+        corpus,
+        k=args.k,
+        quantizations=[q for q in args.quantization.split(",") if q],
+        n_probes=[int(n) for n in args.n_probe.split(",") if n],
+        train_size=args.train_size,
+        shards=args.shards,
+    )
+    results += bench_lexical_backends(corpus, k=args.k, elasticsearch_url=args.elasticsearch)
+    return {
+        "benchmark": "retrieval",
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "environment": environment(),
+        "results": results,
+    }
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark retrieval backends on a synthetic corpus")
+    parser.add_argument("--chunks", type=int, default=10000)
+    parser.add_argument("--chunk-tokens", type=int, default=128)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--quantization", default="none,int8,pq", help="Comma-separated IVF variants")
+    parser.add_argument("--n-probe", default="1,2,4,8,16,32", help="Comma-separated points of the curve")
+    parser.add_argument("--train-size", type=int, default=1024)
+    parser.add_argument("--shards", type=int, default=4, help="Shards of the sharded store, 1 to leave it out")
+    parser.add_argument("--elasticsearch", help="URL of an Elasticsearch to include, e.g. http://localhost:9200")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="JSON file to write, by default under benchmarks/results")
+    args = parser.parse_args(argv)
+    
+    report = run(args)
+    output = args.output or os.path.join(
+        os.path.dirname(__file__), "results", f"retrieval-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    for result in report["results"]:
+        recall = f"{result['recall_at_k']:.3f}" if "recall_at_k" in result else "-"
+        print(
+            f"{result['kind']:8} {result['backend']:15} {json.dumps(result['params']):40} "
+            f"recall={recall:5} hit={result['hit_rate']:.3f} "
+            f"p95={result['p95_ms']:.2f}ms build={result['build_seconds']:.2f}s"
+        )
+    print(f"Wrote {output}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -1,12 +1,36 @@
+import json
 from typing import Dict
 
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 
+from app.api import deps
 from app.core.config import settings
+from app.main import app
 from app.models.conversation import Conversation
 from app.models.message import Message
 from app.models.user import User
+from app.services.answer_cache import AnswerCache
+from app.services.chat import ChatService
+from app.services.llm import FakeProvider, ProviderModel
+from app.services.reranking import Reranker, TokenOverlapModel
+from app.services.retrieval_cache import RetrievalCache
+
+
+class FakeRedis:
+    """In-memory stand-in for the Redis commands the exact answer cache uses."""
+    
+    def __init__(self):
+        self.data = {}
+    
+    def get(self, key):
+        return self.data.get(key)
+    
+    def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+    
+    def set(self, key, value, ex=None):
+        self.data[key] = value
 
 
 def test_chat_endpoint(
@@ -176,4 +200,190 @@ def test_delete_conversation(
         Conversation.id == conversation.id
     ).first()
     
-    assert db_conversation is None
\ No newline at end of file
+    assert db_conversation is None
+
+def test_chat_stream_sends_chunks_then_tokens(
+    client: TestClient, normal_user_token_headers: Dict[str, str], db: Session
+) -> None:
+    """Test that the streaming endpoint sends chunks, tokens and the stored message as events."""
+    response = client.post(
+        f"{settings.API_V1_STR}/chat/stream",
+        json={"message": "What does error E4711 mean?"},
+        headers=normal_user_token_headers,
+    )
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [
+        (block.split("\n")[0][len("event: "):], json.loads(block.split("\n")[1][len("data: "):]))
+        for block in response.text.strip().split("\n\n")
+    ]
+    names = [name for name, _ in events]
+    assert names[0] == "chunks" and names[-1] == "done"
+    assert set(names[1:-1]) == {"token"}
+    
+    answer = "".join(data["text"] for name, data in events if name == "token")
+    message = events[-1][1]
+    assert message["role"] == "assistant"
+    assert message["content"] == answer
+    
+    conversation = db.query(Conversation).filter(Conversation.id == events[0][1]["conversation_id"]).first()
+    assert [m.role for m in conversation.messages] == ["user", "assistant"]
+
+
+def _long_conversation(db: Session, turns: int) -> Conversation:
+    user = db.query(User).filter(User.email == "user@example.com").first()
+    conversation = Conversation(title="Long conversation", user_id=user.id)
+    db.add(conversation)
+    db.commit()
+    db.add_all([
+        Message(conversation_id=conversation.id, role=role, content=f"{role} message {i}")
+        for i in range(turns)
+        for role in ("user", "assistant")
+    ])
+    db.commit()
+    db.refresh(conversation)
+    return conversation
+
+
+def test_chat_summarizes_older_turns(
+    client: TestClient, normal_user_token_headers: Dict[str, str], db: Session
+) -> None:
+    """Test that turns beyond the history window are folded into the conversation summary."""
+    conversation = _long_conversation(db, 6)
+    chat_service = app.dependency_overrides[deps.get_chat_service]()
+    app.dependency_overrides[deps.get_chat_service] = lambda: ChatService(
+        chat_service.retriever, chat_service.model, chat_service.packer, history_turns=2, summary_turns=2
+    )
+    
+    response = client.post(
+        f"{settings.API_V1_STR}/chat/",
+        json={"conversation_id": conversation.id, "message": "And then?"},
+        headers=normal_user_token_headers,
+    )
+    
+    assert response.status_code == 200
+    db.refresh(conversation)
+    messages = sorted(conversation.messages, key=lambda m: m.id)
+    # The oldest two turns are summarized, the fake model answers with the first of them
+    assert conversation.summarized_until == messages[3].id
+    assert conversation.summary == "user: user message 0"
+    
+    response = client.get(
+        f"{settings.API_V1_STR}/chat/conversations/{conversation.id}",
+        headers=normal_user_token_headers,
+    )
+    assert response.json()["summary"] == "user: user message 0"
+
+
+def test_get_conversation_pages_messages(
+    client: TestClient, normal_user_token_headers: Dict[str, str], db: Session
+) -> None:
+    """Test that a conversation is returned with a page of its latest messages."""
+    conversation = _long_conversation(db, 5)
+    
+    response = client.get(
+        f"{settings.API_V1_STR}/chat/conversations/{conversation.id}",
+        params={"limit": 3},
+        headers=normal_user_token_headers,
+    )
+    
+    assert response.status_code == 200
+    messages = response.json()["messages"]
+    assert [m["content"] for m in messages] == ["assistant message 3", "user message 4", "assistant message 4"]
+    
+    response = client.get(
+        f"{settings.API_V1_STR}/chat/conversations/{conversation.id}",
+        params={"limit": 3, "before": messages[0]["id"]},
+        headers=normal_user_token_headers,
+    )
+    
+    assert [m["content"] for m in response.json()["messages"]] == [
+        "user message 2",
+        "assistant message 2",
+        "user message 3",
+    ]
+
+
+def test_repeated_question_is_answered_from_cache(
+    client: TestClient, normal_user_token_headers: Dict[str, str], db: Session
+) -> None:
+    """Test that a repeated new question is answered from the answer cache without the model."""
+    redis_client = FakeRedis()
+    provider = FakeProvider()
+    chat_service = app.dependency_overrides[deps.get_chat_service]()
+    cached_service = ChatService(
+        chat_service.retriever,
+        ProviderModel(provider, "fake"),
+        chat_service.packer,
+        answer_cache=AnswerCache(redis_client, RetrievalCache(redis_client, ttl_seconds=60), ttl_seconds=60),
+    )
+    app.dependency_overrides[deps.get_chat_service] = lambda: cached_service
+    
+    responses = [
+        client.post(
+            f"{settings.API_V1_STR}/chat/",
+            json={"message": message},
+            headers=normal_user_token_headers,
+        )
+        for message in ("How do I reset the pump?", "how do I reset  the pump?")
+    ]
+    
+    assert [r.status_code for r in responses] == [200, 200]
+    first, second = [r.json()["message"] for r in responses]
+    assert provider.requests == 1
+    assert second["content"] == first["content"]
+    assert not first["metadata"]["answer_cached"] and second["metadata"]["answer_cached"]
+
+
+def test_chat_records_rerank_stats(
+    client: TestClient, normal_user_token_headers: Dict[str, str], db: Session
+) -> None:
+    """Test that the answer's metadata tells whether and how long the context was reranked."""
+    chat_service = app.dependency_overrides[deps.get_chat_service]()
+    chat_service.retriever.reranker = Reranker(TokenOverlapModel())
+    
+    responses = [
+        client.post(
+            f"{settings.API_V1_STR}/chat/",
+            json={"message": "How do I reset the pump?", "search_options": {"rerank": rerank}},
+            headers=normal_user_token_headers,
+        )
+        for rerank in (False, True)
+    ]
+    
+    assert [r.status_code for r in responses] == [200, 200]
+    plain, reranked = [r.json()["message"]["metadata"] for r in responses]
+    assert plain["reranked"] == 0 and plain["rerank_ms"] is None
+    assert reranked["rerank_ms"] is not None
+
+
+def test_follow_up_is_searched_with_previous_question(
+    client: TestClient, normal_user_token_headers: Dict[str, str], db: Session
+) -> None:
+    """Test that a follow-up question and the one before it are retrieved in one batch."""
+    retriever = app.dependency_overrides[deps.get_chat_service]().retriever
+    retrieve_many = retriever.retrieve_many
+    batches = []
+    
+    async def recording_retrieve_many(db, queries, **kwargs):
+        batches.append(list(queries))
+        return await retrieve_many(db, queries, **kwargs)
+    
+    retriever.retrieve_many = recording_retrieve_many
+    first = client.post(
+        f"{settings.API_V1_STR}/chat/",
+        json={"message": "How do I reset the pump?"},
+        headers=normal_user_token_headers,
+    )
+    second = client.post(
+        f"{settings.API_V1_STR}/chat/",
+        json={"conversation_id": first.json()["conversation_id"], "message": "And how long does it take?"},
+        headers=normal_user_token_headers,
+    )
+    
+    assert [first.status_code, second.status_code] == [200, 200]
+    assert batches == [
+        ["How do I reset the pump?"],
+        ["And how long does it take?", "How do I reset the pump?\nAnd how long does it take?"],
+    ]
\ No newline at end of file
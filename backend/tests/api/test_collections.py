@@ -0,0 +1,70 @@
+from typing import Dict
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import deps
+from app.core.config import settings
+from app.main import app
+
+
+@pytest.mark.parametrize(
+    "vector_index",
+    [
+        {"quantization": "pq", "pq_subvectors": 7},
+        {"quantization": "pq", "pq_subvectors": 0},
+        {"quantization": "int8", "rescore": 0},
+        {"quantization": "float16"},
+    ],
+)
+def test_create_collection_rejects_invalid_vector_index(
+    client: TestClient, normal_user_token_headers: Dict[str, str], vector_index: dict
+) -> None:
+    """Test that quantization settings the vector store cannot use are rejected."""
+    response = client.post(
+        f"{settings.API_V1_STR}/collections/",
+        json={"name": "Manuals", "vector_index": vector_index},
+        headers=normal_user_token_headers,
+    )
+    
+    assert response.status_code == 422
+
+
+def test_create_collection_with_vector_index(
+    client: TestClient, normal_user_token_headers: Dict[str, str]
+) -> None:
+    """Test that a collection is created with its quantization settings."""
+    response = client.post(
+        f"{settings.API_V1_STR}/collections/",
+        json={"name": "Manuals", "vector_index": {"quantization": "pq", "pq_subvectors": 48}},
+        headers=normal_user_token_headers,
+    )
+    
+    assert response.status_code == 201
+    assert response.json()["vector_index"] == {"quantization": "pq", "pq_subvectors": 48, "rescore": 4}
+
+
+def test_update_vector_index_re_encodes_store(
+    client: TestClient, normal_user_token_headers: Dict[str, str]
+) -> None:
+    """Test that changing the quantization of a collection re-encodes its stored vectors."""
+    created = client.post(
+        f"{settings.API_V1_STR}/collections/",
+        json={"name": "Manuals"},
+        headers=normal_user_token_headers,
+    ).json()
+    store = app.dependency_overrides[deps.get_vector_stores]().get(created["id"])
+    vectors = np.random.default_rng(0).standard_normal((1100, settings.EMBEDDING_DIMENSION)).astype(np.float32)
+    store.add([f"v{i}" for i in range(len(vectors))], vectors)
+    full_bytes = store.searched_bytes
+    
+    response = client.put(
+        f"{settings.API_V1_STR}/collections/{created['id']}",
+        json={"vector_index": {"quantization": "int8"}},
+        headers=normal_user_token_headers,
+    )
+    
+    assert response.status_code == 200
+    assert store.quantizer.name == "int8"
+    assert store.searched_bytes == full_bytes // 4
\ No newline at end of file
@@ -1,12 +1,24 @@
+import asyncio
 import io
-from typing import Dict
+import os
+from typing import Dict, List
 
+import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 
+from app import crud
+from app.api import deps
 from app.core.config import settings
+from app.main import app
+from app.models.collection import Collection
+from app.models.conversation import Conversation
 from app.models.document import Document
+from app.models.document_chunk import DocumentChunk, MessageChunkReference
+from app.models.message import Message
 from app.models.user import User
+from app.schemas.search import SearchOptions
+from app.services.lexical import LexicalDocument
 
 
 def test_get_documents(
@@ -23,7 +35,7 @@ def test_get_documents(
 
 
 def test_upload_document(
-    client: TestClient, normal_user_token_headers: Dict[str, str], db: Session
+    client: TestClient, normal_user_token_headers: Dict[str, str], db: Session, ingestion_queue: List[int]
 ) -> None:
     """Test uploading a new document."""
     # Create document form data
@@ -54,6 +66,7 @@ def test_upload_document(
     assert document["file_type"] == "pdf"
     assert document["status"] == "pending"
     assert "id" in document
+    assert ingestion_queue == [document["id"]]
 
 
 def test_get_document(
@@ -168,4 +181,200 @@ def test_delete_document(
         headers=normal_user_token_headers,
     )
     
-    assert get_response.status_code == 404
\ No newline at end of file
+    assert get_response.status_code == 404
+
+def _other_users_collection(db: Session) -> Collection:
+    other = User(
+        email="other@example.com",
+        username="other",
+        full_name="Other User",
+        hashed_password="not-used",
+        is_active=True,
+    )
+    db.add(other)
+    db.commit()
+    collection = Collection(name="Not yours", owner_id=other.id)
+    db.add(collection)
+    db.commit()
+    db.refresh(collection)
+    return collection
+
+
+def test_upload_to_foreign_collection(
+    client: TestClient, normal_user_token_headers: Dict[str, str], db: Session, ingestion_queue: List[int]
+) -> None:
+    """Test that documents cannot be filed into another user's collection."""
+    collection = _other_users_collection(db)
+    
+    response = client.post(
+        f"{settings.API_V1_STR}/documents/upload",
+        data={"title": "Intruder", "collection_id": str(collection.id)},
+        files={"file": ("note.txt", io.BytesIO(b"hello"), "text/plain")},
+        headers=normal_user_token_headers,
+    )
+    stream_response = client.post(
+        f"{settings.API_V1_STR}/documents/upload/stream",
+        params={"title": "Intruder", "file_name": "note.txt", "collection_id": collection.id},
+        content=b"hello",
+        headers=normal_user_token_headers,
+    )
+    
+    assert response.status_code == stream_response.status_code == 404
+    assert ingestion_queue == []
+    assert db.query(Document).filter(Document.collection_id == collection.id).count() == 0
+
+
+def test_update_document_checks_collection_and_ignores_status(
+    client: TestClient, normal_user_token_headers: Dict[str, str], db: Session
+) -> None:
+    """Test that updates cannot move a document into a foreign collection or set its status."""
+    user = db.query(User).filter(User.email == "user@example.com").first()
+    document = Document(
+        title="Pending",
+        file_name="pending.txt",
+        file_type="txt",
+        file_size=5,
+        s3_path="test/pending.txt",
+        owner_id=user.id,
+        status="pending",
+    )
+    db.add(document)
+    db.commit()
+    collection = _other_users_collection(db)
+    
+    moved = client.put(
+        f"{settings.API_V1_STR}/documents/{document.id}",
+        json={"collection_id": collection.id},
+        headers=normal_user_token_headers,
+    )
+    forced = client.put(
+        f"{settings.API_V1_STR}/documents/{document.id}",
+        json={"title": "Done", "status": "completed"},
+        headers=normal_user_token_headers,
+    )
+    
+    assert moved.status_code == 404
+    assert forced.status_code == 200
+    assert forced.json()["title"] == "Done"
+    assert forced.json()["status"] == "pending"
+    assert forced.json()["collection_id"] is None
+
+def test_move_document_between_collections(
+    client: TestClient, normal_user_token_headers: Dict[str, str], db: Session
+) -> None:
+    """Test that a moved document is only found, and only stored, in its new collection."""
+    user = db.query(User).filter(User.email == "user@example.com").first()
+    source, target = Collection(name="Source", owner_id=user.id), Collection(name="Target", owner_id=user.id)
+    db.add_all([source, target])
+    db.commit()
+    document = Document(
+        title="Manual",
+        file_name="manual.txt",
+        file_type="txt",
+        file_size=40,
+        s3_path="test/manual.txt",
+        owner_id=user.id,
+        collection_id=source.id,
+        status="indexed",
+    )
+    db.add(document)
+    db.commit()
+    content = "Reset the pump with the red button"
+    chunk = DocumentChunk(
+        document_id=document.id, content=content, chunk_index=0, vector_id=f"{user.id}:manual"
+    )
+    db.add(chunk)
+    db.commit()
+    retriever = app.dependency_overrides[deps.get_retriever]()
+    retriever.vector_stores.get(source.id).add([chunk.vector_id], retriever.embedder.embed([content]))
+    retriever.lexical_index.add([
+        LexicalDocument(
+            chunk_id=chunk.id,
+            content=content,
+            document_id=document.id,
+            owner_id=user.id,
+            collection_id=source.id,
+        )
+    ])
+    
+    response = client.put(
+        f"{settings.API_V1_STR}/documents/{document.id}",
+        json={"collection_id": target.id},
+        headers=normal_user_token_headers,
+    )
+    
+    def search(collection_id: int, **options) -> List[int]:
+        options = SearchOptions(collection_ids=[collection_id], **options)
+        result = asyncio.run(retriever.retrieve(db, content, owner_id=user.id, options=options))
+        return [c.chunk_id for c in result.chunks]
+    
+    assert response.status_code == 200
+    assert response.json()["collection_id"] == target.id
+    assert chunk.vector_id not in retriever.vector_stores.get(source.id)
+    assert chunk.vector_id in retriever.vector_stores.get(target.id)
+    for options in ({"use_lexical_search": False}, {"use_semantic_search": False}):
+        assert search(source.id, **options) == []
+        assert search(target.id, **options) == [chunk.id]
+
+
+def test_failed_file_replacement_removes_new_object(
+    client: TestClient, normal_user_token_headers: Dict[str, str], db: Session, monkeypatch, tmp_path
+) -> None:
+    """Test that the uploaded file is deleted again when the document cannot be updated."""
+    user = db.query(User).filter(User.email == "user@example.com").first()
+    document = Document(
+        title="Replace",
+        file_name="old.txt",
+        file_type="txt",
+        file_size=3,
+        s3_path="test/old.txt",
+        owner_id=user.id,
+        status="indexed",
+    )
+    db.add(document)
+    db.commit()
+    
+    def fail(*args, **kwargs):
+        raise RuntimeError("database unavailable")
+    
+    monkeypatch.setattr(crud.document, "update", fail)
+    with pytest.raises(RuntimeError):
+        client.put(
+            f"{settings.API_V1_STR}/documents/{document.id}/file",
+            files={"file": ("new.txt", io.BytesIO(b"new"), "text/plain")},
+            headers=normal_user_token_headers,
+        )
+    
+    assert [files for _, _, files in os.walk(tmp_path / "storage") if files] == []
+
+def test_delete_cited_document(
+    client: TestClient, normal_user_token_headers: Dict[str, str], db: Session
+) -> None:
+    """Test that a document whose chunks were cited in chat can still be deleted."""
+    user = db.query(User).filter(User.email == "user@example.com").first()
+    document = Document(
+        title="Cited",
+        file_name="cited.txt",
+        file_type="txt",
+        file_size=5,
+        s3_path="test/cited.txt",
+        owner_id=user.id,
+        status="indexed",
+    )
+    document.chunks = [DocumentChunk(content="The pump restarts after a minute.", chunk_index=0)]
+    conversation = Conversation(title="Pump", user_id=user.id)
+    message = Message(conversation=conversation, role="assistant", content="After a minute.")
+    db.add_all([document, conversation, message])
+    db.flush()
+    db.add(MessageChunkReference(message_id=message.id, chunk_id=document.chunks[0].id, relevance_score=1.0))
+    db.commit()
+    
+    response = client.delete(
+        f"{settings.API_V1_STR}/documents/{document.id}",
+        headers=normal_user_token_headers,
+    )
+    
+    assert response.status_code == 200
+    db.expire_all()
+    assert db.query(MessageChunkReference).filter(MessageChunkReference.message_id == message.id).count() == 0
+    assert db.get(Message, message.id) is not None
\ No newline at end of file
@@ -8,7 +8,10 @@ from app.models.user import User
 
 
 def test_get_users(
-    client: TestClient, superuser_token_headers: Dict[str, str], db: Session
+    client: TestClient,
+    superuser_token_headers: Dict[str, str],
+    normal_user_token_headers: Dict[str, str],
+    db: Session,
 ) -> None:
     """Test get users endpoint as superuser."""
     response = client.get(f"{settings.API_V1_STR}/users/", headers=superuser_token_headers)
@@ -1,17 +1,30 @@
 import os
-from typing import Dict, Generator
+from typing import Dict, Generator, List
+
+# Tests use the in-process lexical index, the app must not open Elasticsearch pools
+os.environ.setdefault("LEXICAL_BACKEND", "local")
 
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import Session, sessionmaker
 
+from app.api import deps
 from app.core.config import settings
 from app.db.base import Base
 from app.db.session import get_db
 from app.main import app
 from app.models.user import User
 from app.core.security import get_password_hash, create_access_token
+from app.services.chat import ChatService
+from app.services.context import ContextPacker, WhitespaceTokenizer
+from app.services.embedding_cache import CachedEmbedder, DiskEmbeddingStore
+from app.services.embeddings import EmbeddingEngine, HashingEmbeddingModel
+from app.services.inverted_index import InvertedIndex
+from app.services.llm import FakeProvider, ProviderModel
+from app.services.retrieval import HybridRetriever
+from app.services.storage import LocalStorage
+from app.services.vector_store import VectorStoreRegistry
 
 
 # Use an in-memory SQLite database for testing
@@ -22,6 +35,14 @@ engine = create_engine(
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
+@event.listens_for(engine, "connect")
+def _enable_foreign_keys(dbapi_connection, connection_record):
+    """Enforce foreign keys like PostgreSQL does, SQLite ignores them by default."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
 @pytest.fixture(scope="session")
 def db_engine():
     """Create a new database engine for tests."""
@@ -47,7 +68,13 @@ def db(db_engine) -> Generator:
 
 
 @pytest.fixture(scope="function")
-def client(db) -> Generator:
+def ingestion_queue() -> List[int]:
+    """Collect the IDs of documents queued for ingestion instead of sending them to Celery."""
+    return []
+
+
+@pytest.fixture(scope="function")
+def client(db, tmp_path, ingestion_queue) -> Generator:
     """Create a new FastAPI TestClient that uses the db fixture."""
     def _get_test_db():
         try:
@@ -55,9 +82,26 @@ def client(db) -> Generator:
         finally:
             pass
     
+    storage = LocalStorage(str(tmp_path / "storage"), part_size=64 * 1024)
+    vector_stores = VectorStoreRegistry(None, settings.EMBEDDING_DIMENSION, n_probe=8, train_size=1024)
+    lexical_index = InvertedIndex()
+    engine = EmbeddingEngine(HashingEmbeddingModel(settings.EMBEDDING_DIMENSION), max_wait_ms=1)
+    embedder = CachedEmbedder(engine, DiskEmbeddingStore(str(tmp_path / "embeddings.sqlite3"), 1 << 20))
+    retriever = HybridRetriever(embedder, vector_stores, lexical_index)
+    packer = ContextPacker(WhitespaceTokenizer(), context_window=4096, answer_tokens=512)
+    chat_service = ChatService(retriever, ProviderModel(FakeProvider(), "fake"), packer)
+    
     app.dependency_overrides[get_db] = _get_test_db
+    app.dependency_overrides[deps.get_db] = _get_test_db
+    app.dependency_overrides[deps.get_storage] = lambda: storage
+    app.dependency_overrides[deps.get_ingestion_queue] = lambda: ingestion_queue.append
+    app.dependency_overrides[deps.get_vector_stores] = lambda: vector_stores
+    app.dependency_overrides[deps.get_lexical_index] = lambda: lexical_index
+    app.dependency_overrides[deps.get_retriever] = lambda: retriever
+    app.dependency_overrides[deps.get_chat_service] = lambda: chat_service
     with TestClient(app) as c:
         yield c
+    engine.close()
 
 
 @pytest.fixture(scope="function")
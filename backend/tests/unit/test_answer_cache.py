@@ -0,0 +1,85 @@
+import numpy as np
+
+from app.schemas.search import SearchOptions
+from app.services.answer_cache import AnswerCache
+from app.services.retrieval_cache import RetrievalCache
+
+
+class FakeRedis:
+    """In-memory stand-in for the Redis commands the answer cache uses."""
+    
+    def __init__(self):
+        self.data = {}
+    
+    def get(self, key):
+        return self.data.get(key)
+    
+    def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+    
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+    
+    def incr(self, key):
+        self.data[key] = int(self.data.get(key, 0)) + 1
+        return self.data[key]
+    
+    def lpush(self, key, value):
+        self.data.setdefault(key, []).insert(0, value)
+    
+    def ltrim(self, key, start, end):
+        self.data[key] = self.data.get(key, [])[start:end + 1]
+    
+    def lrange(self, key, start, end):
+        values = self.data.get(key, [])
+        return values[start:] if end == -1 else values[start:end + 1]
+    
+    def expire(self, key, seconds):
+        pass
+
+
+def _cache(**kwargs):
+    client = FakeRedis()
+    return AnswerCache(client, RetrievalCache(client, ttl_seconds=60), ttl_seconds=60, **kwargs)
+
+
+def _scope(cache, collection_ids=(None, 3)):
+    return cache.scope(
+        model_names=["fake", "hashing"],
+        prompt_version=1,
+        owner_id=7,
+        collection_ids=list(collection_ids),
+        options=SearchOptions(),
+    )
+
+
+def test_exact_answers_until_collection_changes():
+    """Test that a normalized question hits until one of its collections changes."""
+    cache = _cache()
+    scope = _scope(cache)
+    cache.put(scope, "How do I reset the pump?", {"answer": "Hold the button.", "chunks": []})
+    
+    assert _scope(cache, (3, None)) == scope
+    assert cache.get(scope, "  how do i RESET the pump? ")["answer"] == "Hold the button."
+    assert cache.get(scope, "How do I clean the pump?") is None
+    
+    cache.versions.bump(7, [3])
+    
+    assert _scope(cache) != scope
+    assert cache.get(_scope(cache), "How do I reset the pump?") is None
+
+
+def test_semantic_answers_similar_questions():
+    """Test that an embedded question gets the answer of a similar enough cached question."""
+    cache = _cache(similarity=0.9, max_similar_questions=2)
+    scope = _scope(cache)
+    cache.put(scope, "How do I reset the pump?", {"answer": "Hold the button.", "chunks": []}, np.array([1.0, 0.0]))
+    
+    assert cache.get(scope, "Resetting the pump", np.array([0.95, 0.1]))["answer"] == "Hold the button."
+    assert cache.get(scope, "Cleaning the pump", np.array([0.5, 0.5])) is None
+    assert cache.get(scope, "Resetting the pump") is None
+    
+    cache.put(scope, "a", {"answer": "a", "chunks": []}, np.array([0.0, 1.0]))
+    cache.put(scope, "b", {"answer": "b", "chunks": []}, np.array([0.0, 1.0]))
+    
+    assert cache.get(scope, "Resetting the pump", np.array([0.95, 0.1])) is None
\ No newline at end of file
@@ -0,0 +1,32 @@
+from benchmarks.compare import compare
+from benchmarks.corpus import make_corpus
+from benchmarks.retrieval import bench_lexical_backends, bench_vector_backends
+
+
+def test_retrieval_benchmark_smoke():
+    """Test that a tiny benchmark run measures every backend and compares cleanly."""
+    corpus = make_corpus(300, chunk_tokens=16, dimension=16, n_queries=10)
+    
+    results = bench_vector_backends(
+        corpus, k=5, quantizations=["none", "int8"], n_probes=[1, 4], train_size=100, shards=2
+    )
+    results += bench_lexical_backends(corpus, k=5)
+    
+    assert [(r["backend"], r["params"].get("n_probe")) for r in results] == [
+        ("exact", None),
+        ("ivf-none", 1),
+        ("ivf-none", 4),
+        ("ivf-int8", 1),
+        ("ivf-int8", 4),
+        ("sharded", 1),
+        ("sharded", 4),
+        ("inverted-index", None),
+    ]
+    assert results[0]["recall_at_k"] == 1.0
+    assert results[5]["params"]["shards"] == 2
+    assert results[5]["searched_bytes"] == results[1]["searched_bytes"]
+    assert all(r["p50_ms"] <= r["p95_ms"] <= r["p99_ms"] for r in results)
+    assert results[-1]["hit_rate"] > 0.5
+    
+    run = {"config": {}, "results": results}
+    assert not any(row["regressions"] for row in compare(run, run, max_latency_increase=0, max_recall_drop=0))
\ No newline at end of file
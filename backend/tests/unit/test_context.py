@@ -0,0 +1,71 @@
+from app.schemas.search import RetrievedChunk
+from app.services.context import ContextPacker, WhitespaceTokenizer
+
+
+class CountingTokenizer(WhitespaceTokenizer):
+    def __init__(self):
+        self.counted = []
+    
+    def count(self, texts):
+        self.counted.extend(texts)
+        return super().count(texts)
+
+
+def _chunk(chunk_id, words, **fields):
+    return RetrievedChunk(
+        chunk_id=chunk_id,
+        document_id=1,
+        chunk_index=chunk_id,
+        content=" ".join(f"w{chunk_id}" for _ in range(words)),
+        score=1.0 / chunk_id,
+        **fields,
+    )
+
+
+def test_pack_prefers_relevance_per_token():
+    """Test that a long chunk is passed over for shorter ones when they do not all fit."""
+    chunks = [_chunk(1, 60), _chunk(2, 20), _chunk(3, 20), _chunk(4, 20)]
+    packer = ContextPacker(WhitespaceTokenizer(), context_window=200, answer_tokens=50, history_share=0)
+    
+    packed = packer.pack("system prompt", [], "the question", chunks)
+    
+    assert [chunk.chunk_id for chunk in packed.chunks] == [1, 2, 3]
+    assert packed.tokens <= 150
+    
+    packed = ContextPacker(WhitespaceTokenizer(), context_window=150, answer_tokens=50, history_share=0).pack(
+        "system prompt", [], "the question", chunks
+    )
+    
+    assert [chunk.chunk_id for chunk in packed.chunks] == [2, 3, 4]
+    assert packed.tokens <= 100
+
+
+def test_pack_keeps_newest_history():
+    """Test that the newest history messages are kept and older ones fill what chunks leave."""
+    history = [{"role": "user", "content": " ".join(["old"] * 30)}] + [
+        {"role": role, "content": f"recent {role}"} for role in ("user", "assistant")
+    ]
+    packer = ContextPacker(WhitespaceTokenizer(), context_window=120, answer_tokens=20, history_share=0.2)
+    
+    packed = packer.pack("system", history, "question", [_chunk(1, 40)])
+    
+    assert packed.history == history[1:]
+    assert [chunk.chunk_id for chunk in packed.chunks] == [1]
+    
+    packed = packer.pack("system", history, "question", [])
+    
+    assert packed.history == history
+
+
+def test_cached_token_counts_are_not_recounted():
+    """Test that chunks with a cached count are not tokenized and the others are reported."""
+    tokenizer = CountingTokenizer()
+    cached = _chunk(1, 10, metadata={"token_counts": {"whitespace": 10}})
+    expanded = _chunk(2, 10, metadata={"token_counts": {"whitespace": 4}}, window=(1, 3))
+    packer = ContextPacker(tokenizer, context_window=1000, answer_tokens=100)
+    
+    counts, new_counts = packer.chunk_tokens([cached, expanded, _chunk(3, 5)])
+    
+    assert counts == [10, 10, 5]
+    assert new_counts == {3: 5}
+    assert cached.content not in tokenizer.counted
\ No newline at end of file
@@ -0,0 +1,100 @@
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.models.document import Document
+from app.models.document_chunk import DocumentChunk
+from app.models.user import User
+
+
+def _create_document(db: Session) -> Document:
+    user = User(
+        email="chunks@example.com",
+        username="chunks",
+        full_name="Chunk Owner",
+        hashed_password="not-a-hash",
+    )
+    db.add(user)
+    db.commit()
+    document = Document(
+        title="Manual",
+        file_name="manual.pdf",
+        file_type="pdf",
+        file_size=1024,
+        s3_path="test/manual.pdf",
+        owner_id=user.id,
+    )
+    db.add(document)
+    db.commit()
+    db.refresh(document)
+    return document
+
+
+def test_bulk_create_chunks(db: Session):
+    """Test that chunks are inserted in batches and IDs come back in input order."""
+    document = _create_document(db)
+    rows = [
+        {
+            "document_id": document.id,
+            "content": f"chunk {i}",
+            "chunk_index": i,
+            "metadata": {"page": i // 10 + 1},
+        }
+        for i in range(25)
+    ]
+    
+    ids = crud.document_chunk.bulk_create(db, rows=rows, batch_size=10)
+    
+    assert len(ids) == 25
+    assert len(set(ids)) == 25
+    chunks = {c.id: c for c in crud.document_chunk.get_multi_by_document(db, document_id=document.id)}
+    assert [chunks[id].chunk_index for id in ids] == list(range(25))
+    assert chunks[ids[12]].content == "chunk 12"
+
+
+def test_remove_chunks_by_document(db: Session):
+    """Test that all chunks of a document are deleted in one statement."""
+    document = _create_document(db)
+    rows = [
+        {"document_id": document.id, "content": f"chunk {i}", "chunk_index": i}
+        for i in range(5)
+    ]
+    crud.document_chunk.bulk_create(db, rows=rows)
+    
+    removed = crud.document_chunk.remove_by_document(db, document_id=document.id)
+    
+    assert removed == 5
+    assert db.query(DocumentChunk).filter(DocumentChunk.document_id == document.id).count() == 0
+
+
+def test_get_ranges_reads_windows_in_one_query(db: Session):
+    """Test that chunk index ranges of a document come back in order."""
+    document = _create_document(db)
+    crud.document_chunk.bulk_create(db, rows=[
+        {"document_id": document.id, "content": f"chunk {i}", "chunk_index": i} for i in range(10)
+    ])
+    
+    rows = crud.document_chunk.get_ranges(db, ranges=[(document.id, 7, 12), (document.id, 1, 2)])
+    
+    assert [row.chunk_index for row in rows] == [1, 2, 7, 8, 9]
+    assert rows[0].content == "chunk 1"
+
+def test_bulk_set_token_counts_keeps_metadata(db: Session):
+    """Test that token counts are added next to the existing chunk metadata."""
+    document = _create_document(db)
+    ids = crud.document_chunk.bulk_create(
+        db,
+        rows=[
+            {"document_id": document.id, "content": "one two three", "chunk_index": 0, "metadata": {"page": 2}},
+            {"document_id": document.id, "content": "four", "chunk_index": 1, "metadata": None},
+        ],
+    )
+    
+    crud.document_chunk.bulk_set_token_counts(
+        db, key="token_counts", tokenizer="whitespace", counts={ids[0]: 3, ids[1]: 1}
+    )
+    crud.document_chunk.bulk_set_token_counts(db, key="token_counts", tokenizer="cl100k_base", counts={ids[0]: 4})
+    
+    db.expire_all()
+    chunks = {c.id: c for c in crud.document_chunk.get_multi_by_document(db, document_id=document.id)}
+    assert chunks[ids[0]].metadata_ == {"page": 2, "token_counts": {"whitespace": 3, "cl100k_base": 4}}
+    assert chunks[ids[1]].metadata_ == {"token_counts": {"whitespace": 1}}
\ No newline at end of file
@@ -0,0 +1,28 @@
+import numpy as np
+
+from app.schemas.search import RetrievedChunk
+from app.services.diversity import cap_per_document, maximal_marginal_relevance
+
+
+def _chunk(chunk_id, document_id):
+    return RetrievedChunk(
+        chunk_id=chunk_id, document_id=document_id, chunk_index=chunk_id, content=f"chunk {chunk_id}", score=1.0
+    )
+
+
+def test_mmr_skips_near_duplicates():
+    """Test that a slightly less relevant but novel candidate beats a duplicate."""
+    query = np.array([1.0, 0.5])
+    vectors = np.array([[1.0, 0.3], [1.0, 0.28], [0.2, 1.0]])
+    
+    assert maximal_marginal_relevance(query, vectors, 2, lambda_=0.5) == [0, 2]
+    assert maximal_marginal_relevance(query, vectors, 2, lambda_=1.0) == [0, 1]
+    assert maximal_marginal_relevance(query, vectors, 5, lambda_=0.5) == [0, 2, 1]
+
+
+def test_cap_per_document_keeps_order():
+    """Test that chunks beyond the cap of their document are dropped."""
+    chunks = [_chunk(1, 10), _chunk(2, 10), _chunk(3, 20), _chunk(4, 10)]
+    
+    assert [c.chunk_id for c in cap_per_document(chunks, 2)] == [1, 2, 3]
+    assert cap_per_document(chunks, None) == chunks
\ No newline at end of file
@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+
+from app.services.embedding_cache import (
+    CachedEmbedder,
+    DiskEmbeddingStore,
+    TieredEmbeddingStore,
+    cache_key,
+)
+from app.services.embeddings import EmbeddingEngine, HashingEmbeddingModel
+
+
+class CountingModel(HashingEmbeddingModel):
+    """Hashing model that counts the texts it embeds."""
+    
+    def __init__(self):
+        super().__init__(dimension=8)
+        self.encoded = []
+    
+    def encode(self, texts):
+        self.encoded.extend(texts)
+        return super().encode(texts)
+
+
+class DictStore:
+    """In-memory store standing in for Redis."""
+    
+    def __init__(self):
+        self.data = {}
+    
+    def get_many(self, keys):
+        return {key: self.data[key] for key in keys if key in self.data}
+    
+    def put_many(self, items):
+        self.data.update(items)
+
+
+@pytest.fixture
+def model():
+    return CountingModel()
+
+
+@pytest.fixture
+def embedder(model, tmp_path):
+    engine = EmbeddingEngine(model, max_batch_size=8, max_wait_ms=1)
+    yield CachedEmbedder(engine, DiskEmbeddingStore(str(tmp_path / "cache.sqlite3"), 1 << 20))
+    engine.close()
+
+
+def test_cache_key_ignores_whitespace_and_includes_model():
+    """Test that keys normalize whitespace and differ between models."""
+    assert cache_key("m", "hello  world\n") == cache_key("m", "hello world")
+    assert cache_key("m", "hello world") != cache_key("other", "hello world")
+
+
+def test_embedder_only_embeds_misses(embedder, model):
+    """Test that cached and repeated texts are not embedded again."""
+    first = embedder.embed(["alpha", "beta", "alpha"])
+    second = embedder.embed(["beta", "gamma"])
+    
+    assert sorted(model.encoded) == ["alpha", "beta", "gamma"]
+    np.testing.assert_allclose(first[0], first[2])
+    np.testing.assert_allclose(first[1], second[0])
+    assert second.dtype == np.float32 and second.shape == (2, 8)
+    
+    stats = embedder.stats()
+    assert (stats.hits, stats.misses) == (2, 3)
+    assert stats.hit_rate == pytest.approx(0.4)
+
+
+def test_disk_store_persists_across_instances(tmp_path):
+    """Test that vectors survive reopening the cache file."""
+    path = str(tmp_path / "cache.sqlite3")
+    store = DiskEmbeddingStore(path, 1 << 20)
+    store.put_many({"a": np.arange(4, dtype=np.float32)})
+    store.close()
+    
+    reopened = DiskEmbeddingStore(path, 1 << 20)
+    np.testing.assert_array_equal(reopened.get_many(["a", "b"])["a"], np.arange(4, dtype=np.float32))
+    assert reopened.size == 16
+
+
+def test_disk_store_evicts_least_recently_used(tmp_path):
+    """Test that the least recently read entries are evicted over budget."""
+    store = DiskEmbeddingStore(str(tmp_path / "cache.sqlite3"), max_bytes=4 * 16)
+    vector = np.zeros(4, dtype=np.float32)
+    for key in "abcd":
+        store.put_many({key: vector})
+    store.get_many(["a"])
+    
+    store.put_many({"e": vector})
+    
+    kept = set(store.get_many(list("abcde")))
+    assert {"a", "e"} <= kept
+    assert "b" not in kept
+    assert store.size <= 4 * 16
+
+
+def test_tiered_store_backfills_faster_tiers(tmp_path):
+    """Test that hits from the shared tier are copied into the local one."""
+    local = DiskEmbeddingStore(str(tmp_path / "cache.sqlite3"), 1 << 20)
+    shared = DictStore()
+    shared.put_many({"a": np.ones(4, dtype=np.float32)})
+    store = TieredEmbeddingStore([local, shared])
+    
+    assert set(store.get_many(["a", "b"])) == {"a"}
+    assert set(local.get_many(["a"])) == {"a"}
+    
+    store.put_many({"b": np.ones(4, dtype=np.float32)})
+    assert "b" in shared.data
\ No newline at end of file
@@ -0,0 +1,81 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from app.services.embeddings import EmbeddingEngine, HashingEmbeddingModel
+
+
+class RecordingModel(HashingEmbeddingModel):
+    """Hashing model that records the batches it receives."""
+    
+    def __init__(self):
+        super().__init__(dimension=16)
+        self.batches = []
+    
+    def encode(self, texts):
+        self.batches.append(list(texts))
+        return super().encode(texts)
+
+
+@pytest.fixture
+def engine():
+    engine = EmbeddingEngine(RecordingModel(), max_batch_size=4, max_wait_ms=50)
+    yield engine
+    engine.close()
+
+
+def test_embed_returns_contiguous_float32(engine):
+    """Test that results are contiguous float32 arrays in input order."""
+    texts = ["alpha", "a much longer text about beta", "gamma delta"]
+    
+    vectors = engine.embed(texts)
+    
+    assert vectors.dtype == np.float32
+    assert vectors.flags["C_CONTIGUOUS"]
+    assert vectors.shape == (3, 16)
+    np.testing.assert_allclose(vectors, HashingEmbeddingModel(16).encode(texts), rtol=1e-6)
+    assert engine.embed([]).shape == (0, 16)
+
+
+def test_concurrent_callers_are_batched_by_length(engine):
+    """Test that texts from concurrent callers share length-sorted batches."""
+    results = {}
+    texts = {i: ["x " * (i * 3 + 1), "y " * (20 - i)] for i in range(4)}
+    
+    def call(i):
+        results[i] = engine.embed(texts[i])
+    
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    
+    for i in range(4):
+        np.testing.assert_allclose(results[i], HashingEmbeddingModel(16).encode(texts[i]), rtol=1e-6)
+    assert all(len(batch) <= 4 for batch in engine.model.batches)
+    assert len(engine.model.batches) < 8
+    for batch in engine.model.batches:
+        assert [len(t) for t in batch] == sorted(len(t) for t in batch)
+    
+    stats = engine.stats()
+    assert stats.requests == 4
+    assert stats.texts == 8
+    assert stats.batches == len(engine.model.batches)
+    assert stats.latency_p95_ms > 0
+
+
+def test_model_errors_reach_callers():
+    """Test that a failing batch fails the waiting callers."""
+    class BrokenModel(HashingEmbeddingModel):
+        def encode(self, texts):
+            raise RuntimeError("model crashed")
+    
+    engine = EmbeddingEngine(BrokenModel(), max_batch_size=4, max_wait_ms=1)
+    try:
+        with pytest.raises(RuntimeError):
+            engine.embed(["text"])
+    finally:
+        engine.close()
\ No newline at end of file
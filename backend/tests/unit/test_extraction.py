@@ -0,0 +1,78 @@
+import fitz
+import pytest
+
+from app.services.chunking import chunk_pages, join_chunks, split_text
+from app.services.extraction import ExtractedPage, ExtractionPool, UnsupportedFileType
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = ExtractionPool(max_workers=2, pages_per_task=2, max_pending=2)
+    yield pool
+    pool.shutdown()
+
+
+def test_pdf_pages_stream_in_order(pool, tmp_path):
+    """Test that PDF page ranges fanned out to the pool come back in order."""
+    path = tmp_path / "doc.pdf"
+    pdf = fitz.open()
+    for i in range(5):
+        page = pdf.new_page()
+        page.insert_text((72, 72), f"Page number {i + 1}")
+    pdf.save(str(path))
+    
+    pages = list(pool.iter_pages("pdf", str(path)))
+    
+    assert [p.page_number for p in pages] == [1, 2, 3, 4, 5]
+    assert pages[2].text.strip() == "Page number 3"
+
+
+def test_html_extraction_strips_scripts(pool, tmp_path):
+    """Test that HTML text is extracted without script contents."""
+    path = tmp_path / "doc.html"
+    path.write_text("<html><script>var x = 1;</script><body><p>Hello</p><p>World</p></body></html>")
+    
+    pages = list(pool.iter_pages("html", str(path)))
+    
+    assert len(pages) == 1
+    assert pages[0].text == "Hello\nWorld"
+
+
+def test_unsupported_file_type(pool, tmp_path):
+    """Test that unknown file types are rejected before any work is submitted."""
+    with pytest.raises(UnsupportedFileType):
+        list(pool.iter_pages("xyz", str(tmp_path / "doc.xyz")))
+
+
+def test_split_text_windows():
+    """Test that chunks respect the size limit, overlap and word boundaries."""
+    text = " ".join(f"word{i}" for i in range(200))
+    
+    chunks = split_text(text, chunk_size=100, overlap=20)
+    
+    assert all(len(c) <= 100 for c in chunks)
+    assert all(not c.startswith(" ") and not c.endswith(" ") for c in chunks)
+    assert chunks[0].split()[0] == "word0"
+    assert chunks[-1].split()[-1] == "word199"
+    # Consecutive chunks share some words
+    assert set(chunks[0].split()) & set(chunks[1].split())
+    assert split_text(text, 100, 20) == chunks
+
+
+def test_join_chunks_drops_overlap():
+    """Test that consecutive overlapping chunks are joined back into the original text."""
+    text = " ".join(f"word{i}" for i in range(200))
+    
+    assert join_chunks(split_text(text, chunk_size=100, overlap=20)) == text
+    assert join_chunks(split_text(text, chunk_size=100, overlap=20)[3:5]) in text
+
+
+def test_chunk_pages_numbers_chunks_across_pages():
+    """Test that chunk indexes run across pages and keep the page number."""
+    pages = [ExtractedPage(page_number=1, text="a " * 80), ExtractedPage(page_number=2, text="b " * 80)]
+    
+    chunks = list(chunk_pages(pages, chunk_size=100, overlap=0))
+    
+    assert [c.index for c in chunks] == list(range(len(chunks)))
+    assert chunks[0].metadata == {"page": 1}
+    assert chunks[-1].metadata == {"page": 2}
\ No newline at end of file
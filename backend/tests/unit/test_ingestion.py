@@ -0,0 +1,244 @@
+import hashlib
+
+import numpy as np
+import pytest
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.models.conversation import Conversation
+from app.models.document import Document
+from app.models.document_chunk import MessageChunkReference
+from app.models.user import User
+from app.services.embedding_cache import CachedEmbedder, DiskEmbeddingStore
+from app.services.embeddings import EmbeddingEngine, HashingEmbeddingModel
+from app.services.extraction import get_extractor
+from app.services.ingestion import ingest_document, vector_id_for
+from app.services.lexical import LexicalIndex
+from app.services.storage import LocalStorage
+from app.services.vector_store import IVFVectorStore
+
+
+class InlinePool:
+    """Extraction pool stand-in that parses in the test process."""
+    
+    def __init__(self):
+        self.calls = 0
+    
+    def iter_pages(self, file_type, path):
+        self.calls += 1
+        extractor = get_extractor(file_type)
+        return iter(extractor.extract(path, 0, extractor.page_count(path)))
+
+
+class RecordingLexicalIndex(LexicalIndex):
+    """Lexical index stand-in that keeps the indexed chunk contents."""
+    
+    def __init__(self):
+        self.contents = {}
+    
+    def add(self, documents):
+        self.contents.update({d.chunk_id: d.content for d in documents})
+    
+    def delete(self, chunk_ids):
+        for chunk_id in chunk_ids:
+            self.contents.pop(chunk_id, None)
+    
+    def search(self, query, *, owner_id, collection_ids=None, k=10):
+        return []
+
+
+@pytest.fixture
+def indexing(tmp_path):
+    engine = EmbeddingEngine(HashingEmbeddingModel(32), max_wait_ms=1)
+    embedder = CachedEmbedder(engine, DiskEmbeddingStore(str(tmp_path / "cache.sqlite3"), 1 << 20))
+    yield {
+        "embedder": embedder,
+        "vector_store": IVFVectorStore(32),
+        "lexical_index": RecordingLexicalIndex(),
+    }
+    engine.close()
+
+
+@pytest.fixture
+def owner(db: Session) -> User:
+    user = User(
+        email="ingest@example.com",
+        username="ingest",
+        full_name="Ingest Owner",
+        hashed_password="not-a-hash",
+    )
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+
+def _upload(db: Session, storage: LocalStorage, owner: User, key: str, data: bytes) -> Document:
+    writer = storage.open_writer(key)
+    writer.write(data)
+    stored = writer.complete()
+    document = Document(
+        title=key,
+        file_name=key,
+        file_type="txt",
+        file_size=stored.size,
+        s3_path=stored.key,
+        content_hash=stored.content_hash,
+        owner_id=owner.id,
+    )
+    db.add(document)
+    db.commit()
+    db.refresh(document)
+    return document
+
+
+def test_ingest_document(db: Session, owner: User, tmp_path, indexing):
+    """Test that a document is chunked with content hashes and marked indexed."""
+    storage = LocalStorage(str(tmp_path), part_size=1024)
+    data = " ".join(f"word{i}" for i in range(500)).encode()
+    document = _upload(db, storage, owner, "a.txt", data)
+    
+    report = ingest_document(db, document, storage=storage, pool=InlinePool(), **indexing)
+    
+    chunks = crud.document_chunk.get_multi_by_document(db, document_id=document.id)
+    assert document.status == "indexed"
+    assert report.chunk_count == len(chunks) > 1
+    assert report.reused_document_id is None
+    assert chunks[0].content_hash == hashlib.sha256(chunks[0].content.encode()).hexdigest()
+
+
+def test_ingest_duplicate_document_skips_extraction(db: Session, owner: User, tmp_path, indexing):
+    """Test that re-uploading the same file reuses the chunks of the first copy."""
+    storage = LocalStorage(str(tmp_path), part_size=1024)
+    data = " ".join(f"word{i}" for i in range(500)).encode()
+    first = _upload(db, storage, owner, "first.txt", data)
+    ingest_document(db, first, storage=storage, pool=InlinePool(), **indexing)
+    second = _upload(db, storage, owner, "second.txt", data)
+    pool = InlinePool()
+    
+    report = ingest_document(db, second, storage=storage, pool=pool, **indexing)
+    
+    assert pool.calls == 0
+    assert report.reused_document_id == first.id
+    first_chunks = crud.document_chunk.get_multi_by_document(db, document_id=first.id)
+    second_chunks = crud.document_chunk.get_multi_by_document(db, document_id=second.id)
+    assert [c.content for c in second_chunks] == [c.content for c in first_chunks]
+    assert second.metadata_["ingestion"]["reused_document_id"] == first.id
+
+
+def test_ingest_reuses_existing_vectors(db: Session, owner: User, tmp_path, indexing):
+    """Test that chunks with already embedded content keep the existing vector."""
+    storage = LocalStorage(str(tmp_path), part_size=1024)
+    first = _upload(db, storage, owner, "first.txt", b"shared paragraph")
+    ingest_document(db, first, storage=storage, pool=InlinePool(), **indexing)
+    for chunk in crud.document_chunk.get_multi_by_document(db, document_id=first.id):
+        crud.document_chunk.update(db, db_obj=chunk, obj_in={"vector_id": "vec-1"})
+    second = _upload(db, storage, owner, "second.txt", b"shared   paragraph\n")
+    
+    report = ingest_document(db, second, storage=storage, pool=InlinePool(), **indexing)
+    
+    assert report.reused_document_id is None
+    assert report.reused_vectors == 1
+    assert report.chunks_to_embed == 0
+    [chunk] = crud.document_chunk.get_multi_by_document(db, document_id=second.id)
+    assert chunk.vector_id == "vec-1"
+
+def test_reindex_replaced_document_keeps_unchanged_chunks(db: Session, owner: User, tmp_path, indexing):
+    """Test that re-indexing only rewrites chunks whose content changed."""
+    storage = LocalStorage(str(tmp_path), part_size=1024)
+    words = [f"word{i}" for i in range(1500)]
+    document = _upload(db, storage, owner, "v1.txt", " ".join(words).encode())
+    ingest_document(db, document, storage=storage, pool=InlinePool(), **indexing)
+    old_chunks = crud.document_chunk.get_multi_by_document(db, document_id=document.id)
+    for chunk in old_chunks:
+        crud.document_chunk.update(db, db_obj=chunk, obj_in={"vector_id": f"vec-{chunk.id}"})
+    old_ids = {c.id for c in old_chunks}
+    
+    # Edit a few words near the middle of the text
+    words[700:705] = ["edited"] * 5
+    replacement = _upload(db, storage, owner, "v2.txt", " ".join(words).encode())
+    db.refresh(document)
+    crud.document.update(
+        db,
+        db_obj=document,
+        obj_in={"s3_path": replacement.s3_path, "content_hash": replacement.content_hash},
+    )
+    
+    report = ingest_document(db, document, storage=storage, pool=InlinePool(), **indexing)
+    
+    new_chunks = crud.document_chunk.get_multi_by_document(db, document_id=document.id)
+    assert [c.chunk_index for c in new_chunks] == list(range(len(new_chunks)))
+    assert " ".join(new_chunks[0].content.split()[:1]) == "word0"
+    assert report.kept_chunks == len(new_chunks) - (report.chunk_count - report.kept_chunks)
+    assert 0 < report.removed_chunks < len(old_ids) // 2
+    assert report.chunks_to_embed == report.chunk_count - report.kept_chunks
+    kept_ids = old_ids & {c.id for c in new_chunks}
+    assert len(kept_ids) == report.kept_chunks
+    assert all(c.vector_id == f"vec-{c.id}" for c in new_chunks if c.id in kept_ids)
+    assert len(report.stale_vector_ids) == report.removed_chunks
+    assert indexing["lexical_index"].contents == {c.id: c.content for c in new_chunks}
+
+def test_ingest_document_indexes_vectors(db: Session, owner: User, tmp_path, indexing):
+    """Test that chunks are embedded and searchable under their shared vector ID."""
+    storage = LocalStorage(str(tmp_path), part_size=1024)
+    data = " ".join(f"word{i}" for i in range(500)).encode()
+    document = _upload(db, storage, owner, "a.txt", data)
+    
+    report = ingest_document(db, document, storage=storage, pool=InlinePool(), **indexing)
+    
+    chunks = crud.document_chunk.get_multi_by_document(db, document_id=document.id)
+    vector_store = indexing["vector_store"]
+    assert report.embedded_chunks == len(chunks) == len(vector_store)
+    assert all(c.vector_id == vector_id_for(owner.id, c.content_hash) for c in chunks)
+    query = indexing["embedder"].embed([chunks[1].content])[0]
+    assert vector_store.search(query, k=1)[0].vector_id == chunks[1].vector_id
+
+
+def test_reindex_deletes_stale_vectors(db: Session, owner: User, tmp_path, indexing):
+    """Test that vectors of replaced content are removed from the vector store."""
+    storage = LocalStorage(str(tmp_path), part_size=1024)
+    document = _upload(db, storage, owner, "v1.txt", b"old content")
+    ingest_document(db, document, storage=storage, pool=InlinePool(), **indexing)
+    [old_chunk] = crud.document_chunk.get_multi_by_document(db, document_id=document.id)
+    old_vector_id = old_chunk.vector_id
+    replacement = _upload(db, storage, owner, "v2.txt", b"new content")
+    db.refresh(document)
+    crud.document.update(
+        db,
+        db_obj=document,
+        obj_in={"s3_path": replacement.s3_path, "content_hash": replacement.content_hash},
+    )
+    
+    report = ingest_document(db, document, storage=storage, pool=InlinePool(), **indexing)
+    
+    [new_chunk] = crud.document_chunk.get_multi_by_document(db, document_id=document.id)
+    vector_store = indexing["vector_store"]
+    assert report.stale_vector_ids == [old_vector_id]
+    assert len(vector_store) == 1
+    assert vector_store.search(np.ones(32), k=5)[0].vector_id == new_chunk.vector_id
+
+def test_reindex_removes_references_to_deleted_chunks(db: Session, owner: User, tmp_path, indexing):
+    """Test that re-indexing a document cited in chat drops the references to its removed chunks."""
+    storage = LocalStorage(str(tmp_path), part_size=1024)
+    document = _upload(db, storage, owner, "v1.txt", b"old content")
+    ingest_document(db, document, storage=storage, pool=InlinePool(), **indexing)
+    [old_chunk] = crud.document_chunk.get_multi_by_document(db, document_id=document.id)
+    conversation = Conversation(title="Cited", user_id=owner.id)
+    db.add(conversation)
+    db.commit()
+    message = crud.conversation.add_message(
+        db, conversation=conversation, role="assistant", content="Old.", chunk_scores=[(old_chunk.id, 1.0)]
+    )
+    replacement = _upload(db, storage, owner, "v2.txt", b"new content")
+    db.refresh(document)
+    crud.document.update(
+        db,
+        db_obj=document,
+        obj_in={"s3_path": replacement.s3_path, "content_hash": replacement.content_hash},
+    )
+    
+    report = ingest_document(db, document, storage=storage, pool=InlinePool(), **indexing)
+    
+    assert report.removed_chunks == 1
+    assert document.status == "indexed"
+    assert db.query(MessageChunkReference).filter(MessageChunkReference.message_id == message.id).count() == 0
\ No newline at end of file
@@ -0,0 +1,115 @@
+import os
+
+import pytest
+
+from app.services.inverted_index import InvertedIndex, tokenize
+from app.services.lexical import LexicalDocument
+
+
+def _doc(chunk_id, content, owner_id=1, collection_id=None):
+    return LexicalDocument(
+        chunk_id=chunk_id,
+        content=content,
+        document_id=chunk_id,
+        owner_id=owner_id,
+        collection_id=collection_id,
+    )
+
+
+def _documents():
+    return [
+        _doc(1, "The pump reports error E4711 when it overheats"),
+        _doc(2, "Clean the pump filter every month"),
+        _doc(3, "Error codes are listed in the appendix", collection_id=7),
+        _doc(4, "Error E4711 in another account", owner_id=2),
+    ]
+
+
+@pytest.fixture
+def index():
+    index = InvertedIndex()
+    index.add(_documents())
+    return index
+
+
+def test_tokenize_keeps_identifiers():
+    """Test that tokens are lowercased words with identifiers kept whole."""
+    assert tokenize("Pump E4711, part-no 12.5") == ["pump", "e4711", "part", "no", "12", "5"]
+
+
+def test_bm25_ranking(index):
+    """Test that rare terms weigh more and results are limited to the owner."""
+    hits = index.search("error E4711", owner_id=1, k=10)
+    
+    assert [h.chunk_id for h in hits] == [1, 3]
+    assert hits[0].score > hits[1].score > 0
+    assert index.search("unknown words", owner_id=1) == []
+
+
+def test_collection_filter(index):
+    """Test that collection filters only keep chunks of those collections."""
+    hits = index.search("error", owner_id=1, collection_ids=[7])
+    
+    assert [h.chunk_id for h in hits] == [3]
+
+
+def test_delete_and_replace(index):
+    """Test that deleted and replaced chunks stop matching."""
+    index.delete([1])
+    index.add([_doc(2, "nothing about machines anymore")])
+    
+    assert [h.chunk_id for h in index.search("pump error", owner_id=1)] == [3]
+    assert len(index) == 3
+    
+    index.delete([3, 2])
+    assert len(index) == 1
+    assert [h.chunk_id for h in index.search("error", owner_id=2)] == [4]
+
+
+def test_persist_and_reload(tmp_path):
+    """Test that a persisted index is loaded and refreshed by other instances."""
+    path = str(tmp_path / "lexical")
+    index = InvertedIndex(path)
+    index.add(_documents())
+    index.persist()
+    
+    reader = InvertedIndex(path)
+    assert [h.chunk_id for h in reader.search("error E4711", owner_id=1)] == [1, 3]
+    
+    index.delete([1])
+    index.persist()
+    assert [h.chunk_id for h in reader.search("error E4711", owner_id=1)] == [3]
+    
+    # Deleting most documents compacts the index into new files
+    index.delete([2, 3])
+    assert [h.chunk_id for h in reader.search("error E4711", owner_id=2)] == [4]
+    assert len(reader) == 1
+
+
+def test_concurrent_writers_keep_each_others_changes(tmp_path):
+    """Test that writers catch up with each other instead of overwriting the index."""
+    path = str(tmp_path / "lexical")
+    first, second = InvertedIndex(path), InvertedIndex(path)
+    first.add([_doc(1, "pump error")])
+    second.add([_doc(2, "valve error")])
+    first.delete([2])
+    second.add([_doc(3, "filter error")])
+    
+    fresh = InvertedIndex(path)
+    assert sorted(h.chunk_id for h in fresh.search("error", owner_id=1)) == [1, 3]
+    first.persist()
+    assert len(fresh) == len(first) == len(second) == 2
+
+
+def test_adds_append_segments(tmp_path):
+    """Test that a small add leaves the segment of earlier documents untouched."""
+    path = str(tmp_path / "lexical")
+    index = InvertedIndex(path)
+    index.add([_doc(i, f"pump part {i}") for i in range(100)])
+    segments = sorted(os.listdir(path))
+    
+    index.add([_doc(100, "valve part")])
+    
+    assert set(segments) <= set(os.listdir(path))
+    assert [count for _, count in index._segments] == [100, 1]
+    assert len(InvertedIndex(path).search("part", owner_id=1, k=200)) == 101
\ No newline at end of file
@@ -0,0 +1,85 @@
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from app.services.llm import (
+    FakeProvider,
+    LLMError,
+    OpenAIProvider,
+    ProviderModel,
+    ResilientChatModel,
+    RetryableLLMError,
+)
+
+MESSAGES = [
+    {"role": "system", "content": "Answer from the context.\n\nContext:\n[1] The pump restarts after a minute."},
+    {"role": "user", "content": "When does the pump restart?"},
+]
+
+
+async def _answer(model):
+    return "".join([token async for token in model.stream(MESSAGES)])
+
+
+def test_retries_failures_before_the_first_token():
+    """Test that a retryable failure is retried and the answer still streamed."""
+    provider = FakeProvider(failures=1)
+    model = ResilientChatModel(ProviderModel(provider, "fake"), retries=2, backoff_s=0)
+    
+    assert asyncio.run(_answer(model)) == "The pump restarts after a minute."
+    assert provider.requests == 2
+
+
+def test_deadline_bounds_the_answer():
+    """Test that a provider slower than the deadline fails the call."""
+    model = ResilientChatModel(ProviderModel(FakeProvider(first_token_ms=500), "fake"), timeout_s=0.05)
+    
+    with pytest.raises(LLMError):
+        asyncio.run(_answer(model))
+
+
+def test_slow_primary_is_hedged_with_backup():
+    """Test that the backup answers when the primary is slower than its usual first token."""
+    primary, backup = FakeProvider(), FakeProvider()
+    model = ResilientChatModel(
+        ProviderModel(primary, "primary"), ProviderModel(backup, "backup"), hedge_percentile=90, min_samples=5
+    )
+    
+    async def run():
+        for _ in range(5):
+            await _answer(model)
+        primary.first_token_ms = 1000
+        delay = model.hedge_delay()
+        started = time.perf_counter()
+        answer = await _answer(model)
+        return answer, time.perf_counter() - started, delay
+    
+    answer, seconds, delay = asyncio.run(run())
+    
+    assert answer == "The pump restarts after a minute."
+    assert seconds < 0.5
+    assert backup.requests == 1
+    # The cancelled primary still counts, with the time it had taken
+    assert len(model._latencies) == 6
+    assert model._latencies[-1] >= delay
+
+
+def test_openai_provider_parses_event_stream():
+    """Test that content deltas are streamed and rate limits are retryable."""
+    def handler(request):
+        body = json.loads(request.content)
+        if body["model"] == "busy":
+            return httpx.Response(429)
+        events = [{"choices": [{"delta": {"content": word}}]} for word in ("Hello", " there")]
+        lines = [f"data: {json.dumps(event)}\n\n" for event in events] + ["data: [DONE]\n\n"]
+        return httpx.Response(200, text="".join(lines), headers={"content-type": "text/event-stream"})
+    
+    provider = OpenAIProvider("key")
+    provider._client = httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="https://llm.test")
+    
+    assert asyncio.run(_answer(ProviderModel(provider, "gpt"))) == "Hello there"
+    with pytest.raises(RetryableLLMError):
+        asyncio.run(_answer(ProviderModel(provider, "busy")))
\ No newline at end of file
@@ -0,0 +1,61 @@
+import time
+
+import numpy as np
+
+from app.schemas.search import RetrievedChunk
+from app.services.reranking import Reranker, TokenOverlapModel
+
+
+class SlowModel:
+    """Cross-encoder stand-in scoring passages by length after a fixed delay per batch."""
+    
+    name = "slow"
+    
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.batches = []
+    
+    def predict(self, pairs):
+        self.batches.append(len(pairs))
+        time.sleep(self.delay)
+        return np.array([len(passage) for _, passage in pairs], dtype=np.float32)
+
+
+def _chunks(contents):
+    return [
+        RetrievedChunk(chunk_id=i, document_id=1, chunk_index=i, content=content, score=1.0 / (i + 1))
+        for i, content in enumerate(contents)
+    ]
+
+
+def test_rerank_orders_by_model_score():
+    """Test that all candidates are scored in batches and ordered by the model."""
+    model = SlowModel(0)
+    reranker = Reranker(model, batch_size=2)
+    
+    result = reranker.rerank("query", _chunks(["a", "aaa", "aa", "aaaa", "aaaaa"]))
+    
+    assert model.batches == [2, 2, 1]
+    assert result.reranked == 5
+    assert [c.chunk_id for c in result.chunks] == [4, 3, 1, 2, 0]
+    assert result.chunks[0].rerank_score == 5.0
+
+
+def test_rerank_stops_at_budget():
+    """Test that the budget stops scoring and the rest keep first-stage order."""
+    model = SlowModel(0.05)
+    reranker = Reranker(model, batch_size=2)
+    
+    result = reranker.rerank("query", _chunks(["a", "aa", "aaaa", "aaa", "aaaaa", "aaaaaa"]), budget_ms=80)
+    
+    assert result.reranked == 2
+    assert [c.chunk_id for c in result.chunks] == [1, 0, 2, 3, 4, 5]
+    assert result.chunks[2].rerank_score is None
+    assert result.seconds < 0.08
+
+
+def test_token_overlap_model():
+    """Test that the stand-in model scores the share of query tokens found."""
+    scores = TokenOverlapModel().predict([("pump error", "Pump error E4711"), ("pump error", "filter")])
+    
+    np.testing.assert_allclose(scores, [1.0, 0.0])
\ No newline at end of file
@@ -0,0 +1,337 @@
+import asyncio
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.models.document import Document
+from app.models.user import User
+from app.schemas.search import RetrievalResult, RetrievedChunk, SearchOptions
+from app.services.embedding_cache import CachedEmbedder, DiskEmbeddingStore
+from app.services.embeddings import EmbeddingEngine, HashingEmbeddingModel
+from app.services.lexical import LexicalIndex, ScoredChunk
+from app.services.reranking import Reranker, TokenOverlapModel
+from app.services.retrieval import (
+    HybridRetriever,
+    merge_results,
+    merge_windows,
+    reciprocal_rank_fusion,
+    weighted_score_fusion,
+)
+from app.services.retrieval_cache import RetrievalCache
+from app.services.vector_store import VectorStoreRegistry
+
+
+class KeywordIndex(LexicalIndex):
+    """Lexical index stand-in ranking chunks by the number of query words they contain."""
+    
+    def __init__(self):
+        self.documents = {}
+    
+    def add(self, documents):
+        self.documents.update({d.chunk_id: d for d in documents})
+    
+    def delete(self, chunk_ids):
+        for chunk_id in chunk_ids:
+            self.documents.pop(chunk_id, None)
+    
+    def search(self, query, *, owner_id, collection_ids=None, k=10):
+        words = set(query.lower().split())
+        hits = [
+            ScoredChunk(d.chunk_id, float(len(words & set(d.content.lower().split()))))
+            for d in self.documents.values()
+            if d.owner_id == owner_id
+        ]
+        hits = [hit for hit in hits if hit.score > 0]
+        return sorted(hits, key=lambda hit: -hit.score)[:k]
+
+
+class FailingIndex(KeywordIndex):
+    def search(self, query, **kwargs):
+        raise ConnectionError("lexical backend down")
+
+
+class FakeRedis:
+    """In-memory stand-in for the Redis commands the retrieval cache uses."""
+    
+    def __init__(self):
+        self.data = {}
+    
+    def get(self, key):
+        return self.data.get(key)
+    
+    def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+    
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+    
+    def incr(self, key):
+        self.data[key] = int(self.data.get(key, 0)) + 1
+        return self.data[key]
+
+
+class CountingIndex(KeywordIndex):
+    def __init__(self):
+        super().__init__()
+        self.searches = 0
+    
+    def search(self, query, **kwargs):
+        self.searches += 1
+        return super().search(query, **kwargs)
+
+
+class BatchCountingIndex(KeywordIndex):
+    def __init__(self):
+        super().__init__()
+        self.batches = []
+    
+    async def asearch_many(self, queries, **kwargs):
+        self.batches.append(list(queries))
+        return [self.search(query, **kwargs) for query in queries]
+
+
+def test_reciprocal_rank_fusion():
+    """Test that chunks ranked well by both searches win."""
+    fused = reciprocal_rank_fusion(
+        {
+            "semantic": [ScoredChunk(1, 0.9), ScoredChunk(2, 0.8)],
+            "lexical": [ScoredChunk(2, 12.0), ScoredChunk(3, 4.0)],
+        },
+        k=60,
+    )
+    
+    assert max(fused, key=fused.get) == 2
+    assert fused[1] == pytest.approx(1 / 61)
+    assert fused[3] == pytest.approx(1 / 62)
+
+
+def test_merge_windows():
+    """Test that touching windows in a document merge under their best hit."""
+    def hit(chunk_id, document_id, chunk_index):
+        return RetrievedChunk(
+            chunk_id=chunk_id, document_id=document_id, chunk_index=chunk_index, content="", score=1.0
+        )
+    
+    hits = [hit(1, 1, 10), hit(2, 2, 0), hit(3, 1, 7), hit(4, 1, 2)]
+    
+    merged = [(h.chunk_id, first, last) for h, first, last in merge_windows(hits, 1)]
+    
+    assert merged == [(1, 6, 11), (2, 0, 1), (4, 1, 3)]
+
+
+def test_merge_results():
+    """Test that chunks found by several queries of a turn rank first and appear once."""
+    def result(chunk_ids, rerank_ms=None):
+        return RetrievalResult(
+            chunks=[
+                RetrievedChunk(chunk_id=i, document_id=1, chunk_index=i, content="", score=1.0)
+                for i in chunk_ids
+            ],
+            reranked=len(chunk_ids) if rerank_ms else 0,
+            rerank_ms=rerank_ms,
+        )
+    
+    merged = merge_results([result([1, 2, 3], 4.0), result([3, 4], 1.0)], k=3)
+    
+    assert [c.chunk_id for c in merged.chunks] == [3, 1, 2]
+    assert (merged.reranked, merged.rerank_ms, merged.cached) == (5, 5.0, False)
+
+
+def test_weighted_score_fusion():
+    """Test that scores are normalized per search before weighting."""
+    fused = weighted_score_fusion(
+        {
+            "semantic": [ScoredChunk(1, 0.9), ScoredChunk(2, 0.5)],
+            "lexical": [ScoredChunk(2, 20.0), ScoredChunk(3, 10.0)],
+        },
+        {"semantic": 0.7, "lexical": 0.3},
+    )
+    
+    assert fused == {1: pytest.approx(0.7), 2: pytest.approx(0.3), 3: pytest.approx(0.0)}
+
+
+@pytest.fixture
+def owner(db: Session) -> User:
+    user = User(
+        email="retrieval@example.com",
+        username="retrieval",
+        full_name="Retrieval Owner",
+        hashed_password="not-a-hash",
+    )
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+
+@pytest.fixture
+def embedder(tmp_path):
+    engine = EmbeddingEngine(HashingEmbeddingModel(64), max_wait_ms=1)
+    yield CachedEmbedder(engine, DiskEmbeddingStore(str(tmp_path / "cache.sqlite3"), 1 << 20))
+    engine.close()
+
+
+def _index(db: Session, owner: User, embedder, registry, lexical, texts):
+    document = Document(
+        title="doc",
+        file_name="doc.txt",
+        file_type="txt",
+        file_size=1,
+        s3_path="doc.txt",
+        owner_id=owner.id,
+        status="indexed",
+    )
+    db.add(document)
+    db.commit()
+    rows = [
+        {
+            "document_id": document.id,
+            "content": text,
+            "content_hash": str(i),
+            "chunk_index": i,
+            "metadata": None,
+            "vector_id": f"{owner.id}:{i}",
+        }
+        for i, text in enumerate(texts)
+    ]
+    ids = crud.document_chunk.bulk_create(db, rows=rows)
+    registry.get(None).add([row["vector_id"] for row in rows], embedder.embed(texts))
+    lexical.add([
+        type("Doc", (), {"chunk_id": i, "content": t, "owner_id": owner.id})()
+        for i, t in zip(ids, texts)
+    ])
+    return ids
+
+
+def test_hybrid_retrieval(db: Session, owner: User, embedder):
+    """Test that vector and keyword matches are fused and returned with their ranks."""
+    registry = VectorStoreRegistry(None, 64, n_probe=4, train_size=1000)
+    lexical = KeywordIndex()
+    texts = [
+        "the pump reports error E4711 when overheating",
+        "replace the filter every six months",
+        "the pump overheating guide",
+    ]
+    ids = _index(db, owner, embedder, registry, lexical, texts)
+    retriever = HybridRetriever(embedder, registry, lexical, candidates=10)
+    
+    result = asyncio.run(
+        retriever.retrieve(db, "pump error E4711", owner_id=owner.id, options=SearchOptions(max_results=2))
+    )
+    results = result.chunks
+    
+    assert [r.chunk_id for r in results][0] == ids[0]
+    assert len(results) == 2
+    assert results[0].semantic_rank == 1 and results[0].lexical_rank == 1
+    assert results[0].content == texts[0]
+    assert result.rerank_ms is None
+
+
+def test_retrieval_survives_failed_search(db: Session, owner: User, embedder):
+    """Test that results from the working search are returned when the other fails."""
+    registry = VectorStoreRegistry(None, 64, n_probe=4, train_size=1000)
+    ids = _index(db, owner, embedder, registry, FailingIndex(), ["alpha beta", "gamma delta"])
+    retriever = HybridRetriever(embedder, registry, FailingIndex(), candidates=10)
+    options = SearchOptions(max_results=1, fusion="weighted")
+    
+    results = asyncio.run(retriever.retrieve(db, "gamma delta", owner_id=owner.id, options=options)).chunks
+    
+    assert [r.chunk_id for r in results] == [ids[1]]
+    assert results[0].lexical_rank is None
+
+
+def test_retrieval_reranks_candidates(db: Session, owner: User, embedder):
+    """Test that reranking reorders fused candidates before the results are cut."""
+    registry = VectorStoreRegistry(None, 64, n_probe=4, train_size=1000)
+    lexical = KeywordIndex()
+    texts = ["filter", "filter maintenance", "filter maintenance schedule every month"]
+    ids = _index(db, owner, embedder, registry, lexical, texts)
+    retriever = HybridRetriever(embedder, registry, lexical, Reranker(TokenOverlapModel()), candidates=10)
+    options = SearchOptions(max_results=1, rerank=True, rerank_budget_ms=None)
+    
+    result = asyncio.run(
+        retriever.retrieve(db, "filter maintenance schedule", owner_id=owner.id, options=options)
+    )
+    
+    assert [r.chunk_id for r in result.chunks] == [ids[2]]
+    assert result.chunks[0].rerank_score == pytest.approx(1.0)
+    assert result.reranked == 3
+    assert result.rerank_ms >= 0
+
+
+def test_retrieval_cache_skips_search_until_invalidated(db: Session, owner: User, embedder):
+    """Test that repeated queries are served from the cache until their collection changes."""
+    registry = VectorStoreRegistry(None, 64, n_probe=4, train_size=1000)
+    lexical = CountingIndex()
+    ids = _index(db, owner, embedder, registry, lexical, ["pump error E4711", "filter change"])
+    cache = RetrievalCache(FakeRedis(), ttl_seconds=60)
+    retriever = HybridRetriever(embedder, registry, lexical, cache=cache, candidates=10)
+    options = SearchOptions(max_results=1)
+    
+    first = asyncio.run(retriever.retrieve(db, "Pump error", owner_id=owner.id, options=options))
+    lookups = embedder.stats().hits + embedder.stats().misses
+    second = asyncio.run(retriever.retrieve(db, "  pump   ERROR ", owner_id=owner.id, options=options))
+    
+    assert not first.cached and second.cached
+    assert [c.chunk_id for c in second.chunks] == [c.chunk_id for c in first.chunks] == [ids[0]]
+    assert second.chunks[0].content == "pump error E4711"
+    assert lexical.searches == 1
+    assert embedder.stats().hits + embedder.stats().misses == lookups
+    
+    cache.bump(owner.id, [None])
+    third = asyncio.run(retriever.retrieve(db, "pump error", owner_id=owner.id, options=options))
+    assert not third.cached
+    assert lexical.searches == 2
+
+
+def test_retrieve_many_batches_searches(db: Session, owner: User, embedder):
+    """Test that several queries share one lexical request and get their own results."""
+    registry = VectorStoreRegistry(None, 64, n_probe=4, train_size=1000)
+    lexical = BatchCountingIndex()
+    ids = _index(db, owner, embedder, registry, lexical, ["pump error E4711", "filter change"])
+    retriever = HybridRetriever(embedder, registry, lexical, candidates=10)
+    
+    results = asyncio.run(retriever.retrieve_many(
+        db, ["pump error", "filter change"], owner_id=owner.id, options=SearchOptions(max_results=1)
+    ))
+    
+    assert [[c.chunk_id for c in result.chunks] for result in results] == [[ids[0]], [ids[1]]]
+    assert lexical.batches == [["pump error", "filter change"]]
+
+
+def test_retrieval_diversifies_duplicates(db: Session, owner: User, embedder):
+    """Test that a duplicate chunk gives way to a different one when diversifying."""
+    registry = VectorStoreRegistry(None, 64, n_probe=4, train_size=1000)
+    lexical = KeywordIndex()
+    texts = ["pump error E4711 overheating", "pump error E4711 overheating", "pump error reset steps"]
+    ids = _index(db, owner, embedder, registry, lexical, texts)
+    retriever = HybridRetriever(embedder, registry, lexical, candidates=10)
+    query = "pump error E4711"
+    
+    plain = asyncio.run(retriever.retrieve(db, query, owner_id=owner.id, options=SearchOptions(max_results=2)))
+    options = SearchOptions(max_results=2, diversify=True, mmr_lambda=0.3)
+    before = embedder.stats()
+    diverse = asyncio.run(retriever.retrieve(db, query, owner_id=owner.id, options=options))
+    after = embedder.stats()
+    
+    assert {c.chunk_id for c in plain.chunks} == {ids[0], ids[1]}
+    assert [c.chunk_id for c in diverse.chunks] == [ids[0], ids[2]]
+    # Candidates are compared by their indexed vectors, only the query is embedded
+    assert (after.hits + after.misses) - (before.hits + before.misses) == 1
+
+
+def test_retrieval_expands_hits_with_neighbours(db: Session, owner: User, embedder):
+    """Test that hits get the text of their neighbouring chunks."""
+    registry = VectorStoreRegistry(None, 64, n_probe=4, train_size=1000)
+    lexical = KeywordIndex()
+    texts = ["open the cover", "press reset", "wait one minute", "close the cover", "unrelated notes"]
+    ids = _index(db, owner, embedder, registry, lexical, texts)
+    retriever = HybridRetriever(embedder, registry, lexical, candidates=10)
+    options = SearchOptions(max_results=1, use_semantic_search=False, neighbour_chunks=1)
+    
+    result = asyncio.run(retriever.retrieve(db, "reset", owner_id=owner.id, options=options))
+    
+    assert [c.chunk_id for c in result.chunks] == [ids[1]]
+    assert result.chunks[0].content == "open the cover press reset wait one minute"
+    assert result.chunks[0].window == (0, 2)
\ No newline at end of file
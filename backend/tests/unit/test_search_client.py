@@ -0,0 +1,104 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from elasticsearch import AsyncElasticsearch, Elasticsearch
+
+from app.services.lexical import ElasticsearchLexicalIndex
+from app.services.search_client import ElasticsearchClients, bulk_index
+
+
+def _operations(lines):
+    """Split serialized bulk lines into (operation, id) pairs."""
+    operations = []
+    lines = iter(lines)
+    for line in lines:
+        [(op, header)] = json.loads(line).items()
+        operations.append((op, header["_id"]))
+        if op != "delete":
+            next(lines)
+    return operations
+
+
+def _response(statuses):
+    """Bulk response for ((operation, id), status) pairs."""
+    items = []
+    for (op, _id), status in statuses:
+        item = {"_id": str(_id), "status": status}
+        if status >= 300:
+            item["error"] = {"type": "rejected"}
+        items.append({op: item})
+    return SimpleNamespace(body={"errors": any(status >= 300 for _, status in statuses), "items": items})
+
+
+class FlakyClient(Elasticsearch):
+    """Client rejecting chunk 2 with 429 once and reporting unknown deletes as 404."""
+    
+    def __init__(self):
+        super().__init__("http://localhost:9200")
+        self.requests = []
+    
+    def options(self, **kwargs):
+        return self
+    
+    def bulk(self, *, operations, **kwargs):
+        operations = _operations(operations)
+        self.requests.append(operations)
+        statuses = []
+        for op, _id in operations:
+            if _id == 2 and len(self.requests) == 1:
+                statuses.append(((op, _id), 429))
+            elif op == "delete":
+                statuses.append(((op, _id), 404))
+            else:
+                statuses.append(((op, _id), 201))
+        return _response(statuses)
+
+
+class SearchAsyncClient(AsyncElasticsearch):
+    """Async client recording msearch requests."""
+    
+    def __init__(self):
+        super().__init__("http://localhost:9200", node_class="httpxasync")
+        self.searches = []
+    
+    def options(self, **kwargs):
+        return self
+    
+    async def msearch(self, *, searches, **kwargs):
+        self.searches.append(searches)
+        return {"responses": [
+            {"hits": {"hits": [{"_id": "7", "_score": 2.5}]}},
+            {"error": {"type": "index_not_found_exception"}, "status": 404},
+        ]}
+
+
+def test_bulk_index_retries_rejected_items():
+    """Test that items rejected with 429 are retried and missing deletes are not errors."""
+    client = FlakyClient()
+    actions = [{"_index": "chunks", "_id": i, "content": f"chunk {i}"} for i in range(1, 4)]
+    actions.append({"_op_type": "delete", "_index": "chunks", "_id": 9})
+    
+    result = bulk_index(client, actions, chunk_size=10, max_retries=2, initial_backoff=0)
+    
+    assert result.succeeded == 4
+    assert result.errors == []
+    assert client.requests[1] == [("index", 2)]
+
+
+def test_lexical_index_batches_queries_with_msearch():
+    """Test that several queries are sent as one msearch request."""
+    clients = ElasticsearchClients("http://localhost:9200")
+    clients._async = SearchAsyncClient()
+    index = ElasticsearchLexicalIndex(clients, "chunks")
+    
+    results = asyncio.run(index.asearch_many(["pump error", "filter"], owner_id=1, collection_ids=[3], k=5))
+    
+    assert [[hit.chunk_id for hit in hits] for hits in results] == [[7], []]
+    [searches] = clients._async.searches
+    assert len(searches) == 4
+    assert searches[1]["size"] == 5
+    assert searches[1]["query"]["bool"]["filter"] == [
+        {"term": {"owner_id": 1}},
+        {"terms": {"collection_id": [3]}},
+    ]
\ No newline at end of file
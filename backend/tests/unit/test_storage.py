@@ -0,0 +1,69 @@
+import asyncio
+import hashlib
+import os
+from unittest import mock
+
+import pytest
+
+from app.services.storage import LocalStorage, S3Storage, stream_to_storage
+
+
+async def _chunks(data: bytes, size: int):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+def test_local_storage_stream(tmp_path):
+    """Test that a stream is stored in parts with size and hash computed on the fly."""
+    storage = LocalStorage(str(tmp_path), part_size=1000)
+    data = os.urandom(4321)
+    
+    stored = asyncio.run(stream_to_storage(storage, "a/b/file.pdf", _chunks(data, 333)))
+    
+    assert stored.key == "a/b/file.pdf"
+    assert stored.size == len(data)
+    assert stored.content_hash == hashlib.sha256(data).hexdigest()
+    assert b"".join(storage.iter_chunks(stored.key)) == data
+
+
+def test_local_storage_abort_on_error(tmp_path):
+    """Test that a failed stream leaves no object behind."""
+    storage = LocalStorage(str(tmp_path), part_size=100)
+    
+    async def failing():
+        yield b"x" * 250
+        raise RuntimeError("client disconnected")
+    
+    with pytest.raises(RuntimeError):
+        asyncio.run(stream_to_storage(storage, "broken.pdf", failing()))
+    
+    assert not os.path.exists(storage.path_for("broken.pdf"))
+    assert not os.path.exists(storage.path_for("broken.pdf") + ".part")
+
+
+def test_local_storage_rejects_escaping_keys(tmp_path):
+    """Test that keys cannot point outside the storage root."""
+    storage = LocalStorage(str(tmp_path), part_size=100)
+    
+    with pytest.raises(ValueError):
+        storage.open_writer("../outside.pdf")
+
+
+def test_s3_multipart_parts():
+    """Test that every full part becomes one S3 multipart part."""
+    client = mock.MagicMock()
+    client.create_multipart_upload.return_value = {"UploadId": "upload-1"}
+    client.upload_part.side_effect = [{"ETag": f"etag-{i}"} for i in range(1, 4)]
+    storage = S3Storage("bucket", part_size=10, client=client)
+    
+    writer = storage.open_writer("doc.pdf")
+    writer.write(b"0123456789abc")
+    writer.write(b"defghijklmn")
+    stored = writer.complete()
+    
+    assert stored.size == 24
+    assert [c.kwargs["Body"] for c in client.upload_part.call_args_list] == [
+        b"0123456789", b"abcdefghij", b"klmn"
+    ]
+    parts = client.complete_multipart_upload.call_args.kwargs["MultipartUpload"]["Parts"]
+    assert [p["PartNumber"] for p in parts] == [1, 2, 3]
\ No newline at end of file
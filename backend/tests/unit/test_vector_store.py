@@ -0,0 +1,306 @@
+import numpy as np
+import pytest
+
+from app.services.vector_store import (
+    IVFVectorStore,
+    ProductQuantizer,
+    ScalarQuantizer,
+    ShardedVectorStore,
+    VectorStoreRegistry,
+    quantization_report,
+)
+
+
+def _unit_vectors(n: int, dimension: int, seed: int = 0) -> np.ndarray:
+    vectors = np.random.default_rng(seed).normal(size=(n, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_exact_search_before_training():
+    """Test that small stores return the exact top-k in score order."""
+    store = IVFVectorStore(8, train_size=100)
+    vectors = _unit_vectors(20, 8)
+    store.add([f"v{i}" for i in range(20)], vectors)
+    
+    hits = store.search(vectors[3], k=5)
+    
+    assert not store.is_trained
+    assert hits[0].vector_id == "v3"
+    assert hits[0].score == pytest.approx(1.0, abs=1e-5)
+    expected = np.argsort(vectors @ vectors[3])[::-1][:5]
+    assert [h.vector_id for h in hits] == [f"v{i}" for i in expected]
+
+
+def test_ivf_search_recall():
+    """Test that probing a subset of lists still finds most true neighbours."""
+    store = IVFVectorStore(16, n_probe=8, train_size=500)
+    vectors = _unit_vectors(2000, 16)
+    store.add([f"v{i}" for i in range(2000)], vectors)
+    queries = _unit_vectors(50, 16, seed=1)
+    
+    recall = []
+    for query in queries:
+        expected = {f"v{i}" for i in np.argsort(vectors @ query)[::-1][:10]}
+        found = {h.vector_id for h in store.search(query, k=10)}
+        recall.append(len(expected & found) / 10)
+    
+    assert store.is_trained
+    assert np.mean(recall) >= 0.8
+
+
+def test_scoped_search_small_scope():
+    """Test that a small scope in a trained store is searched exactly."""
+    store = IVFVectorStore(16, n_probe=1, train_size=500)
+    vectors = _unit_vectors(2000, 16)
+    store.add([f"{1 if i % 100 == 0 else 2}:v{i}" for i in range(2000)], vectors)
+    query = _unit_vectors(1, 16, seed=1)[0]
+    
+    hits = store.search(query, k=10, scope="1")
+    
+    scoped = np.arange(0, 2000, 100)
+    expected = scoped[np.argsort(vectors[scoped] @ query)[::-1][:10]]
+    assert store.is_trained
+    assert [h.vector_id for h in hits] == [f"1:v{i}" for i in expected]
+    assert store.search(query, k=10, scope="3") == []
+
+
+def test_scoped_search_large_scope():
+    """Test that large scopes probe until enough of their vectors are found."""
+    store = IVFVectorStore(16, n_probe=8, train_size=200)
+    vectors = _unit_vectors(3000, 16)
+    ids = [f"{i % 3}:v{i}" for i in range(3000)]
+    store.add(ids, vectors)
+    store.delete(ids[:30])
+    queries = _unit_vectors(20, 16, seed=1)
+    
+    recall = []
+    for query in queries:
+        hits = store.search(query, k=10, scope="0")
+        assert len(hits) == 10
+        assert all(h.vector_id.startswith("0:") for h in hits)
+        scoped = np.arange(30, 3000, 3)
+        expected = {f"0:v{i}" for i in scoped[np.argsort(vectors[scoped] @ query)[::-1][:10]]}
+        recall.append(len(expected & {h.vector_id for h in hits}) / 10)
+    
+    assert np.mean(recall) >= 0.7
+
+
+def test_add_replaces_and_delete_removes():
+    """Test upserts, deletes of unknown IDs and compaction."""
+    store = IVFVectorStore(4)
+    vectors = np.eye(4, dtype=np.float32)
+    store.add(["a", "b"], vectors[:2])
+    store.add(["a"], vectors[2:3])
+    store.delete(["b", "missing"])
+    
+    assert len(store) == 1
+    [hit] = store.search(vectors[2], k=3)
+    assert (hit.vector_id, hit.score) == ("a", pytest.approx(1.0))
+    store.add(["c", "c"], vectors[:2])
+    assert len(store) == 2
+    assert store.search(vectors[1], k=1)[0].vector_id == "c"
+
+
+def test_fetch_returns_stored_vectors():
+    """Test that stored vectors are returned by ID from plain and sharded stores."""
+    vectors = _unit_vectors(10, 8)
+    ids = [f"v{i}" for i in range(10)]
+    stores = [IVFVectorStore(8), ShardedVectorStore([IVFVectorStore(8) for _ in range(3)])]
+    
+    for store in stores:
+        store.add(ids, vectors)
+        store.delete(["v2"])
+        found = store.fetch(["v1", "v2", "v7", "missing"])
+        
+        assert sorted(found) == ["v1", "v7"]
+        np.testing.assert_array_equal(found["v7"], vectors[7])
+
+
+def test_persist_and_reload(tmp_path):
+    """Test that a persisted store is loaded by other instances."""
+    path = str(tmp_path / "vectors")
+    writer = IVFVectorStore(8, train_size=50, path=path)
+    vectors = _unit_vectors(100, 8)
+    writer.add([f"v{i}" for i in range(100)], vectors)
+    writer.persist()
+    
+    reader = IVFVectorStore(8, train_size=50, path=path)
+    assert len(reader) == 100
+    assert reader.is_trained
+    assert reader.search(vectors[7], k=1)[0].vector_id == "v7"
+    
+    writer.delete(["v7"])
+    writer.persist()
+    assert reader.search(vectors[7], k=1)[0].vector_id != "v7"
+
+
+def test_loaded_snapshot_is_memory_mapped(tmp_path):
+    """Test that stores search the mapped files and writes append to them."""
+    path = str(tmp_path / "vectors")
+    writer = IVFVectorStore(8, path=path)
+    vectors = _unit_vectors(50, 8)
+    writer.add([f"v{i}" for i in range(50)], vectors)
+    
+    reader = IVFVectorStore(8, path=path)
+    assert reader.is_mapped
+    assert reader.search(vectors[3], k=1)[0].vector_id == "v3"
+    
+    reader.add(["extra"], vectors[:1])
+    for _ in range(3):
+        writer.persist()
+    assert reader.is_mapped and writer.is_mapped
+    assert len(writer) == len(reader) == 51
+    assert len(list((tmp_path / "vectors").glob("vectors-*"))) == 1
+
+
+def test_concurrent_writers_keep_each_others_changes(tmp_path):
+    """Test that a writer with an older view of the store does not undo another writer's changes."""
+    path = str(tmp_path / "vectors")
+    vectors = _unit_vectors(3, 8)
+    first = IVFVectorStore(8, path=path)
+    first.add(["1:a", "1:b"], vectors[:2])
+    second = IVFVectorStore(8, path=path)
+    
+    second.add(["1:c"], vectors[2:])
+    second.persist()
+    first.delete(["1:a"])
+    first.persist()
+    
+    fresh = IVFVectorStore(8, path=path)
+    assert len(fresh) == 2 and "1:a" not in fresh and "1:c" in fresh
+    assert fresh.search(vectors[2], k=1)[0].vector_id == "1:c"
+
+
+@pytest.mark.parametrize(
+    "quantizer", [ScalarQuantizer(), ProductQuantizer(n_subvectors=8)], ids=["int8", "pq"]
+)
+def test_quantized_search_rescores_candidates(quantizer):
+    """Test that searching codes and re-scoring keeps recall and exact scores."""
+    store = IVFVectorStore(32, n_probe=16, train_size=500, quantizer=quantizer, rescore=4)
+    vectors = _unit_vectors(2000, 32)
+    store.add([f"v{i}" for i in range(2000)], vectors)
+    queries = _unit_vectors(30, 32, seed=1)
+    
+    recall = []
+    for query in queries:
+        expected = {f"v{i}" for i in np.argsort(vectors @ query)[::-1][:10]}
+        hits = store.search(query, k=10)
+        recall.append(len(expected & {h.vector_id for h in hits}) / 10)
+        index = int(hits[0].vector_id[1:])
+        assert hits[0].score == pytest.approx(float(vectors[index] @ query), abs=1e-5)
+    
+    assert np.mean(recall) >= 0.7
+    assert store.searched_bytes == 2000 * quantizer.bytes_per_vector(32)
+
+
+def test_configure_and_persist_quantizer(tmp_path):
+    """Test that quantization can be switched on and survives a reload."""
+    path = str(tmp_path / "vectors")
+    store = IVFVectorStore(16, train_size=100, path=path)
+    vectors = _unit_vectors(300, 16)
+    store.add([f"v{i}" for i in range(300)], vectors)
+    assert store.searched_bytes == 300 * 16 * 4
+    
+    store.configure(ScalarQuantizer())
+    store.persist()
+    reloaded = IVFVectorStore(16, train_size=100, path=path, quantizer=ScalarQuantizer())
+    
+    assert store.searched_bytes == reloaded.searched_bytes == 300 * 16
+    # Vectors, codes and list assignments all stay in the mapped files
+    assert store.memory_bytes == reloaded.memory_bytes == 0
+    assert reloaded.mapped_bytes == 300 * (16 * 4 + 16 + 4)
+    np.testing.assert_array_equal(reloaded.quantizer.offset, store.quantizer.offset)
+    assert reloaded.search(vectors[5], k=1)[0].vector_id == "v5"
+
+
+def test_quantization_report():
+    """Test that the report compares memory and recall against float32."""
+    vectors = _unit_vectors(1000, 32)
+    queries = _unit_vectors(20, 32, seed=1)
+    
+    reports = quantization_report(
+        vectors,
+        queries,
+        {"float32": None, "int8": ScalarQuantizer(), "pq": ProductQuantizer(4)},
+        k=10,
+    )
+    
+    by_name = {r.name: r for r in reports}
+    assert by_name["float32"].recall == 1.0
+    assert by_name["int8"].compression == 4.0
+    assert by_name["pq"].memory_bytes == 1000 * 4
+    assert by_name["pq"].recall_rescored >= by_name["pq"].recall
+    assert by_name["int8"].recall_rescored >= 0.9
+
+
+def test_registry_selects_quantization_per_collection():
+    """Test that each collection gets its own store with its own quantization."""
+    registry = VectorStoreRegistry(None, 16, n_probe=4, train_size=100)
+    
+    default = registry.get(None)
+    pq = registry.get(1, {"quantization": "pq", "pq_subvectors": 4})
+    
+    assert default is not pq
+    assert default.quantizer is None
+    assert isinstance(pq.quantizer, ProductQuantizer)
+    assert registry.get(1, {"quantization": "pq", "pq_subvectors": 4}) is pq
+    assert isinstance(registry.get(1, {"quantization": "int8"}).quantizer, ScalarQuantizer)
+
+
+def test_sharded_search_matches_unsharded():
+    """Test that merging per-shard top-k gives the same hits as one store."""
+    from concurrent.futures import ThreadPoolExecutor
+    
+    vectors = _unit_vectors(600, 16)
+    ids = [f"{i % 3}:{i}" for i in range(600)]
+    single = IVFVectorStore(16, train_size=1000)
+    single.add(ids, vectors)
+    with ThreadPoolExecutor(4) as executor:
+        sharded = ShardedVectorStore([IVFVectorStore(16, train_size=1000) for _ in range(4)], executor=executor)
+        sharded.add(ids, vectors)
+        sharded.delete(ids[:10])
+        single.delete(ids[:10])
+        
+        for query in _unit_vectors(20, 16, seed=1):
+            for scope in (None, "1"):
+                hits, expected = sharded.search(query, 10, scope=scope), single.search(query, 10, scope=scope)
+                assert [h.vector_id for h in hits] == [h.vector_id for h in expected]
+                assert [h.score for h in hits] == pytest.approx([h.score for h in expected], abs=1e-5)
+    assert len(sharded) == 590
+    assert ids[20] in sharded and ids[0] not in sharded
+    assert all(len(shard) > 100 for shard in sharded.shards)
+
+
+def test_sharded_lists_match_unsharded():
+    """Test that trained shards share their lists and find what one store with those lists finds."""
+    vectors = _unit_vectors(3000, 16)
+    ids = [f"1:{i}" for i in range(3000)]
+    sharded = ShardedVectorStore([IVFVectorStore(16, n_probe=4, train_size=500) for _ in range(4)])
+    for start in range(0, 3000, 500):
+        sharded.add(ids[start:start + 500], vectors[start:start + 500])
+    
+    centroids = sharded.shards[0]._centroids
+    assert all(shard.trained_count == 2000 for shard in sharded.shards)
+    assert all(np.array_equal(shard._centroids, centroids) for shard in sharded.shards)
+    
+    single = IVFVectorStore(16, n_probe=4, train_lists=False)
+    single.add(ids, vectors)
+    single.set_centroids(centroids, 3000)
+    for query in _unit_vectors(20, 16, seed=1):
+        hits, expected = sharded.search(query, 10), single.search(query, 10)
+        assert [h.vector_id for h in hits] == [h.vector_id for h in expected]
+
+
+def test_registry_persists_shards(tmp_path):
+    """Test that a sharded collection store is saved per shard and reloaded."""
+    registry = VectorStoreRegistry(str(tmp_path), 8, n_probe=4, train_size=1000, shards=2, search_threads=2)
+    vectors = _unit_vectors(50, 8)
+    store = registry.get(7)
+    store.add([f"1:{i}" for i in range(50)], vectors)
+    store.persist()
+    
+    reloaded = VectorStoreRegistry(str(tmp_path), 8, n_probe=4, train_size=1000, shards=2).get(7)
+    
+    assert isinstance(reloaded, ShardedVectorStore)
+    assert len(reloaded) == 50
+    assert reloaded.search(vectors[4], 1)[0].vector_id == "1:4"
\ No newline at end of file